@@ -0,0 +1,53 @@
+"""
+Measure time of validating NMEA sentence checksums, one by one and in
+batches, compared with XOR-ing characters in a loop, as it used to be done.
+
+Run from the project root directory:
+    python -m benchmarks.checksum_bench
+"""
+from time import perf_counter
+
+from tsparser.parser import gps
+
+SENTENCES = [sentence + ',2015-01-01T12:00:00.000000' for sentence in (
+    '$GPGGA,123519,4807.038,N,01130.000,E,1,08,0.9,545.4,M,46.9,M,,*46',
+    '$GPGSA,A,3,04,05,,09,12,,,24,,,,,2.5,1.3,2.1*39',
+    '$GPGSV,2,1,08,01,40,083,46,02,17,308,41,12,07,344,39,14,22,228,45*75',
+    '$GPRMC,123519,A,4807.038,N,01131.000,E,022.4,084.4,230394,003.1,W*6A',
+    '$GPVTG,054.7,T,034.4,M,005.5,N,010.2,K*48',
+    '$GPVTG,054.7,T,034.4,M,005.5,N,010.2,K*49',  # invalid
+)] * 2000
+
+
+def legacy_checksum_valid(line):
+    l = line.index('$')
+    r = line.rindex('*')
+    chksum = 0
+    for char in line[l + 1: r]:
+        chksum ^= ord(char)
+    if line[r + 1: r + 3] == '%.2X' % chksum:
+        return True
+    return False
+
+
+def measure(description, validate):
+    start = perf_counter()
+    results = validate()
+    elapsed = perf_counter() - start
+    print('{:24} {:8.3f} us/sentence'.format(
+        description, elapsed / len(SENTENCES) * 1e6))
+    return list(results)
+
+
+def main():
+    expected = measure('legacy', lambda: [legacy_checksum_valid(sentence)
+                                          for sentence in SENTENCES])
+    results = measure('folding', lambda: [gps._checksum_valid(sentence)
+                                          for sentence in SENTENCES])
+    assert results == expected
+    results = measure('batch', lambda: gps.validate_checksums(SENTENCES))
+    assert results == expected
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Measure how many lines per second are parsed with dispatch table routing,
+compared with trying every parser in sequence, as it used to be done.
+
+The input is a recorded mix of IMU, SHT and GPS lines. Sending data and
+planetary data calculation are replaced with no-ops.
+
+Run from the project root directory:
+    python -m benchmarks.parser_bench
+"""
+from time import perf_counter
+from unittest.mock import patch
+
+from tsparser import config, main as parser_main
+from tsparser.parser import BaseParser
+from tsparser.timestamp import now, parse_timestamp
+from tsparser.utils import StatisticDataCollector
+
+TIMESTAMP = ',1420113600.000000'
+RECORDED_MIX = [line + TIMESTAMP for line in (
+    '$GYRO,-413,-1286,-2545',
+    '$ACCEL,14400,3328,5440',
+    '$MAGNET,13310,-32001,5118',
+    '$MBAR,3981106',
+    '$TERM,26000',
+    '$HYDR,24000',
+    '$GPGGA,123519,4807.038,N,01130.000,E,1,08,0.9,545.4,M,46.9,M,,*46',
+    '$GPGSA,A,3,04,05,,09,12,,,24,,,,,2.5,1.3,2.1*39',
+    '$GPGSV,2,1,08,01,40,083,46,02,17,308,41,12,07,344,39,14,22,228,45*75',
+    '$GPRMC,123519,A,4807.038,N,01131.000,E,022.4,084.4,230394,003.1,W*6A',
+    '$GPVTG,054.7,T,034.4,M,005.5,N,010.2,K*48',
+)]
+REPEATS = 5000
+
+
+def parse_sequentially(parsers, line):
+    """
+    Same work as main._parse_line does, but the line is passed to every
+    parser in turn instead of the one found in the dispatch table.
+    """
+    sdc = StatisticDataCollector()
+    sdc.on_new_received_data(line)
+    values = line.split(',')
+    BaseParser.timestamp = parse_timestamp(values.pop())
+    # Includes time of parsers which have not accepted the line
+    parse_start = perf_counter()
+    for parser in parsers:
+        if parser.parse(line, *values):
+            parse_end = perf_counter()
+            receiving_latency = (max(0.0, now() - BaseParser.timestamp)
+                                 if config.RECEIVING_LATENCY_MEASURED
+                                 else None)
+            sdc.on_line_parsed('parse/' + parser.__class__.__name__,
+                               parse_end - parse_start, receiving_latency)
+            break
+
+
+def no_op(*args, **kwargs):
+    pass
+
+
+def measure(description, parse):
+    start = perf_counter()
+    for _ in range(REPEATS):
+        for line in RECORDED_MIX:
+            parse(line)
+    elapsed = perf_counter() - start
+    print('{:24} {:10.0f} lines/s'.format(
+        description, REPEATS * len(RECORDED_MIX) / elapsed))
+
+
+def main():
+    with patch('tsparser.sender.send_data', no_op), \
+            patch('tsparser.planetarydata.Calculator.on_data_update', no_op):
+        parsers = parser_main._get_parsers()
+        # The order parsers used to be tried in
+        parser_list = [parsers['$GYRO'], parsers['$GPGGA'], parsers['$TERM'],
+                       parsers['$PHOTO']]
+        measure('sequential', lambda line: parse_sequentially(parser_list,
+                                                              line))
+        measure('dispatch table',
+                lambda line: parser_main._parse_line(parsers, line, False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Measure time of converting a single raw RGB565 photo to JPEG, compared with
+the pixel enumeration text file that used to be passed to ImageMagick's
+convert (which is timed as well, if it is installed).
+
+Run from the project root directory:
+    python -m benchmarks.photo_bench
+"""
+import os
+import shutil
+import subprocess
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from tsparser.parser.photo import PHOTO_WIDTH, PhotoParser
+
+PHOTO_HEIGHT = 240
+REPEATS = 20
+
+
+def legacy_get_rgb_from_bytearray(bytearray, width):
+    result = b'# ImageMagick pixel enumeration: 320,240,255,srgb\n'
+
+    for i in range(0, len(bytearray), 2):
+        b1 = bytearray[i + 1]
+        b2 = bytearray[i]
+        color_R = (b1 >> 3) << 3
+        color_G = (((b1 & 7) << 3) + (b2 >> 5)) << 2
+        color_B = (b2 & 31) << 3
+        row = "{},{}: ({},{},{})\n".format((i//2) % width, (i//2)//width,
+                                           color_R, color_G, color_B)
+        result += row.encode("utf-8")
+
+    return result
+
+
+def main():
+    raw = os.urandom(2 * PHOTO_WIDTH * PHOTO_HEIGHT)
+
+    start = perf_counter()
+    for _ in range(REPEATS):
+        PhotoParser.encode_jpeg(
+            PhotoParser.get_rgb_from_bytearray(raw, PHOTO_WIDTH))
+    print('NumPy + Pillow:           {:8.2f} ms/photo'.format(
+        (perf_counter() - start) / REPEATS * 1000))
+
+    start = perf_counter()
+    text = legacy_get_rgb_from_bytearray(raw, PHOTO_WIDTH)
+    print('legacy text generation:   {:8.2f} ms/photo'.format(
+        (perf_counter() - start) * 1000))
+
+    if shutil.which('convert') is None:
+        print('legacy convert:           (ImageMagick is not installed)')
+        return
+    with TemporaryDirectory() as directory:
+        txt_filename = os.path.join(directory, 'photo.txt')
+        start = perf_counter()
+        with open(txt_filename, 'wb') as txt_file:
+            txt_file.write(text)
+        subprocess.call(['convert', txt_filename,
+                         os.path.join(directory, 'photo.jpg')])
+        print('legacy write + convert:   {:8.2f} ms/photo'.format(
+            (perf_counter() - start) * 1000))
+
+
+if __name__ == '__main__':
+    main()
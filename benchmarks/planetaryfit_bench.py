@@ -0,0 +1,89 @@
+"""
+Compare the speed of planetary mass and radius fitting with the brute force
+search that was used by the calculator before. The incremental column shows
+the time of adding a batch of new samples to FitAccumulator and refitting.
+
+Run from the project root directory:
+    python -m benchmarks.planetaryfit_bench
+"""
+import random
+from time import perf_counter
+
+from tsparser.planetaryfit import (G, MAX_RADIUS, MIN_RADIUS, FitAccumulator,
+                                   fit_mass_and_radius)
+
+SAMPLE_COUNTS = (1000, 10000, 100000)
+# The brute force is way too slow to be run for the whole radius range, so
+# it is timed for a few radii only and extrapolated.
+LEGACY_RADII_TIMED = 20
+# Number of samples added to the accumulator before refitting
+UPDATE_SIZE = 100
+
+
+def legacy_fit_mass_and_radius(accel_and_alt, radii):
+    best = {
+        'error': float('inf'),
+        'mass': 0,
+        'radius': 0
+    }
+
+    for radius in radii:
+        numerator, denominator = 0, 0
+        for acceleration, altitude in accel_and_alt:
+            numerator += (G * acceleration) / (radius + altitude)**2
+            denominator += G / (radius + altitude)**2
+        mass = numerator / denominator**2
+
+        error = 0
+        for acceleration, altitude in accel_and_alt:
+            error += (acceleration - G * mass / (radius + altitude)**2)**2
+
+        if error < best['error']:
+            best.update({
+                'error': error,
+                'mass': mass,
+                'radius': radius
+            })
+    return best
+
+
+def generate_samples(count):
+    return [(random.gauss(1, 0.05), round(random.uniform(0, 1000), 1))
+            for _ in range(count)]
+
+
+def main():
+    random.seed(0)
+    radii_count = MAX_RADIUS - MIN_RADIUS + 1
+    print('{:>8} {:>14} {:>16} {:>15}'.format('samples', 'vectorized [s]',
+                                              'legacy est. [s]',
+                                              'incremental [s]'))
+    for count in SAMPLE_COUNTS:
+        samples = generate_samples(count)
+        accelerations, altitudes = zip(*samples)
+
+        start = perf_counter()
+        fit_mass_and_radius(accelerations, altitudes)
+        vectorized_time = perf_counter() - start
+
+        start = perf_counter()
+        legacy_fit_mass_and_radius(samples, range(MIN_RADIUS,
+                                                  MIN_RADIUS + LEGACY_RADII_TIMED))
+        legacy_time = ((perf_counter() - start) / LEGACY_RADII_TIMED
+                       * radii_count)
+
+        accumulator = FitAccumulator()
+        for sample in samples[:-UPDATE_SIZE]:
+            accumulator.add(*sample)
+        start = perf_counter()
+        for sample in samples[-UPDATE_SIZE:]:
+            accumulator.add(*sample)
+        accumulator.fit()
+        incremental_time = perf_counter() - start
+
+        print('{:>8} {:>14.4f} {:>16.1f} {:>15.4f}'.format(
+            count, vectorized_time, legacy_time, incremental_time))
+
+
+if __name__ == '__main__':
+    main()
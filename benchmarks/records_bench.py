@@ -0,0 +1,64 @@
+"""
+Measure memory taken by records of a 1-hour flight kept as dicts, the way
+parsers used to produce them, compared with record objects.
+
+Run from the project root directory:
+    python -m benchmarks.records_bench
+"""
+import tracemalloc
+
+from tsparser.records import GPSRecord, IMURecord, SHTRecord
+
+FLIGHT_DURATION = 3600
+# Number of records per second
+IMU_RATE = 10
+GPS_RATE = 1
+SHT_RATE = 1
+TIMESTAMP = '2015-01-01T12:00:00.000000'
+
+
+def imu_fields(i):
+    return {'timestamp': TIMESTAMP, 'gyro_x': i % 1000, 'gyro_y': -413,
+            'gyro_z': -2545, 'accel_x': 14400, 'accel_y': 3328,
+            'accel_z': 5440 + i % 1000, 'magnet_x': 13310, 'magnet_y': -32001,
+            'magnet_z': 5118, 'pressure': 3981106 + i}
+
+
+def gps_fields(i):
+    return {'timestamp': TIMESTAMP, 'latitude': 48.1173 + i * 1e-6,
+            'longitude': 11.5 + i * 1e-6, 'altitude': 545.4 + i,
+            'quality': 'gps', 'direction': 84.4, 'speed_over_ground': 41.48,
+            'fix_type': '3d', 'pdop': 2.5, 'hdop': 1.3, 'vdop': 2.1,
+            'active_satellites': 8, 'satellites_in_view': 8}
+
+
+def sht_fields(i):
+    return {'timestamp': TIMESTAMP, 'temperature': 20.0 + i / 1000,
+            'humidity': 40.0 + i / 1000}
+
+
+def flight(make_imu, make_gps, make_sht):
+    return ([make_imu(**imu_fields(i))
+             for i in range(FLIGHT_DURATION * IMU_RATE)] +
+            [make_gps(**gps_fields(i))
+             for i in range(FLIGHT_DURATION * GPS_RATE)] +
+            [make_sht(**sht_fields(i))
+             for i in range(FLIGHT_DURATION * SHT_RATE)])
+
+
+def measure(description, make_imu, make_gps, make_sht):
+    tracemalloc.start()
+    records = flight(make_imu, make_gps, make_sht)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print('{:8} {:8.2f} MB, {:6.1f} bytes/record'.format(
+        description, size / 1e6, size / len(records)))
+
+
+def main():
+    measure('dicts', dict, dict, dict)
+    measure('records', IMURecord, GPSRecord, SHTRecord)
+
+
+if __name__ == '__main__':
+    main()
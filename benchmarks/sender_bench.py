@@ -0,0 +1,109 @@
+"""
+Measure how fast queued records are sent to a local stub HTTP server with
+different sender configurations.
+
+Run from the project root directory:
+    python -m benchmarks.sender_bench
+"""
+import os
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from threading import Thread
+from tempfile import TemporaryDirectory
+from time import perf_counter, sleep
+
+import requests
+
+from tsparser import config, sender
+from tsparser.spool import Spool
+
+RECORD_COUNT = 2000
+# Simulated server processing time (in seconds)
+SERVER_LATENCY = 0.002
+
+CONFIGURATIONS = (
+    # (description, function creating sender threads)
+    ('1 worker', lambda: thread_senders(1, 1)),
+    ('4 workers', lambda: thread_senders(4, 1)),
+    ('8 workers', lambda: thread_senders(8, 1)),
+    ('1 worker, batch 50', lambda: thread_senders(1, 50)),
+    ('4 workers, batch 50', lambda: thread_senders(4, 50)),
+    ('asyncio, 8 in flight', lambda: [sender.AsyncSender(8, daemon=True)]),
+    ('asyncio, 32 in flight', lambda: [sender.AsyncSender(32, daemon=True)]),
+)
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        sleep(SERVER_LATENCY)
+        self.send_response(201)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def sample_record(i):
+    return {'timestamp': '2015-01-01T12:00:00.000000', 'gyro_x': i,
+            'gyro_y': -i, 'gyro_z': 0, 'accel_x': 14400, 'accel_y': 3328,
+            'accel_z': 5440, 'magnet_x': 13310, 'magnet_y': -32001,
+            'magnet_z': 5118, 'pressure': 3981106}
+
+
+def measure_legacy(url):
+    """Single thread, new connection for every request"""
+    start = perf_counter()
+    for i in range(RECORD_COUNT):
+        requests.post(url, data=sample_record(i),
+                      auth=(config.USERNAME, config.PASSWORD))
+    return perf_counter() - start
+
+
+def thread_senders(workers, batch_size):
+    return [sender.Sender(batch_size=batch_size, batch_latency=0.05,
+                          daemon=True) for _ in range(workers)]
+
+
+def measure(url, senders):
+    start = perf_counter()
+    for s in senders:
+        s.start()
+    for i in range(RECORD_COUNT):
+        sender.send_data(sample_record(i), url)
+    sender.send_queue.join()
+    return perf_counter() - start
+
+
+def main():
+    directory = TemporaryDirectory()
+    server = StubServer(('127.0.0.1', 0), StubHandler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    url = 'http://127.0.0.1:{}/imu'.format(server.server_address[1])
+
+    print('{:<24} {:>10} {:>14}'.format('configuration', 'time [s]',
+                                        'records/s'))
+    legacy_time = measure_legacy(url)
+    print('{:<24} {:>10.3f} {:>14.0f}'.format('legacy (no session)',
+                                              legacy_time,
+                                              RECORD_COUNT / legacy_time))
+    for description, create_senders in CONFIGURATIONS:
+        if 'asyncio' in description and sender.aiohttp is None:
+            continue
+        # Senders of previous configuration are still running, so a fresh
+        # queue is used for each one
+        sender.send_queue = Spool(os.path.join(directory.name, description))
+        elapsed = measure(url, create_senders())
+        print('{:<24} {:>10.3f} {:>14.0f}'.format(description, elapsed,
+                                                  RECORD_COUNT / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Measure end-to-end latency of passing lines from the receiver to the parser
+for each input mode, compared with the readline and sleep loop that used to
+follow raw data file.
+
+Run from the project root directory:
+    python -m benchmarks.stream_bench
+"""
+import os
+from tempfile import TemporaryDirectory
+from threading import Thread
+from time import perf_counter, process_time, sleep
+
+from tsparser import stream
+from tsreceiver.stream import LineStreamer
+
+LINE_COUNT = 1000
+# Time (in seconds) between lines coming from the serial device
+LINE_INTERVAL = 0.002
+
+
+def legacy_lines(filename):
+    input_file = open(filename, 'r')
+    while True:
+        line = input_file.readline()
+        if not line:
+            sleep(0.01)
+            continue
+        yield line
+
+
+def write_to_file(filename):
+    with open(filename, 'a') as raw:
+        for line in generate_lines():
+            raw.write(line)
+            raw.flush()
+
+
+def write_to_stream(path):
+    streamer = LineStreamer(path, reconnect_interval=0)
+    for line in generate_lines():
+        while not streamer.write(line):
+            pass  # wait for the parser
+    streamer.close()
+
+
+def generate_lines():
+    for _ in range(LINE_COUNT):
+        sleep(LINE_INTERVAL)
+        # The sending time is carried in the line itself
+        yield '$SHT,{!r},{}\r\n'.format(perf_counter(), 'x' * 40)
+
+
+def measure(description, lines, writer, path):
+    Thread(target=writer, args=(path,), daemon=True).start()
+    latencies = list()
+    start_cpu_time = process_time()
+    for line in lines:
+        latencies.append(perf_counter() - float(line.split(',')[1]))
+        if len(latencies) == LINE_COUNT:
+            break
+    cpu_time = process_time() - start_cpu_time
+    latencies.sort()
+    print('{:24} mean {:7.3f} ms, median {:7.3f} ms, max {:7.3f} ms, '
+          'CPU {:6.3f} s'.format(
+              description, sum(latencies) / len(latencies) * 1000,
+              latencies[len(latencies) // 2] * 1000, latencies[-1] * 1000,
+              cpu_time))
+
+
+def main():
+    with TemporaryDirectory() as directory:
+        def path(name):
+            return os.path.join(directory, name)
+
+        open(path('legacy'), 'w').close()
+        measure('legacy readline + sleep', legacy_lines(path('legacy')),
+                write_to_file, path('legacy'))
+
+        open(path('polling'), 'w').close()
+        inotify_init1 = stream._inotify_init1
+        stream._inotify_init1 = None
+        reader = stream.FileTailer(path('polling'))
+        stream._inotify_init1 = inotify_init1
+        measure('file, polling', reader.lines(), write_to_file,
+                path('polling'))
+
+        open(path('inotify'), 'w').close()
+        reader = stream.FileTailer(path('inotify'))
+        measure('file, inotify', reader.lines(), write_to_file,
+                path('inotify'))
+
+        reader = stream.PipeReader(path('pipe'))
+        measure('named pipe', reader.lines(), write_to_stream, path('pipe'))
+
+        reader = stream.SocketReader(path('socket'))
+        measure('Unix socket', reader.lines(), write_to_stream,
+                path('socket'))
+
+
+if __name__ == '__main__':
+    main()
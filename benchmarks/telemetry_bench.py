@@ -0,0 +1,61 @@
+"""
+Measure memory taken by IMU records kept as dicts, as parsers produce them,
+compared with the columnar telemetry table, and time of a time range query.
+
+Run from the project root directory:
+    python -m benchmarks.telemetry_bench
+"""
+from time import perf_counter
+import tracemalloc
+
+from tsparser.telemetry import SCHEMAS, Table
+
+RECORD_COUNT = 100000
+START_TIME = 1.4e9
+
+
+def sample_record(i):
+    return {'timestamp': START_TIME + i / 10, 'gyro_x': i % 1000,
+            'gyro_y': -i % 1000, 'gyro_z': 0, 'accel_x': 14400,
+            'accel_y': 3328, 'accel_z': 5440, 'magnet_x': 13310,
+            'magnet_y': -32001, 'magnet_z': 5118, 'pressure': 3981106 + i}
+
+
+def measure_memory(description, fill):
+    tracemalloc.start()
+    start = perf_counter()
+    container = fill()
+    elapsed = perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print('{:12} {:8.1f} bytes/record, {:6.2f} us/record to add'.format(
+        description, size / RECORD_COUNT, elapsed / RECORD_COUNT * 1e6))
+    return container
+
+
+def fill_table():
+    table = Table(SCHEMAS['imu'], 4096)
+    for i in range(RECORD_COUNT):
+        table.append(sample_record(i))
+    return table
+
+
+def main():
+    records = measure_memory('dicts', lambda: [sample_record(i) for i in
+                                               range(RECORD_COUNT)])
+    table = measure_memory('table', fill_table)
+
+    query_start = START_TIME + RECORD_COUNT / 20
+    start = perf_counter()
+    selected = [record for record in records
+                if query_start <= record['timestamp'] < query_start + 60]
+    print('dicts query: {:8.3f} ms ({} records)'.format(
+        (perf_counter() - start) * 1000, len(selected)))
+    start = perf_counter()
+    selected = table.query(query_start, query_start + 60)
+    print('table query: {:8.3f} ms ({} records)'.format(
+        (perf_counter() - start) * 1000, len(selected['timestamp'])))
+
+
+if __name__ == '__main__':
+    main()
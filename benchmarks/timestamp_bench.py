@@ -0,0 +1,58 @@
+"""
+Measure per-line cost of timestamps: appending them in the receiver and
+reading them in the parser, as ISO strings (as it used to be done) compared
+with numbers, and formatting numeric timestamps of records sent to the
+server.
+
+Run from the project root directory:
+    python -m benchmarks.timestamp_bench
+"""
+from datetime import datetime
+from time import perf_counter
+
+from tsparser.timestamp import DT_FORMAT, format_timestamp, now, \
+    parse_timestamp
+
+COUNT = 100000
+# Timestamps of records sent to the server, 10 per second
+TIMESTAMPS = [1420113600.0 + i / 10 for i in range(COUNT)]
+
+
+def measure(description, function):
+    start = perf_counter()
+    for _ in range(COUNT):
+        function()
+    elapsed = perf_counter() - start
+    print('{:32} {:8.3f} us/line'.format(description,
+                                         elapsed / COUNT * 1e6))
+
+
+def measure_formatting(description, format_function):
+    start = perf_counter()
+    for timestamp in TIMESTAMPS:
+        format_function(timestamp)
+    elapsed = perf_counter() - start
+    print('{:32} {:8.3f} us/record'.format(description,
+                                           elapsed / COUNT * 1e6))
+
+
+def main():
+    measure('receiver: strftime',
+            lambda: datetime.now().strftime(DT_FORMAT))
+    measure('receiver: number', lambda: '{:.6f}'.format(now()))
+    iso_timestamp = datetime.now().strftime(DT_FORMAT)
+    numeric_timestamp = '{:.6f}'.format(now())
+    measure('parser: day seconds by slicing',
+            lambda: (int(iso_timestamp[11:13]) * 3600 +
+                     int(iso_timestamp[14:16]) * 60 +
+                     int(iso_timestamp[17:19]) +
+                     int(iso_timestamp[20:]) / 1e6))
+    measure('parser: number', lambda: parse_timestamp(numeric_timestamp))
+    measure_formatting('sender: fromtimestamp, strftime',
+                       lambda timestamp: datetime.fromtimestamp(
+                           timestamp).strftime(DT_FORMAT))
+    measure_formatting('sender: cached', format_timestamp)
+
+
+if __name__ == '__main__':
+    main()
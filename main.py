@@ -5,13 +5,21 @@ from tsparser import main
 from tsparser.ui import UserInterface
 from tsparser.utils.statistic_data_collector import StatisticDataCollector
 
-UserInterface().run()
-try:
-    main.init()
-    main.parse()
-except Exception:
-    logger = StatisticDataCollector().get_logger()
-    logger.log('system', traceback.format_exc())
-    logger.log('system', 'System has crashed. Please exit manually.')
-    while True:
-        sleep(1)
+
+def run():
+    UserInterface().run()
+    try:
+        main.init()
+        main.parse()
+    except Exception:
+        logger = StatisticDataCollector().get_logger()
+        logger.log('system', traceback.format_exc())
+        logger.log('system', 'System has crashed. Please exit manually.')
+        while True:
+            sleep(1)
+
+
+# Photos are converted in spawned processes, which import this script again
+# (as __mp_main__), so nothing may be started on import
+if __name__ == '__main__':
+    run()
@@ -1,5 +1,22 @@
 # Name of file, which contain raw data from receiver
 RAW_DATA_FILENAME = 'raw_data'
+# Where raw data are read from: 'file' (RAW_DATA_FILENAME is followed as
+# the receiver appends to it), 'pipe' (named pipe INPUT_STREAM_PATH),
+# 'socket' (Unix socket INPUT_STREAM_PATH) or 'receiver' (the receiver runs
+# in parser's process and RAW_DATA_FILENAME is written, not read). The
+# receiver must have its STREAM_PATH set to the same path for 'pipe' and
+# 'socket'.
+INPUT_MODE = 'file'
+INPUT_STREAM_PATH = 'raw_data.sock'
+# Maximal number of bytes of raw data read at once
+INPUT_CHUNK_SIZE = 64 * 1024
+# Maximal number of lines waiting for the parser in 'receiver' input mode;
+# the oldest ones are dropped (but still written to RAW_DATA_FILENAME) when
+# it is exceeded
+RING_BUFFER_SIZE = 4096
+# Time (in seconds) between writes to RAW_DATA_FILENAME in 'receiver' input
+# mode
+RAW_DATA_FLUSH_INTERVAL = 0.5
 # Username and password required to perform POST requests
 USERNAME = 'client'
 PASSWORD = 'secret'
@@ -7,3 +24,83 @@ PASSWORD = 'secret'
 URL = "http://127.0.0.1:5000"
 # Name of file containing logs
 LOG_FILENAME = 'receiver.log'
+# Maximal number of log entries kept in memory (and shown by the user
+# interface); older ones are only in LOG_FILENAME
+LOG_BUFFER_SIZE = 10000
+# Time (in seconds) between writes of new log entries to LOG_FILENAME
+LOG_FLUSH_INTERVAL = 0.5
+# Name of file statistics of pipeline stages (durations of parsing, sending
+# etc.) are appended to when requested in the user interface
+STAGE_STATISTICS_FILENAME = 'stage_statistics.txt'
+# Whether time from receiving each line (its receiver timestamp) to parsing it
+# is measured, as 'receive_to_parse' stage. It is meaningful only if lines are
+# parsed live, on the host they are received on.
+RECEIVING_LATENCY_MEASURED = True
+# Port statistics are served on over HTTP (at /metrics path, in Prometheus
+# text format), or None if they should not be served
+METRICS_PORT = None
+# Address the metrics server listens on; '0.0.0.0' means all interfaces
+METRICS_ADDRESS = '0.0.0.0'
+# Whether parsed records are kept in the telemetry store
+TELEMETRY_ENABLED = True
+# Directory parsed records are stored in, in columnar format; None means they
+# are kept in memory only
+TELEMETRY_DIRECTORY = None
+# Number of records written to TELEMETRY_DIRECTORY at once
+TELEMETRY_CHUNK_SIZE = 4096
+# Fields of GPSRecord completing GPS fix: the fix is sent as soon as all of
+# them have been parsed. Empty tuple means fixes are completed only by the
+# other conditions: when sentence of the next fix (with different UTC time)
+# arrives, after GPS_LAST_SENTENCE, or after GPS_FIX_TIMEOUT.
+GPS_REQUIRED_FIELDS = ()
+# Type of NMEA sentence the receiver sends as the last one of each fix
+# (e.g. 'VTG'), or None
+GPS_LAST_SENTENCE = 'VTG'
+# Maximal time (in seconds) sentences of a GPS fix are collected for; the fix
+# is then sent even if no more GPS sentences arrive. None means no limit.
+GPS_FIX_TIMEOUT = 1.5
+# Whether planetary data are calculated from parsed data
+CALCULATOR_ENABLED = True
+# Altitudes closer than that (in meters) are grouped together when fitting
+# planet's mass and radius
+CALCULATOR_ALTITUDE_RESOLUTION = 0.1
+# Number of the most recent samples planet's mass and radius are fitted to;
+# None means all samples since start (memory use is then bounded by range of
+# altitudes instead)
+CALCULATOR_WINDOW = None
+# Minimal time (in seconds) between two planetary data calculations
+CALCULATOR_MIN_INTERVAL = 0.5
+# How requests are sent to the server: 'threads' (SENDER_WORKERS threads, each
+# sending one request at a time) or 'asyncio' (single thread keeping up to
+# SENDER_CONCURRENCY requests in flight; requires aiohttp and does not batch)
+SENDER_BACKEND = 'threads'
+# Number of threads sending requests to the server
+SENDER_WORKERS = 4
+# Maximal number of requests in flight when asyncio backend is used
+SENDER_CONCURRENCY = 32
+# Maximal number of records sent in a single request. Records (except photos)
+# for the same URL are then sent together as JSON list, so the server must
+# accept such requests. 1 disables batching.
+SENDER_BATCH_SIZE = 1
+# Maximal time (in seconds) a record can wait for the batch to be completed
+SENDER_BATCH_LATENCY = 0.5
+# Name of file storing requests that have not been sent yet
+SPOOL_FILENAME = 'send_spool.db'
+# Maximal size (in bytes) of requests waiting to be sent; the oldest ones are
+# dropped when it is exceeded. None means no limit.
+SPOOL_MAX_SIZE = 500 * 10**6
+# Delays (in seconds) before retrying failed request: the first one and
+# the maximal one
+SENDER_MIN_BACKOFF = 1
+SENDER_MAX_BACKOFF = 60
+# Number of attempts to send request rejected by the server before dropping it
+SENDER_MAX_ATTEMPTS = 5
+# Number of processes converting photos; 0 means photos are converted by
+# the parser itself
+PHOTO_WORKERS = 2
+# Maximal number of photos being converted at once; parsing waits when it is
+# reached
+PHOTO_MAX_PENDING = 4
+# Maximal (width, height) of photo thumbnails saved next to photos, or None
+# if thumbnails should not be created
+PHOTO_THUMBNAIL_SIZE = None
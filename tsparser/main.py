@@ -1,9 +1,9 @@
-from time import sleep
+from time import perf_counter
 import traceback
 
-from tsparser import config, panorama
-from tsparser.parser import BaseParser, GPSParser, IMUParser, SHTParser, PhotoParser
-from tsparser.sender import Sender
+from tsparser import config, metrics, panorama, pipeline, sender, stream
+from tsparser.parser import BaseParser, get_parser_classes
+from tsparser.timestamp import now, parse_timestamp
 from tsparser.utils import StatisticDataCollector
 
 
@@ -15,47 +15,94 @@ def parse(input_file=None):
     """
     Parse the file specified as input.
 
-    :param input_file: file to read input from. If None, then pipe specified
+    :param input_file: file to read input from. If None, then input specified
         in config is used
     :type input_file: file
     """
     StatisticDataCollector().get_logger().log('system', 'System has started!')
-    Sender(daemon=True).start()
-    if input_file is None:
-        input_file = open(config.RAW_DATA_FILENAME, 'r')
+    sender.start_senders()
+    if config.METRICS_PORT is not None:
+        metrics.start_metrics_server(config.METRICS_ADDRESS,
+                                     config.METRICS_PORT)
+        StatisticDataCollector().get_logger().log(
+            'system', 'Metrics are served on port {}'.format(
+                config.METRICS_PORT))
+    if input_file is None and config.INPUT_MODE == 'receiver':
+        records = pipeline.receive_records()
+    else:
+        records = ((line, line.split(','))
+                   for line in stream.open_input(input_file).lines())
 
     parsers = _get_parsers()
-    while True:
-        line = input_file.readline()
-        if not line:
-            sleep(0.01)
-            continue
-        _parse_line(parsers, line)
+    for line, values in records:
+        _parse_record(parsers, line, values)
 
 
 def _get_parsers():
-    return [
-        IMUParser(),
-        GPSParser(),
-        SHTParser(),
-        PhotoParser()
-    ]
+    """
+    Create instances of all registered parsers.
+
+    :return: dict mapping data ID to parser handling it
+    :rtype: dict
+    """
+    parsers = dict()
+    for parser_class in get_parser_classes():
+        parser = parser_class()
+        for data_id in parser.data_ids:
+            if data_id in parsers:
+                raise ValueError('{} is handled by both {} and {}'.format(
+                    data_id, parsers[data_id].__class__.__name__,
+                    parser_class.__name__))
+            parsers[data_id] = parser
+    return parsers
 
 
 def _parse_line(parsers, line, catch_exceptions=True):
-    StatisticDataCollector().on_new_received_data(line)
-    values = line.split(',')
-    BaseParser.timestamp = values.pop().strip()
-    for parser in parsers:
-        try:
+    _parse_record(parsers, line, line.split(','), catch_exceptions)
+
+
+def _parse_record(parsers, line, values, catch_exceptions=True):
+    """
+    :param parsers: dict returned by _get_parsers
+    :type parsers: dict
+    :param line: line of input
+    :type line: str
+    :param values: line split by commas; the list is modified
+    :type values: list
+    """
+    sdc = StatisticDataCollector()
+    sdc.on_new_received_data(line)
+    try:
+        BaseParser.timestamp = parse_timestamp(values.pop())
+    except ValueError:
+        if not catch_exceptions:
+            raise
+        sdc.on_parse_error('system', 'InvalidTimestamp')
+        sdc.get_logger().log('system',
+                             'Invalid timestamp in line: {}'.format(line))
+        return
+    parser = parsers.get(values[0]) if values else None
+    try:
+        if parser is not None:
+            parse_start = perf_counter()
             if parser.parse(line, *values):
-                break
-        except Exception:
-            if catch_exceptions:
-                StatisticDataCollector().get_logger().log(
-                    parser.__class__.__name__, traceback.format_exc())
-            else:
-                raise
-    else:
-        error_message = 'Output line was not parsed by any parser: {}'.format(line)
-        StatisticDataCollector().get_logger().log('system', error_message)
+                parse_end = perf_counter()
+                # Clocks of the receiver and the parser may differ slightly
+                receiving_latency = (max(0.0, now() - BaseParser.timestamp)
+                                     if config.RECEIVING_LATENCY_MEASURED
+                                     else None)
+                # Counted as parsed line of the parser
+                sdc.on_line_parsed('parse/' + parser.__class__.__name__,
+                                   parse_end - parse_start, receiving_latency)
+                return
+    except Exception as exception:
+        sdc.on_parse_error(parser.__class__.__name__,
+                           exception.__class__.__name__)
+        if catch_exceptions:
+            sdc.get_logger().log(parser.__class__.__name__,
+                                 traceback.format_exc())
+            return
+        raise
+    sdc.on_parse_error('system', 'NotParsed')
+    error_message = 'Output line was not parsed by any parser: {}'.format(line)
+    sdc.get_logger().log('system', error_message)
@@ -0,0 +1,138 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+from tsparser.utils import StatisticDataCollector
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Only every HISTOGRAM_BUCKETS_STEP-th bound of buckets of stage histograms
+# is exported, so bounds of exported buckets are 1, 2, 4, 8... microseconds
+HISTOGRAM_BUCKETS_STEP = 8
+
+
+def format_metrics():
+    """
+    Serialize current statistics, statistics of stages and counts of log
+    messages in Prometheus text exposition format. All metric names start
+    with 'tsparser_'.
+
+    :return: metrics, one sample per line
+    :rtype: str
+    """
+    sdc = StatisticDataCollector()
+    statistics = sdc.get_statistics()
+    histograms = sdc.get_stage_histograms()
+    lines = list()
+
+    def add(name, metric_type, description, samples):
+        """
+        :param samples: list of tuples (labels dict, value)
+        """
+        lines.append('# HELP tsparser_{} {}'.format(name, description))
+        lines.append('# TYPE tsparser_{} {}'.format(name, metric_type))
+        for labels, value in samples:
+            lines.append(_format_sample('tsparser_' + name, labels, value))
+
+    add('uptime_seconds', 'gauge', 'Time since the parser has started.',
+        [({}, statistics.time_since_start.total_seconds())])
+    add('seconds_since_last_data', 'gauge',
+        'Time since the last line has been received.',
+        [({}, statistics.time_since_last_data_receiving.total_seconds())])
+    add('received_lines_total', 'counter', 'Lines received from the probe.',
+        [({}, statistics.total_lines_received)])
+    add('received_bytes_total', 'counter', 'Bytes received from the probe.',
+        [({}, statistics.total_data_received)])
+    add('parsed_lines_total', 'counter',
+        'Lines parsed by each parser successfully.',
+        [({'parser': stage[len('parse/'):]}, histogram.count)
+         for stage, histogram in sorted(histograms.items())
+         if stage.startswith('parse/')])
+    add('parse_errors_total', 'counter',
+        "Lines which failed to be parsed, by parser ('system' if the line "
+        "was not passed to any) and type of error.",
+        [({'parser': parser_name, 'type': error_type}, count)
+         for (parser_name, error_type), count
+         in sorted(sdc.get_parse_errors().items())])
+    add('queued_requests', 'gauge', 'Requests waiting to be sent.',
+        [({}, statistics.count_of_queued_requests)])
+    add('requests_in_flight', 'gauge', 'Requests being sent at the moment.',
+        [({}, statistics.count_of_requests_in_flight)])
+    add('sent_requests_total', 'counter', 'Requests sent successfully.',
+        [({}, statistics.total_count_of_sent_requests)])
+    add('failed_requests_total', 'counter',
+        'Requests rejected by the server or not delivered to it.',
+        [({}, statistics.total_count_of_failed_requests)])
+    add('dropped_requests_total', 'counter',
+        'Requests dropped without being sent.',
+        [({}, statistics.total_count_of_dropped_requests)])
+    add('log_messages_total', 'counter', 'Messages logged by each module.',
+        [({'module': module_name}, count) for module_name, count
+         in sorted(sdc.get_logger().get_log_counts().items())])
+
+    lines.append('# HELP tsparser_stage_seconds Durations of pipeline '
+                 "stages; 'receive_to_parse' and 'calculator_lag' are times "
+                 'since data were received.')
+    lines.append('# TYPE tsparser_stage_seconds histogram')
+    for stage, histogram in sorted(histograms.items()):
+        for bound, count in histogram.get_cumulative_counts(
+                HISTOGRAM_BUCKETS_STEP):
+            lines.append(_format_sample('tsparser_stage_seconds_bucket', {
+                'stage': stage, 'le': _format_value(bound)}, count))
+        lines.append(_format_sample('tsparser_stage_seconds_sum',
+                                    {'stage': stage}, histogram.sum))
+        lines.append(_format_sample('tsparser_stage_seconds_count',
+                                    {'stage': stage}, histogram.count))
+    return '\n'.join(lines) + '\n'
+
+
+def _format_sample(name, labels, value):
+    if not labels:
+        return '{} {}'.format(name, _format_value(value))
+    return '{}{{{}}} {}'.format(name, ','.join(
+        '{}="{}"'.format(label, _escape_label_value(label_value))
+        for label, label_value in labels.items()), _format_value(value))
+
+
+def _format_value(value):
+    if isinstance(value, str):  # already formatted
+        return value
+    if value == float('inf'):
+        return '+Inf'
+    return repr(value)
+
+
+def _escape_label_value(value):
+    return (value.replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = format_metrics().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # the terminal is used by the user interface
+
+
+def start_metrics_server(address, port):
+    """
+    Serve metrics returned by format_metrics at /metrics path, in
+    a background thread.
+
+    :param address: address to listen on ('' or '0.0.0.0' for all interfaces)
+    :type address: str
+    :param port: port to listen on (0 for any free one)
+    :type port: int
+    :return: running server; its shutdown method stops it
+    :rtype: http.server.ThreadingHTTPServer
+    """
+    server = ThreadingHTTPServer((address, port), _MetricsRequestHandler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    return server
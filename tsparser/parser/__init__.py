@@ -3,6 +3,9 @@ from abc import ABCMeta, abstractmethod
 
 class BaseParser(metaclass=ABCMeta):
     timestamp = None
+    # IDs of data (like '$GYRO') the parser handles; lines are passed only to
+    # the parser handling their data ID
+    data_ids = frozenset()
 
     @abstractmethod
     def parse(self, line, data_id, *values):
@@ -22,6 +25,30 @@ class BaseParser(metaclass=ABCMeta):
         """
 
 
+_parser_classes = list()
+
+
+def register_parser(parser_class):
+    """
+    Class decorator registering parser, so it is used for parsing input. Each
+    data ID can be handled by one registered parser only.
+
+    :param parser_class: BaseParser subclass with data_ids set
+    :type parser_class: type
+    :return: parser_class
+    """
+    _parser_classes.append(parser_class)
+    return parser_class
+
+
+def get_parser_classes():
+    """
+    :return: all registered parser classes, in order of registration
+    :rtype: list
+    """
+    return list(_parser_classes)
+
+
 class ParseException(Exception):
     """
     Raised when an error occurred during parsing the output. Usually means a
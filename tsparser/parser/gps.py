@@ -1,118 +1,236 @@
-from tsparser.parser import BaseParser
-from tsparser import config, sender, planetarydata
+from threading import Condition, Lock, Thread
+from time import monotonic
+import traceback
 
+import numpy as np
 
+from tsparser.parser import BaseParser, nmea, register_parser
+from tsparser import config, sender, planetarydata, telemetry
+from tsparser.records import GPSRecord
+from tsparser.utils import StatisticDataCollector
+
+
+@register_parser
 class GPSParser(BaseParser):
+    """
+    Parser of NMEA sentences of any GNSS constellation (see nmea.TALKER_IDS).
+
+    Sentences are assembled into fixes by their UTC time; sentences without
+    time (like $GSA or $GSV) belong to the fix being assembled. The fix is
+    sent when it is complete according to config.GPS_REQUIRED_FIELDS,
+    config.GPS_LAST_SENTENCE and config.GPS_FIX_TIMEOUT, or when sentence of
+    the next fix arrives - so losing any sentence costs only the data it
+    carries. Fixes without any timed sentence are dropped. The timeout is
+    checked by a watchdog thread, so the last fix is sent even if GPS
+    sentences stop coming.
+
+    Multi-part GSV messages are assembled, so the record contains mean SNR
+    of satellites in view, and satellites of the last complete message of
+    each talker are available in satellites attribute.
+    """
+    data_ids = nmea.get_data_ids()
     url = config.URL + '/gps'
 
     def __init__(self):
-        self.data = {}
+        self.data = GPSRecord()
+        self.satellites = dict()  # talker -> list of nmea.Satellite
+        self.__gsv_assembler = nmea.GSVAssembler()
+        self.__satellites_in_view = dict()  # talker -> count
+        self.__snrs = list()  # SNRs of satellites in view of current fix
+        self.__fix_time = None  # UTC time of current fix
+        self.__fix_started = False  # whether any sentence of it has come
+        # Monotonic time current fix times out at; None if it does not
+        self.__fix_deadline = None
+        # Fix can be completed by the watchdog thread as well
+        self.__lock = Lock()
+        self.__fix_started_condition = Condition(self.__lock)
+        self.__watchdog = None
+        self.__watchdog_idle = False  # waiting for fix without deadline
+        self.__sent_fix_time = None
+        # Lines with invalid checksum among ones validated in advance; None
+        # if checksums are validated line by line
+        self.__invalid_checksum_lines = None
+        self.__sentence_parsers = {
+            'GGA': self.__parse_gga, 'GSA': self.__parse_gsa,
+            'GSV': self.__parse_gsv, 'RMC': self.__parse_rmc,
+            'VTG': self.__parse_vtg, 'GLL': self.__parse_gll,
+            'ZDA': self.__parse_zda,
+        }
 
     def parse(self, line, data_id, *values):
-        if data_id not in ['$GPGGA', '$GPGSA', '$GPGSV', '$GPRMC', '$GPVTG']:
+        if data_id not in self.data_ids:
             return False
 
-        if not _checksum_valid(line):
+        invalid_checksum_lines = self.__invalid_checksum_lines
+        if (line in invalid_checksum_lines
+                if invalid_checksum_lines is not None
+                else not _checksum_valid(line)):
             raise ValueError('Calculated GPS checksum does not equal the one '
                              'provided in output')
         values = list(values)
         # Remove checksum from last value
         values[-1] = values[-1][:values[-1].rindex('*')]
 
-        if data_id == '$GPGGA':  # Fix data
-            (_,  # UTC timestamp
-             latitude, latitude_dir,
-             longitude, longitude_dir,
-             quality, satellites, hdop,
-             altitude, _,  # Altitude unit (always meters)
-             _, _,  # Geoidal separation - value and unit (not used)
-             _, _  # Diff. station last update time and ID (not used)
-             ) = values
-            if int(quality) == 0:  # no fix
-                self.data.update({
-                    'quality': 'no_fix',
-                    'active_satellites': int(satellites)
-                })
-            else:
-                self.data.update({
-                    'latitude': _parse_latitude(latitude, latitude_dir),
-                    'longitude': _parse_longitude(longitude, longitude_dir),
-                    'quality': _parse_quality(quality),
-                    'active_satellites': int(satellites),
-                    'hdop': float(hdop),
-                    'altitude': float(altitude)
-                })
-        elif data_id == '$GPGSA':  # DOP and active satellites
-            if int(values[1]) == 1:  # no fix
-                self.data.update({
-                    'fix_type': 'no_fix'
-                })
-            else:
-                self.data.update({
-                    'fix_type': _parse_fix_type(values[1]),
-                    'pdop': float(values[-3]),
-                    'hdop': float(values[-2]),
-                    'vdop': float(values[-1])
-                })
-        elif data_id == '$GPGSV':  # Satellites in View
-            self.data['satellites_in_view'] = int(values[2])
-        elif data_id == '$GPRMC':  # Recommended Minimum (Pos, Vel, Time)
-            if self.data['quality'] != 'no_fix':
-                self.data.update({
-                    'speed_over_ground': _parse_speed(values[6]),
-                    'direction': float(values[7])
-                })
-        elif data_id == '$GPVTG':  # Velocity made good
-            # Nothing interesting here, but it's the last message before the
-            # next $GPGGA, so we can send the data we've obtained
-            self.data['timestamp'] = BaseParser.timestamp
-            sender.send_data(self.data, self.url)
-            planetarydata.Calculator().on_data_update('gps', self.data)
-            self.data = {}
+        sentence = nmea.parse_sentence(data_id, values)
+        with self.__lock:
+            utc_time = getattr(sentence, 'utc_time', None)
+            if utc_time is not None:
+                if utc_time == self.__sent_fix_time:
+                    return True  # late sentence of fix which has been sent
+                if (self.__fix_time is not None and
+                        utc_time != self.__fix_time):
+                    self.__complete_fix()
+                self.__fix_time = utc_time
+            if not self.__fix_started:
+                self.__start_fix()
+
+            self.data.timestamp = BaseParser.timestamp
+            self.__sentence_parsers[sentence.sentence_type](sentence)
+            required_fields = config.GPS_REQUIRED_FIELDS
+            if (sentence.sentence_type == config.GPS_LAST_SENTENCE or
+                    required_fields and all(
+                        getattr(self.data, field) is not None
+                        for field in required_fields)):
+                self.__complete_fix()
         return True
 
+    def validate_checksums_in_advance(self, lines):
+        """
+        Validate checksums of GPS sentences among lines which are going to be
+        parsed next all at once (see validate_checksums), instead of one by
+        one when they are parsed. Lines validated by the previous call are
+        forgotten.
 
-def _parse_latitude(latitude, latitude_dir):
-    return _parse_coord(latitude, latitude_dir, 'N', 'S')
+        :param lines: lines of input to be parsed next; None to validate
+            checksums line by line again
+        :type lines: list
+        """
+        if lines is None:
+            self.__invalid_checksum_lines = None
+            return
+        gps_lines = [line for line in lines
+                     if line.partition(',')[0] in self.data_ids]
+        self.__invalid_checksum_lines = {
+            line for line, valid in zip(gps_lines,
+                                        validate_checksums(gps_lines))
+            if not valid}
 
+    def __start_fix(self):
+        self.__fix_started = True
+        if config.GPS_FIX_TIMEOUT is not None:
+            self.__fix_deadline = monotonic() + config.GPS_FIX_TIMEOUT
+            if self.__watchdog is None:
+                self.__watchdog = Thread(target=self.__watch_fix_deadline,
+                                         daemon=True)
+                self.__watchdog.start()
+            elif self.__watchdog_idle:
+                # Otherwise it wakes up at the previous deadline anyway
+                self.__fix_started_condition.notify()
 
-def _parse_longitude(longitude, longitude_dir):
-    return _parse_coord(longitude, longitude_dir, 'E', 'W')
+    def __watch_fix_deadline(self):
+        """
+        Complete fixes which have timed out, for as long as the program runs.
+        One thread serves all fixes, so no thread is started per fix.
+        """
+        with self.__lock:
+            while True:
+                deadline = self.__fix_deadline
+                if deadline is None:
+                    self.__watchdog_idle = True
+                    self.__fix_started_condition.wait()
+                    self.__watchdog_idle = False
+                elif monotonic() < deadline:
+                    # The fix may be completed and the next one started in
+                    # the meantime, which is checked after waking up
+                    self.__fix_started_condition.wait(deadline - monotonic())
+                else:
+                    try:
+                        self.__complete_fix()
+                    except Exception:
+                        StatisticDataCollector().get_logger().log(
+                            self.__class__.__name__, traceback.format_exc())
+
+    def __complete_fix(self):
+        self.__fix_deadline = None
+        self.__fix_started = False
+        if self.__fix_time is not None:
+            sender.send_data(self.data, self.url)
+            planetarydata.Calculator().on_data_update('gps', self.data)
+            if config.TELEMETRY_ENABLED:
+                telemetry.TelemetryStore().append('gps', self.data)
+            self.__sent_fix_time = self.__fix_time
+        self.data = GPSRecord()
+        self.__satellites_in_view = dict()
+        self.__snrs = list()
+        self.__fix_time = None
 
+    def __parse_gga(self, sentence):  # Fix data
+        data = self.data
+        data.quality = sentence.quality
+        data.active_satellites = sentence.active_satellites
+        if data.quality != 'no_fix':
+            data.latitude = sentence.latitude
+            data.longitude = sentence.longitude
+            data.hdop = sentence.hdop
+            data.altitude = sentence.altitude
 
-def _parse_coord(coord, coord_dir, positive_sign, negative_sign):
-    """
-    Convert coordinate to single float value, replacing degree minutes with
-    decimal fraction and taking into consideration the direction specified
-
-    :param coord: coordinate string
-    :type coord: str
-    :param coord_dir: direction
-    :param positive_sign: direction when coordinate is positive
-    :param negative_sign: direction when coordinate is negative
-    :rtype: float
-    """
-    dot = coord.index('.')
-    if coord_dir != positive_sign and coord_dir != negative_sign:
-        raise ValueError("Coordinate direction '{}' is neither '{}' nor '{}'"
-                         .format(coord_dir, positive_sign, negative_sign))
+    def __parse_gsa(self, sentence):  # DOP and active satellites
+        data = self.data
+        data.fix_type = sentence.fix_type
+        if data.fix_type != 'no_fix':
+            data.pdop = sentence.pdop
+            data.hdop = sentence.hdop
+            data.vdop = sentence.vdop
 
-    sign = 1 if coord_dir == positive_sign else -1
-    return sign * (float(coord[:dot - 2]) + float(coord[dot - 2:]) / 60)
+    def __parse_gsv(self, sentence):  # Satellites in View
+        self.__satellites_in_view[sentence.talker] = \
+            sentence.satellites_in_view
+        self.data.satellites_in_view = sum(self.__satellites_in_view.values())
+        satellites = self.__gsv_assembler.add(sentence)
+        if satellites is not None:
+            self.satellites[sentence.talker] = satellites
+            self.__snrs.extend(satellite.snr for satellite in satellites
+                               if satellite.snr is not None)
+            if self.__snrs:
+                self.data.mean_snr = sum(self.__snrs) / len(self.__snrs)
 
+    def __parse_rmc(self, sentence):  # Recommended Minimum (Pos, Vel, Time)
+        if sentence.status == 'A':
+            data = self.data
+            data.speed_over_ground = sentence.speed_over_ground
+            data.direction = sentence.direction
+            if data.latitude is None:  # $GGA has been lost
+                data.latitude = sentence.latitude
+                data.longitude = sentence.longitude
 
-def _parse_quality(quality):
-    return ['no_fix', 'gps', 'dgps'][int(quality)]
+    def __parse_vtg(self, sentence):  # Velocity made good
+        # Used only if $RMC has been lost
+        data = self.data
+        if (data.speed_over_ground is None and sentence.mode != 'N' and
+                data.quality != 'no_fix'):
+            data.speed_over_ground = sentence.speed_over_ground
+            data.direction = sentence.direction
 
+    def __parse_gll(self, sentence):  # Geographic position
+        # Used only by receivers not sending $GGA
+        if self.data.latitude is None and sentence.status == 'A':
+            self.data.latitude = sentence.latitude
+            self.data.longitude = sentence.longitude
 
-def _parse_fix_type(mode):
-    # I have literally no idea why quality is indexed from 0, but mode from 1
-    return ['no_fix', '2d', '3d'][int(mode) - 1]
+    def __parse_zda(self, sentence):  # Time and date
+        pass  # Only UTC time is used, to assemble the fix
 
 
-def _parse_speed(speed_in_knots):
-    """Convert speed in knots to km/h"""
-    return float(speed_in_knots) * 1.852
+_HEX_CHECKSUMS = tuple('%.2X' % checksum for checksum in range(256))
+_FOLDED_BITS = 1024
+_FOLDED_MASK = (1 << _FOLDED_BITS) - 1
+# (shift, mask) pairs folding 128 bytes into one
+_FOLDS = tuple((bits, (1 << bits) - 1) for bits in (512, 256, 128, 64, 32,
+                                                    16, 8))
+# Value of uppercase hex digit (as in checksum) for each byte; -1 otherwise
+_HEX_DIGIT_VALUES = np.full(256, -1, np.int16)
+for _digit in '0123456789ABCDEF':
+    _HEX_DIGIT_VALUES[ord(_digit)] = int(_digit, 16)
 
 
 def _checksum_valid(line):
@@ -122,7 +240,9 @@ def _checksum_valid(line):
     transmission errors.
 
     The checksum is XOR of all bytes between $ and * characters
-    (excluding themselves).
+    (excluding themselves). Instead of XOR-ing them one by one, the bytes
+    are taken as one big integer, which is folded in halves until only one
+    byte is left.
 
     :param line: line of output to check
     :type line: str
@@ -131,9 +251,50 @@ def _checksum_valid(line):
     """
     l = line.index('$')
     r = line.rindex('*')
-    chksum = 0
-    for char in line[l + 1: r]:
-        chksum ^= ord(char)
-    if line[r + 1: r + 3] == '%.2X' % chksum:
-        return True
-    return False
+    data = int.from_bytes(line[l + 1: r].encode('latin-1', 'replace'),
+                          'little')
+    while data >> _FOLDED_BITS:  # longer than any NMEA sentence
+        data = (data & _FOLDED_MASK) ^ (data >> _FOLDED_BITS)
+    for shift, mask in _FOLDS:
+        data = (data ^ (data >> shift)) & mask
+    return line[r + 1: r + 3] == _HEX_CHECKSUMS[data]
+
+
+def validate_checksums(lines):
+    """
+    Check checksums of many lines of GPS output at once, which is much faster
+    than checking them one by one.
+
+    :param lines: lines of output to check
+    :type lines: list
+    :return: array of bools, True for each line that has valid checksum.
+        Unlike _checksum_valid, lines without $ or * (or with * before $)
+        are just invalid.
+    :rtype: numpy.ndarray
+    """
+    if not lines:
+        return np.zeros(0, bool)
+    output = np.frombuffer(('\n'.join(lines) + '\n').encode('latin-1',
+                                                            'replace'),
+                           np.uint8)
+    line_ends = np.flatnonzero(output == ord('\n'))
+    line_starts = np.concatenate(([0], line_ends[:-1] + 1))
+    dollars = np.flatnonzero(output == ord('$'))
+    stars = np.flatnonzero(output == ord('*'))
+    if not len(dollars) or not len(stars):
+        return np.zeros(len(lines), bool)
+
+    # The first $ and the last * of each line
+    l = dollars[np.minimum(np.searchsorted(dollars, line_starts),
+                           len(dollars) - 1)]
+    r = stars[np.maximum(np.searchsorted(stars, line_ends) - 1, 0)]
+    valid = (l >= line_starts) & (l < r) & (r + 2 < line_ends)
+    r = np.where(valid, r, l + 1)  # any position within the output
+
+    # XOR of bytes between $ and * is difference of the cumulative XORs
+    cumulative_xor = np.bitwise_xor.accumulate(output)
+    checksums = cumulative_xor[r - 1] ^ cumulative_xor[l]
+    high_digits = _HEX_DIGIT_VALUES[output[np.minimum(r + 1, len(output) - 1)]]
+    low_digits = _HEX_DIGIT_VALUES[output[np.minimum(r + 2, len(output) - 1)]]
+    return (valid & (high_digits >= 0) & (low_digits >= 0) &
+            (high_digits * 16 + low_digits == checksums))
@@ -1,5 +1,6 @@
-from tsparser.parser import BaseParser
-from tsparser import config, sender, planetarydata
+from tsparser.parser import BaseParser, register_parser
+from tsparser import config, sender, planetarydata, telemetry
+from tsparser.records import IMURecord
 
 
 def uint2int(value):
@@ -9,7 +10,9 @@ def uint2int(value):
     else:
         return value - 65536
 
+@register_parser
 class IMUParser(BaseParser):
+    data_ids = frozenset({'$GYRO', '$ACCEL', '$MAGNET', '$MBAR'})
     url = config.URL + '/imu'
 
     def __init__(self):
@@ -35,6 +38,8 @@ class IMUParser(BaseParser):
             data = self.generate_data()
             sender.send_data(data, IMUParser.url)
             planetarydata.Calculator().on_data_update('imu', data)
+            if config.TELEMETRY_ENABLED:
+                telemetry.TelemetryStore().append('imu', data)
             self.gyro = self.accel = self.magnet = self.pressure = None
 
         return True
@@ -54,20 +59,20 @@ class IMUParser(BaseParser):
         return [int(x) for x in values]
 
     def generate_data(self):
-        return {
-            'timestamp': BaseParser.timestamp,
+        return IMURecord(
+            timestamp=BaseParser.timestamp,
 
-            'gyro_x': self.gyro[0],
-            'gyro_y': self.gyro[1],
-            'gyro_z': self.gyro[2],
+            gyro_x=self.gyro[0],
+            gyro_y=self.gyro[1],
+            gyro_z=self.gyro[2],
 
-            'accel_x': self.accel[0],
-            'accel_y': self.accel[1],
-            'accel_z': self.accel[2],
+            accel_x=self.accel[0],
+            accel_y=self.accel[1],
+            accel_z=self.accel[2],
 
-            'magnet_x': self.magnet[0],
-            'magnet_y': self.magnet[1],
-            'magnet_z': self.magnet[2],
+            magnet_x=self.magnet[0],
+            magnet_y=self.magnet[1],
+            magnet_z=self.magnet[2],
 
-            'pressure': self.pressure
-        }
+            pressure=self.pressure
+        )
@@ -0,0 +1,273 @@
+"""
+Decoding of NMEA 0183 sentences sent by GNSS receivers.
+
+Sentences keep their fields as strings and decode them only when they are
+read, so fields nobody is interested in cost nothing.
+"""
+from collections import namedtuple
+
+# GPS, GLONASS, Galileo, BeiDou (both IDs), QZSS and multi-constellation fix
+TALKER_IDS = ('GP', 'GL', 'GA', 'BD', 'GB', 'QZ', 'GN')
+
+Satellite = namedtuple('Satellite', 'talker prn elevation azimuth snr')
+
+
+class LazyField:
+    """
+    Field of sentence decoded when it is read for the first time. The value
+    is cached in the sentence then. Empty fields are None.
+    """
+
+    def __init__(self, decode, *indexes):
+        """
+        :param decode: function taking raw values of the fields at indexes
+        :type decode: collections.Callable
+        :param indexes: indexes of fields the value is decoded from
+        :type indexes: int
+        """
+        self.decode = decode
+        self.indexes = indexes
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, sentence, owner):
+        if sentence is None:
+            return self
+        raw_values = [sentence.get_raw(index) for index in self.indexes]
+        value = self.decode(*raw_values) if raw_values[0] else None
+        sentence.__dict__[self.name] = value
+        return value
+
+
+class Sentence:
+    """
+    Base class of NMEA sentences.
+    """
+    sentence_type = None
+
+    def __init__(self, talker, fields):
+        """
+        :param talker: talker ID, like 'GP'
+        :type talker: str
+        :param fields: values following the address field, without checksum
+        :type fields: list
+        """
+        self.talker = talker
+        self.fields = fields
+
+    def get_raw(self, index):
+        """
+        :return: field at index as string; empty string if there is no such
+            field
+        :rtype: str
+        """
+        return self.fields[index] if index < len(self.fields) else ''
+
+
+_sentence_classes = dict()
+
+
+def _sentence_type(cls):
+    _sentence_classes[cls.sentence_type] = cls
+    return cls
+
+
+def get_data_ids():
+    """
+    :return: data IDs (like '$GPGGA') of all supported sentences
+    :rtype: frozenset
+    """
+    return frozenset('$' + talker + sentence_type for talker in TALKER_IDS
+                     for sentence_type in _sentence_classes)
+
+
+def parse_sentence(data_id, fields):
+    """
+    :param data_id: address field, like '$GNGGA'
+    :type data_id: str
+    :param fields: values following the address field, without checksum
+    :type fields: list
+    :return: the sentence, or None if its type is not supported
+    :rtype: Sentence
+    """
+    sentence_class = _sentence_classes.get(data_id[3:])
+    if sentence_class is None or data_id[1:3] not in TALKER_IDS:
+        return None
+    return sentence_class(data_id[1:3], fields)
+
+
+def parse_latitude(latitude, latitude_dir):
+    return _parse_coord(latitude, latitude_dir, 'N', 'S')
+
+
+def parse_longitude(longitude, longitude_dir):
+    return _parse_coord(longitude, longitude_dir, 'E', 'W')
+
+
+def _parse_coord(coord, coord_dir, positive_sign, negative_sign):
+    """
+    Convert coordinate to single float value, replacing degree minutes with
+    decimal fraction and taking into consideration the direction specified
+
+    :param coord: coordinate string
+    :type coord: str
+    :param coord_dir: direction
+    :param positive_sign: direction when coordinate is positive
+    :param negative_sign: direction when coordinate is negative
+    :rtype: float
+    """
+    dot = coord.index('.')
+    if coord_dir != positive_sign and coord_dir != negative_sign:
+        raise ValueError("Coordinate direction '{}' is neither '{}' nor '{}'"
+                         .format(coord_dir, positive_sign, negative_sign))
+
+    sign = 1 if coord_dir == positive_sign else -1
+    return sign * (float(coord[:dot - 2]) + float(coord[dot - 2:]) / 60)
+
+
+def parse_quality(quality):
+    return ['no_fix', 'gps', 'dgps'][int(quality)]
+
+
+def parse_fix_type(mode):
+    # I have literally no idea why quality is indexed from 0, but mode from 1
+    return ['no_fix', '2d', '3d'][int(mode) - 1]
+
+
+def parse_speed(speed_in_knots):
+    """Convert speed in knots to km/h"""
+    return float(speed_in_knots) * 1.852
+
+
+def _parse_int(value):
+    return int(value)
+
+
+@_sentence_type
+class GGA(Sentence):
+    """Fix data"""
+    sentence_type = 'GGA'
+    utc_time = LazyField(str, 0)
+    latitude = LazyField(parse_latitude, 1, 2)
+    longitude = LazyField(parse_longitude, 3, 4)
+    quality = LazyField(parse_quality, 5)
+    active_satellites = LazyField(_parse_int, 6)
+    hdop = LazyField(float, 7)
+    altitude = LazyField(float, 8)  # always in meters
+    geoidal_separation = LazyField(float, 10)
+
+
+@_sentence_type
+class GSA(Sentence):
+    """DOP and active satellites"""
+    sentence_type = 'GSA'
+    fix_type = LazyField(parse_fix_type, 1)
+    pdop = LazyField(float, 14)
+    hdop = LazyField(float, 15)
+    vdop = LazyField(float, 16)
+
+    @property
+    def satellite_prns(self):
+        return [int(prn) for prn in self.fields[2:14] if prn]
+
+
+@_sentence_type
+class GSV(Sentence):
+    """Satellites in view; one of messages_count parts"""
+    sentence_type = 'GSV'
+    messages_count = LazyField(_parse_int, 0)
+    message_number = LazyField(_parse_int, 1)
+    satellites_in_view = LazyField(_parse_int, 2)
+
+    @property
+    def satellites(self):
+        """
+        :return: satellites described in this part of message
+        :rtype: list
+        """
+        satellites = list()
+        # Four fields per satellite; NMEA 4.1 adds signal ID at the end
+        for i in range(3, len(self.fields) - 3, 4):
+            prn, elevation, azimuth, snr = self.fields[i:i + 4]
+            if prn:
+                satellites.append(Satellite(
+                    self.talker, int(prn),
+                    int(elevation) if elevation else None,
+                    int(azimuth) if azimuth else None,
+                    int(snr) if snr else None))
+        return satellites
+
+
+@_sentence_type
+class RMC(Sentence):
+    """Recommended minimum data"""
+    sentence_type = 'RMC'
+    utc_time = LazyField(str, 0)
+    status = LazyField(str, 1)  # 'A' - valid, 'V' - warning
+    latitude = LazyField(parse_latitude, 2, 3)
+    longitude = LazyField(parse_longitude, 4, 5)
+    speed_over_ground = LazyField(parse_speed, 6)  # in km/h
+    direction = LazyField(float, 7)
+    date = LazyField(str, 8)
+
+
+@_sentence_type
+class VTG(Sentence):
+    """Velocity made good"""
+    sentence_type = 'VTG'
+    direction = LazyField(float, 0)
+    speed_over_ground = LazyField(float, 6)  # in km/h
+    mode = LazyField(str, 8)  # since NMEA 2.3; 'N' - data not valid
+
+
+@_sentence_type
+class GLL(Sentence):
+    """Geographic position"""
+    sentence_type = 'GLL'
+    latitude = LazyField(parse_latitude, 0, 1)
+    longitude = LazyField(parse_longitude, 2, 3)
+    utc_time = LazyField(str, 4)
+    status = LazyField(str, 5)
+
+
+@_sentence_type
+class ZDA(Sentence):
+    """Time and date"""
+    sentence_type = 'ZDA'
+    utc_time = LazyField(str, 0)
+    day = LazyField(_parse_int, 1)
+    month = LazyField(_parse_int, 2)
+    year = LazyField(_parse_int, 3)
+
+
+class GSVAssembler:
+    """
+    Assembler of multi-part GSV messages, separately for each talker. Parts
+    have to come in order; message with a missing part is discarded.
+    """
+
+    def __init__(self):
+        self.__parts = dict()  # talker -> parts received so far
+
+    def add(self, sentence):
+        """
+        :type sentence: GSV
+        :return: all satellites in view if the sentence completes message;
+            None otherwise
+        :rtype: list
+        """
+        parts = self.__parts.get(sentence.talker)
+        if sentence.message_number == 1:
+            parts = self.__parts[sentence.talker] = list()
+        elif (not parts or
+                parts[-1].message_number != sentence.message_number - 1 or
+                parts[-1].messages_count != sentence.messages_count):
+            self.__parts.pop(sentence.talker, None)
+            return None
+        parts.append(sentence)
+        if sentence.message_number < sentence.messages_count:
+            return None
+        del self.__parts[sentence.talker]
+        return [satellite for part in parts for satellite in part.satellites]
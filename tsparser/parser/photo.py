@@ -1,68 +1,201 @@
-import subprocess
-from tsparser.parser import BaseParser
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from io import BytesIO
+import multiprocessing
+from threading import BoundedSemaphore, Condition
+from time import monotonic
+import traceback
+
+import numpy as np
+from PIL import Image
+
+from tsparser.parser import BaseParser, register_parser
 from tsparser import config, sender
+from tsparser.utils import StatisticDataCollector
+
+
+PHOTO_WIDTH = 320
 
+JPEG_OPTIONS = {
+    'quality': 92,
+}
 
+
+@register_parser
 class PhotoParser(BaseParser):
+    """
+    Parser converting raw photos to JPEG and sending them to the server.
+
+    If config.PHOTO_WORKERS is greater than 0, photos are converted in
+    a pool of processes, so the parsing of other lines is not stalled. At
+    most config.PHOTO_MAX_PENDING photos can be converted at once - parse
+    blocks when the limit is reached. Converted photos are sent in the order
+    they were parsed in (i.e. by timestamp).
+    """
+    data_ids = frozenset({'$PHOTO'})
     url = config.URL + '/photos'
 
+    def __init__(self):
+        self.__executor = None
+        self.__pending_slots = BoundedSemaphore(config.PHOTO_MAX_PENDING)
+        # (data, future, submission time), in parsing order
+        self.__pending_photos = deque()
+        self.__pending_photos_changed = Condition()
+
     def parse(self, line, data_id, *values):
         if data_id == '$PHOTO':
-            if len(values) != 1:
-                raise ValueError('{} must provide {} values'
-                                 .format(data_id, 1))
-            try:
-                raw_photo = open(values[0], mode='rb')
-                raw_photo_content = raw_photo.read()
-                raw_photo.close()
-                rgb_photo_content = PhotoParser.get_rgb_from_bytearray(raw_photo_content, 320)
-                rgb_photo = open(values[0] + ".txt", mode="wb")
-                rgb_photo.write(rgb_photo_content)
-                rgb_photo.close()
-                subprocess.call(["convert", values[0] + ".txt", values[0] + ".jpg"])
-                jpg_photo = open(values[0] + ".jpg", mode="rb")
-                jpg_photo_content = jpg_photo.read()
-                jpg_photo.close()
-            except IOError:
-                return
-
+            # Completeness is not provided in older raw data files
+            if len(values) not in (1, 2):
+                raise ValueError('{} must provide {} or {} values'
+                                 .format(data_id, 1, 2))
+            if len(values) == 2 and float(values[1]) < 1:
+                StatisticDataCollector().get_logger().log(
+                    self.__class__.__name__,
+                    'Photo {} is {:.1f} % complete, missing parts are '
+                    'interpolated'.format(values[0], float(values[1]) * 100))
             data = {'timestamp': BaseParser.timestamp}
         else:
             return False
 
+        if config.PHOTO_WORKERS:
+            self.__submit_photo(data, values[0])
+            return True
+        conversion_start = monotonic()
+        try:
+            jpg_photo_content = process_photo(values[0])
+        except IOError:
+            return
+        StatisticDataCollector().on_stage_finished(
+            'photo/convert', monotonic() - conversion_start)
         sender.send_data(data, PhotoParser.url, jpg_photo_content)
 
         return True
 
+    def wait_for_pending_photos(self):
+        """
+        Block until all photos submitted to the process pool are sent.
+        """
+        with self.__pending_photos_changed:
+            self.__pending_photos_changed.wait_for(
+                lambda: not self.__pending_photos)
+
+    def __submit_photo(self, data, raw_photo_filename):
+        if self.__executor is None:
+            # Processes are spawned rather than forked, as forking
+            # a multithreaded process may leave locks in the child acquired
+            self.__executor = ProcessPoolExecutor(
+                config.PHOTO_WORKERS, multiprocessing.get_context('spawn'))
+        waiting_start = monotonic()
+        self.__pending_slots.acquire()
+        submission_time = monotonic()
+        sdc = StatisticDataCollector()
+        sdc.on_stage_finished('photo/wait_for_slot',
+                              submission_time - waiting_start)
+        future = self.__executor.submit(process_photo, raw_photo_filename,
+                                        config.PHOTO_THUMBNAIL_SIZE)
+        with self.__pending_photos_changed:
+            self.__pending_photos.append((data, future, submission_time))
+        future.add_done_callback(partial(self.__on_photo_processed,
+                                         submission_time))
+
+    def __on_photo_processed(self, submission_time, _):
+        # Includes time spent waiting for a free process
+        StatisticDataCollector().on_stage_finished(
+            'photo/convert', monotonic() - submission_time)
+        self.__send_processed_photos()
+
+    def __send_processed_photos(self):
+        """
+        Send photos that have been processed, keeping the order they were
+        submitted in.
+        """
+        sdc = StatisticDataCollector()
+        with self.__pending_photos_changed:
+            while self.__pending_photos and self.__pending_photos[0][1].done():
+                data, future, submission_time = self.__pending_photos.popleft()
+                self.__pending_slots.release()
+                # Conversion and waiting for photos parsed earlier
+                sdc.on_stage_finished('photo/convert_in_order',
+                                      monotonic() - submission_time)
+                try:
+                    sender.send_data(data, PhotoParser.url, future.result())
+                except Exception:
+                    sdc.get_logger().log(
+                        self.__class__.__name__, traceback.format_exc())
+            self.__pending_photos_changed.notify_all()
+
     @staticmethod
     def get_rgb_from_bytearray(bytearray, width):
         """
-        Convert little endian bytearray in RGB565 format to binary PPM
+        Convert little endian bytearray in RGB565 format to RGB pixels.
+
+        The input buffer is not copied - the pixels are decoded by NumPy
+        directly from it.
+
         :param bytearray: array with RGB656 encoded pixels
-        :type bytearray: bytearray
+        :type bytearray: bytes
         :param width: width of image
         :type width: int
-        :return: PPM file as string
-        :rtype: bytearray
+        :return: array of shape (height, width, 3) with 8-bit R, G and B
+            values of each pixel
+        :rtype: numpy.ndarray
+        """
+        pixels = np.frombuffer(bytearray, dtype='<u2').reshape(-1, width)
+        rgb = np.empty(pixels.shape + (3,), dtype=np.uint8)
+        # first 5 bits
+        rgb[..., 0] = (pixels >> 11) << 3
+        # next 6 bits
+        rgb[..., 1] = ((pixels >> 5) & 63) << 2
+        # last 5 bits
+        rgb[..., 2] = (pixels & 31) << 3
+        return rgb
+
+    @staticmethod
+    def encode_jpeg(rgb):
         """
-        result = b'# ImageMagick pixel enumeration: 320,240,255,srgb\n'
-
-        for i in range(0, len(bytearray), 2):
-            # little endian
-            b1 = bytearray[i + 1]
-            b2 = bytearray[i]
-            # RGB565 parsing
-            # first 5 bits of b1
-            color_R = (b1 >> 3 ) << 3
-            # 3 last bits of b1 and 3 first bits of b2
-            color_G = (((b1 & 7) << 3) + (b2 >> 5)) << 2
-            # 5 last bits of b2
-            color_B = (b2 & 31) << 3
-
-            # add row to result
-            row = "{},{}: ({},{},{})\n".format((i//2)%width, (i//2)//width,
-                                               color_R, color_G, color_B)
-            result += row.encode("utf-8")
-
-        return result
+        Encode RGB pixels as JPEG with options specified in JPEG_OPTIONS.
+
+        :param rgb: array of shape (height, width, 3)
+        :type rgb: numpy.ndarray
+        :return: JPEG file content
+        :rtype: bytes
+        """
+        output = BytesIO()
+        Image.fromarray(rgb).save(output, 'JPEG', **JPEG_OPTIONS)
+        return output.getvalue()
+
+
+def process_photo(raw_photo_filename, thumbnail_size=None):
+    """
+    Convert raw RGB565 photo to JPEG, which is also saved next to the raw
+    photo file (with .jpg extension appended). If thumbnail_size is given,
+    a thumbnail is saved as well (with .thumb.jpg extension appended).
+
+    This function is run in worker processes, so it must not use any
+    application state.
+
+    :param raw_photo_filename: name of file with raw photo
+    :type raw_photo_filename: str
+    :param thumbnail_size: maximal (width, height) of thumbnail, or None if
+        no thumbnail should be created
+    :type thumbnail_size: tuple
+    :return: JPEG file content
+    :rtype: bytes
+    """
+    raw_photo = open(raw_photo_filename, mode='rb')
+    raw_photo_content = raw_photo.read()
+    raw_photo.close()
+    rgb_photo = PhotoParser.get_rgb_from_bytearray(raw_photo_content,
+                                                   PHOTO_WIDTH)
+    jpg_photo_content = PhotoParser.encode_jpeg(rgb_photo)
+    jpg_photo = open(raw_photo_filename + ".jpg", mode="wb")
+    jpg_photo.write(jpg_photo_content)
+    jpg_photo.close()
 
+    if thumbnail_size is not None:
+        thumbnail = Image.fromarray(rgb_photo)
+        thumbnail.thumbnail(thumbnail_size)
+        thumbnail.save(raw_photo_filename + ".thumb.jpg", 'JPEG',
+                       **JPEG_OPTIONS)
+    return jpg_photo_content
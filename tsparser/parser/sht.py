@@ -1,8 +1,11 @@
-from tsparser.parser import BaseParser
-from tsparser import config, sender, planetarydata
+from tsparser.parser import BaseParser, register_parser
+from tsparser import config, sender, planetarydata, telemetry
+from tsparser.records import SHTRecord
 
 
+@register_parser
 class SHTParser(BaseParser):
+    data_ids = frozenset({'$TERM', '$HYDR'})
     url = config.URL + '/sht'
 
     def __init__(self):
@@ -22,6 +25,8 @@ class SHTParser(BaseParser):
             data = self.generate_data()
             sender.send_data(data, SHTParser.url)
             planetarydata.Calculator().on_data_update('sht', data)
+            if config.TELEMETRY_ENABLED:
+                telemetry.TelemetryStore().append('sht', data)
             self.temperature = self.humidity = None
         return True
 
@@ -40,9 +45,9 @@ class SHTParser(BaseParser):
         return [int(x) for x in values]
 
     def generate_data(self):
-        return {
-            'timestamp': BaseParser.timestamp,
+        return SHTRecord(
+            timestamp=BaseParser.timestamp,
 
-            'temperature': self.temperature,
-            'humidity': self.humidity
-        }
+            temperature=self.temperature,
+            humidity=self.humidity
+        )
@@ -0,0 +1,200 @@
+from threading import Condition, RLock, Thread
+from time import sleep
+import traceback
+
+from tsparser import config
+from tsparser.utils import StatisticDataCollector
+
+
+class RingBuffer:
+    """
+    Bounded, thread-safe FIFO queue of fixed capacity. When it is full, new
+    item overwrites the oldest one, so the producer never waits.
+    """
+
+    def __init__(self, capacity):
+        """
+        :param capacity: maximal number of items in the buffer
+        :type capacity: int
+        """
+        self.__items = [None] * capacity
+        self.__start = 0
+        self.__count = 0
+        self.__condition = Condition()
+
+    def __len__(self):
+        with self.__condition:
+            return self.__count
+
+    def put(self, item):
+        """
+        Add item to the buffer.
+
+        :return: False if the oldest item has been overwritten; True otherwise
+        :rtype: bool
+        """
+        with self.__condition:
+            capacity = len(self.__items)
+            end = (self.__start + self.__count) % capacity
+            self.__items[end] = item
+            self.__condition.notify()
+            if self.__count == capacity:
+                self.__start = (self.__start + 1) % capacity
+                return False
+            self.__count += 1
+            return True
+
+    def get(self):
+        """
+        Take the oldest item from the buffer, waiting for one if necessary.
+        """
+        with self.__condition:
+            self.__condition.wait_for(lambda: self.__count)
+            item = self.__items[self.__start]
+            self.__items[self.__start] = None
+            self.__start = (self.__start + 1) % len(self.__items)
+            self.__count -= 1
+            return item
+
+
+class ArchiveWriter(Thread):
+    """
+    Thread appending lines to raw data file in batches, every flush_interval
+    seconds, so writing does not cost a system call per line. Lines written
+    within the last flush_interval seconds are lost on crash.
+    """
+
+    def __init__(self, filename, flush_interval, **kwargs):
+        """
+        :param filename: name of raw data file
+        :type filename: str
+        :param flush_interval: time (in seconds) between writes
+        :type flush_interval: float
+        :param kwargs: arguments passed to Thread constructor
+        """
+        super().__init__(**kwargs)
+        self.__file = open(filename, 'a')
+        self.__flush_interval = flush_interval
+        self.__lines = list()
+        self.__closed = False
+        self.__condition = Condition()
+        # Held while lines are taken and written, so batches taken by
+        # different threads are written in order
+        self.__file_lock = RLock()
+
+    def write(self, line):
+        """
+        Add line to be written.
+
+        :param line: line ending with line terminator
+        :type line: str
+        """
+        with self.__condition:
+            self.__lines.append(line)
+            self.__condition.notify()
+
+    def run(self):
+        while True:
+            with self.__condition:
+                self.__condition.wait_for(
+                    lambda: self.__lines or self.__closed)
+                if self.__closed:
+                    return
+            # Let lines coming within the interval be written together
+            sleep(self.__flush_interval)
+            self.flush()
+
+    def flush(self):
+        """
+        Write all pending lines to the file.
+        """
+        with self.__file_lock:
+            with self.__condition:
+                lines, self.__lines = self.__lines, list()
+            if lines and not self.__file.closed:
+                self.__file.write(''.join(lines))
+                self.__file.flush()
+
+    def close(self):
+        """
+        Write all pending lines and close the file. Lines added later are not
+        written, and the thread ends.
+        """
+        with self.__file_lock:
+            self.flush()
+            self.__file.close()
+        with self.__condition:
+            self.__closed = True
+            self.__condition.notify()
+
+
+class ReceiverThread(Thread):
+    """
+    Thread reading lines from serial device, which passes them, split into
+    values, to the parser through ring buffer, and to the archive writer.
+    If receiving fails, the error is logged, the archive writer is closed and
+    None is put into the ring buffer to mark the end of records.
+    """
+
+    def __init__(self, usart, ring_buffer, archive_writer, **kwargs):
+        """
+        :type usart: tsreceiver.usart.Usart
+        :param ring_buffer: buffer (line, values) records are put into
+        :type ring_buffer: RingBuffer
+        :type archive_writer: ArchiveWriter
+        :param kwargs: arguments passed to Thread constructor
+        """
+        super().__init__(**kwargs)
+        self.__usart = usart
+        self.__ring_buffer = ring_buffer
+        self.__archive_writer = archive_writer
+
+    def run(self):
+        # Receiver requires pyserial, which is not needed by the parser alone
+        from tsreceiver.main import receive_lines
+        logger = StatisticDataCollector().get_logger()
+        try:
+            for line in receive_lines(self.__usart, _receiver_log):
+                self.__archive_writer.write(line)
+                line = line.rstrip('\r\n')
+                if not self.__ring_buffer.put((line, line.split(','))):
+                    logger.log('pipeline', 'Parser is not keeping up, the '
+                               'oldest line has been dropped (it is still '
+                               'archived)')
+        except Exception:
+            logger.log('pipeline', 'Receiving has failed, no more lines will '
+                       'be parsed:\n' + traceback.format_exc())
+        finally:
+            self.__archive_writer.close()
+            self.__ring_buffer.put(None)
+
+
+def _receiver_log(message):
+    # The terminal is used by the user interface, so messages are not printed
+    StatisticDataCollector().get_logger().log('receiver', message)
+
+
+def receive_records(usart=None):
+    """
+    Run receiver in this process, in a separate thread.
+
+    :param usart: serial device to read from; if None, the one specified in
+        receiver's config is opened
+    :type usart: tsreceiver.usart.Usart
+    :return: generator of (line, values) records, where values are line split
+        by commas; it ends if receiving fails
+    :rtype: collections.Iterable[tuple]
+    """
+    if usart is None:
+        from tsreceiver.usart import Usart
+        usart = Usart(_receiver_log)
+    ring_buffer = RingBuffer(config.RING_BUFFER_SIZE)
+    archive_writer = ArchiveWriter(config.RAW_DATA_FILENAME,
+                                   config.RAW_DATA_FLUSH_INTERVAL, daemon=True)
+    archive_writer.start()
+    ReceiverThread(usart, ring_buffer, archive_writer, daemon=True).start()
+    while True:
+        record = ring_buffer.get()
+        if record is None:
+            return
+        yield record
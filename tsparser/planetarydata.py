@@ -1,54 +1,56 @@
-from copy import deepcopy
 import functools
 import math
 import operator
-from threading import Thread, Lock
-from time import sleep
+from threading import Condition, Thread
+from time import monotonic, sleep
 import traceback
 
 from tsparser import config, sender
-from tsparser.timestamp import get_timestamp
+from tsparser.planetaryfit import G, FitAccumulator
+from tsparser.records import PlanetaryRecord
+from tsparser.timestamp import now
 from tsparser.utils.singleton import Singleton
 from tsparser.utils.statistic_data_collector import StatisticDataCollector
 
 
-# physical constants
-
-G = 6.67384e-11
-
-
 class Calculator(metaclass=Singleton):
     url = config.URL + '/planetarydata'
 
     def __init__(self):
-        self.__DATA_BUFFER_SCHEME = {
-            'gps': list(),
-            'imu': list(),
-            'sht': list()
-        }
-        self.__new_data_buffer = deepcopy(self.__DATA_BUFFER_SCHEME)
-        self.__all_data = deepcopy(self.__DATA_BUFFER_SCHEME)
-        self.__data_frame = deepcopy(self.__DATA_BUFFER_SCHEME)
-        self.__data_mutex = Lock()
-        self.__calculated_data = dict()
-        self.__accel_and_alt_cache = list()  # acceleration and altitude
+        self.__DATA_SOURCES = ('gps', 'imu', 'sht')
+        self.__new_data_buffer = self.__create_data_buffer()
+        self.__data_frame = dict.fromkeys(self.__DATA_SOURCES)
+        # Signalled by on_data_update when a complete frame is buffered
+        self.__new_data_available = Condition()
+        self.__calculated_data = None
+        # Only the readings the calculations need are kept, not whole history
+        self.__first_gps_reading = None
+        self.__last_gps_reading = None
+        self.__last_sht_reading = None
+        self.__accel_and_alt_samples = FitAccumulator(
+            config.CALCULATOR_ALTITUDE_RESOLUTION, config.CALCULATOR_WINDOW)
         Thread(target=self.__calculator_thread, daemon=True).start()
 
     def on_data_update(self, source, data):
+        if not config.CALCULATOR_ENABLED:
+            return
         if not self.__check_data_packet_validity(source, data):
             return
-        self.__data_mutex.acquire()
-        self.__data_frame[source] = data
-        if all(self.__data_frame.values()):
-            for k, v in self.__data_frame.items():
-                self.__new_data_buffer[k].append(v)
-            self.__data_frame = deepcopy(self.__DATA_BUFFER_SCHEME)
-        self.__data_mutex.release()
+        with self.__new_data_available:
+            self.__data_frame[source] = data
+            if all(self.__data_frame.values()):
+                for k, v in self.__data_frame.items():
+                    self.__new_data_buffer[k].append(v)
+                self.__data_frame = dict.fromkeys(self.__DATA_SOURCES)
+                self.__new_data_available.notify()
+
+    def __create_data_buffer(self):
+        return {source: list() for source in self.__DATA_SOURCES}
 
     @staticmethod
     def __check_data_packet_validity(source, data):
         if source == 'gps':
-            if 'altitude' not in data:
+            if data.altitude is None:
                 return False
         return True
 
@@ -61,99 +63,84 @@ class Calculator(metaclass=Singleton):
 
     def __calculator_loop(self):
         while True:
-            self.__data_mutex.acquire()
-            if all(self.__new_data_buffer.values()):
-                self.__calculated_data['timestamp'] = get_timestamp()
-                for key in self.__DATA_BUFFER_SCHEME.keys():
-                    self.__all_data[key].extend(self.__new_data_buffer[key])
-                self.__new_data_buffer = deepcopy(self.__DATA_BUFFER_SCHEME)
-                self.__data_mutex.release()
-                # Do *NOT* block on_data_update method!
-
-                self.__calculate_data()
-                sender.send_data(self.__calculated_data, self.url)
-
-            if self.__data_mutex.locked():
-                self.__data_mutex.release()
-            sleep(0.01)
-
-    def __calculate_data(self):
-        self.__cache_accel_and_alt()
+            with self.__new_data_available:
+                self.__new_data_available.wait_for(
+                    lambda: all(self.__new_data_buffer.values()))
+                new_data = self.__new_data_buffer
+                self.__new_data_buffer = self.__create_data_buffer()
+            # Do *NOT* block on_data_update method!
+
+            calculation_start = monotonic()
+            self.__calculated_data = PlanetaryRecord(timestamp=now())
+            self.__calculate_data(new_data)
+            sdc = StatisticDataCollector()
+            sdc.on_stage_finished('calculate', monotonic() - calculation_start)
+            # Time since the newest of the data was received
+            sdc.on_stage_finished('calculator_lag', now() - max(
+                readings[-1].timestamp for readings in new_data.values()))
+            sender.send_data(self.__calculated_data, self.url)
+
+            # Frames arriving in the meantime are buffered and processed
+            # together in the next calculation
+            elapsed = monotonic() - calculation_start
+            sleep(max(0, config.CALCULATOR_MIN_INTERVAL - elapsed))
+
+    def __calculate_data(self, new_data):
+        self.__update_readings(new_data)
+        self.__add_accel_and_alt_samples(new_data)
         self.__calculate_mass_and_radius()
         self.__calculate_earth_density()
         self.__calculate_escape_speed()
         self.__calculate_esi()
         self.__calculate_wind_direction_and_speed()
 
-    def __cache_accel_and_alt(self):
+    def __update_readings(self, new_data):
+        if self.__first_gps_reading is None:
+            self.__first_gps_reading = new_data['gps'][0]
+        self.__last_gps_reading = new_data['gps'][-1]
+        self.__last_sht_reading = new_data['sht'][-1]
+
+    def __add_accel_and_alt_samples(self, new_data):
         accel_factor = 0.061 / 1000
-        begin_ind = len(self.__accel_and_alt_cache)
-        for imu, gps in zip(self.__all_data['imu'][begin_ind:],
-                            self.__all_data['gps'][begin_ind:]):
-            acceleration = math.sqrt(imu['accel_x']**2 + imu['accel_y']**2 +
-                                     imu['accel_z']**2) * accel_factor
-            altitude = gps['altitude']
-            self.__accel_and_alt_cache.append((acceleration, altitude))
+        for imu, gps in zip(new_data['imu'], new_data['gps']):
+            acceleration = math.sqrt(imu.accel_x**2 + imu.accel_y**2 +
+                                     imu.accel_z**2) * accel_factor
+            self.__accel_and_alt_samples.add(acceleration, gps.altitude)
 
     def __calculate_mass_and_radius(self):
-        best = {
-            'error': float('inf'),
-            'mass': 0,
-            'radius': 0
-        }
-
-        for radius in range(1, int(1e6+1)):
-            numerator, denominator = 0, 0
-            for acceleration, altitude in self.__accel_and_alt_cache:
-                numerator += (G * acceleration) / (radius + altitude)**2
-                denominator += G / (radius + altitude)**2
-            mass = numerator / denominator**2
-
-            error = 0
-            for acceleration, altitude in self.__accel_and_alt_cache:
-                error += (acceleration - G * mass / (radius + altitude)**2)**2
-
-            if error < best['error']:
-                best.update({
-                    'error': error,
-                    'mass': mass,
-                    'radius': radius
-                })
-
-        self.__calculated_data.update({
-            'radius': best['radius'],
-            'mass': best['mass']
-        })
+        mass, radius, _ = self.__accel_and_alt_samples.fit()
+        self.__calculated_data.radius = radius
+        self.__calculated_data.mass = mass
 
     def __calculate_earth_density(self):
-        mass = self.__calculated_data['mass']
-        radius = self.__calculated_data['radius']
-        self.__calculated_data['density'] = mass / (4/3 * math.pi * radius**3)
+        mass = self.__calculated_data.mass
+        radius = self.__calculated_data.radius
+        self.__calculated_data.density = mass / (4/3 * math.pi * radius**3)
 
     def __calculate_escape_speed(self):
-        mass = self.__calculated_data['mass']
-        radius = self.__calculated_data['radius']
-        self.__calculated_data['escape_speed'] = math.sqrt(2*G * mass / radius)
+        mass = self.__calculated_data.mass
+        radius = self.__calculated_data.radius
+        self.__calculated_data.escape_speed = math.sqrt(2*G * mass / radius)
 
     def __calculate_esi(self):
         esi_data = (
             # format: our value, earth value, parameter weight
-            (self.__calculated_data['radius'], 6.37841e6, 0.57),
-            (self.__calculated_data['density'], 5514, 1.07),
-            (self.__calculated_data['escape_speed'], 11186, 0.70),
-            (self.__all_data['sht'][-1]['temperature'] + 273.15, 288, 5.58),
+            (self.__calculated_data.radius, 6.37841e6, 0.57),
+            (self.__calculated_data.density, 5514, 1.07),
+            (self.__calculated_data.escape_speed, 11186, 0.70),
+            (self.__last_sht_reading.temperature + 273.15, 288, 5.58),
         )
         factors = [(1 - abs((d[0] - d[1]) / (d[0] + d[1])))
                    ** (d[2] / len(esi_data)) for d in esi_data]
-        self.__calculated_data['esi'] = functools.reduce(operator.mul,
-                                                         factors, 1)
+        self.__calculated_data.esi = functools.reduce(operator.mul,
+                                                      factors, 1)
 
     def __calculate_wind_direction_and_speed(self):
-        first_reading = self.__all_data['gps'][0]
-        last_reading = self.__all_data['gps'][-1]
-        latitude_diff = last_reading['latitude'] - first_reading['latitude']
-        longitude_diff = last_reading['longitude'] - first_reading['longitude']
-        self.__calculated_data['wind_direction'] = math.atan2(
+        first_reading = self.__first_gps_reading
+        last_reading = self.__last_gps_reading
+        latitude_diff = last_reading.latitude - first_reading.latitude
+        longitude_diff = last_reading.longitude - first_reading.longitude
+        self.__calculated_data.wind_direction = math.atan2(
             latitude_diff, longitude_diff
         )
 
@@ -163,18 +150,8 @@ class Calculator(metaclass=Singleton):
         x_len = longitude_diff * degrees_to_meters_factor
 
         distance = math.sqrt(y_len**2 + x_len**2)
-        start_time = self.__get_day_seconds_from_timestamp(
-            first_reading['timestamp'])
-        end_time = self.__get_day_seconds_from_timestamp(
-            last_reading['timestamp'])
-        time_diff = end_time - start_time
-        self.__calculated_data['wind_speed'] = distance / time_diff
+        time_diff = last_reading.timestamp - first_reading.timestamp
+        # The first calculation may be done with a single GPS reading only
+        self.__calculated_data.wind_speed = (distance / time_diff
+                                             if time_diff else 0.0)
 
-
-    @staticmethod
-    def __get_day_seconds_from_timestamp(timestamp):
-        hours = int(timestamp[11:13])
-        minutes = int(timestamp[14:16])
-        seconds = int(timestamp[17:19])
-        microseconds = int(timestamp[20:])
-        return hours * 3600 + minutes * 60 + seconds + microseconds / 1e6
@@ -0,0 +1,200 @@
+from collections import deque
+
+import numpy as np
+
+
+# physical constants
+
+G = 6.67384e-11
+
+# Radius search range used by the calculator (in meters)
+MIN_RADIUS = 1
+MAX_RADIUS = 10**6
+
+# Number of samples processed at once - keeps temporary arrays small
+CHUNK_SIZE = 4096
+
+
+def fit_mass_and_radius(accelerations, altitudes, min_radius=MIN_RADIUS,
+                        max_radius=MAX_RADIUS, grid_size=128):
+    """
+    Find planet's radius and mass that fit the measured accelerations best.
+
+    For every candidate radius the mass is estimated the same way as it has
+    always been done by the calculator and the squared error of predicted
+    accelerations is computed. Instead of checking every integer radius, the
+    function evaluates a logarithmic grid of candidates first and then
+    repeatedly narrows the range around the best one (with a linear grid)
+    until every remaining integer radius can be checked. All candidates of
+    a single step are evaluated at once with NumPy.
+
+    :param accelerations: measured accelerations
+    :type accelerations: collections.abc.Sequence
+    :param altitudes: altitudes the accelerations were measured at
+    :type altitudes: collections.abc.Sequence
+    :param min_radius: the smallest radius to consider
+    :type min_radius: int
+    :param max_radius: the largest radius to consider
+    :type max_radius: int
+    :param grid_size: number of candidates evaluated in one step
+    :type grid_size: int
+    :return: tuple (mass, radius, error) of the best fit
+    :rtype: tuple
+    """
+    accelerations = np.asarray(accelerations, dtype=np.float64)
+    altitudes = np.asarray(altitudes, dtype=np.float64)
+    if accelerations.shape != altitudes.shape:
+        raise ValueError('Accelerations and altitudes must have equal lengths')
+    return fit_grouped(altitudes, np.ones_like(altitudes), accelerations,
+                       accelerations @ accelerations, min_radius, max_radius,
+                       grid_size)
+
+
+def fit_grouped(altitudes, counts, accel_sums, accel_squares_sum,
+                min_radius=MIN_RADIUS, max_radius=MAX_RADIUS, grid_size=128):
+    """
+    Same as fit_mass_and_radius, but takes samples grouped by altitude.
+
+    Both the estimated mass and the error depend on samples only through
+    the sums below, so all samples taken at the same altitude can be
+    represented by their count and sum of accelerations.
+
+    :param altitudes: distinct altitudes
+    :type altitudes: numpy.ndarray
+    :param counts: number of samples taken at each altitude
+    :type counts: numpy.ndarray
+    :param accel_sums: sum of accelerations measured at each altitude
+    :type accel_sums: numpy.ndarray
+    :param accel_squares_sum: sum of squared accelerations of all samples
+    :type accel_squares_sum: float
+    :return: tuple (mass, radius, error) of the best fit
+    :rtype: tuple
+    """
+    if not altitudes.size:
+        raise ValueError('At least one sample is required to fit the data')
+
+    radii = _candidate_radii(min_radius, max_radius, grid_size,
+                             logarithmic=True)
+    while True:
+        errors, masses = _evaluate_radii(altitudes, counts, accel_sums,
+                                         accel_squares_sum, radii)
+        best = int(np.argmin(errors))
+        if radii[-1] - radii[0] + 1 == len(radii):
+            # every integer in the range has been checked
+            return float(masses[best]), int(radii[best]), float(errors[best])
+        low = radii[max(best - 1, 0)]
+        high = radii[min(best + 1, len(radii) - 1)]
+        radii = _candidate_radii(low, high, grid_size)
+
+
+def _candidate_radii(low, high, grid_size, logarithmic=False):
+    """
+    Return sorted, unique, integer radii covering [low, high] range.
+
+    If the range contains no more than grid_size integers, all of them are
+    returned.
+    """
+    low, high = int(low), int(high)
+    if high - low + 1 <= grid_size:
+        return np.arange(low, high + 1, dtype=np.float64)
+    space = np.geomspace if logarithmic else np.linspace
+    return np.unique(np.round(space(low, high, grid_size)))
+
+
+def _evaluate_radii(altitudes, counts, accel_sums, accel_squares_sum, radii):
+    """
+    Compute the estimated mass and the squared error for every radius given.
+
+    The squared error is expanded into a form that needs only sums over the
+    samples, so the samples can be processed in chunks.
+
+    :return: tuple (errors, masses) of arrays with the same shape as radii
+    :rtype: tuple
+    """
+    sum_w = np.zeros_like(radii)
+    sum_aw = np.zeros_like(radii)
+    sum_ww = np.zeros_like(radii)
+    for begin in range(0, len(altitudes), CHUNK_SIZE):
+        chunk = slice(begin, begin + CHUNK_SIZE)
+        w = 1 / (radii[:, np.newaxis] + altitudes[chunk])**2
+        sum_w += w @ counts[chunk]
+        sum_aw += w @ accel_sums[chunk]
+        sum_ww += (w * w) @ counts[chunk]
+
+    numerator = G * sum_aw
+    denominator = G * sum_w
+    masses = numerator / denominator**2
+    errors = (accel_squares_sum - 2 * G * masses * sum_aw
+              + (G * masses)**2 * sum_ww)
+    # the expanded form may fall slightly below zero due to rounding
+    return np.maximum(errors, 0), masses
+
+
+class FitAccumulator:
+    """
+    Collects (acceleration, altitude) samples as running sums grouped by
+    altitude, so adding a sample takes constant time and memory is bounded
+    by the range of altitudes rather than by the number of samples.
+
+    Altitudes are rounded to the given resolution. If window is given, only
+    the most recent window samples are taken into account.
+    """
+
+    def __init__(self, altitude_resolution=0.1, window=None):
+        """
+        :param altitude_resolution: altitudes closer than that are grouped
+            together (in meters)
+        :type altitude_resolution: float
+        :param window: number of the most recent samples to fit the data to,
+            or None if all samples should be used
+        :type window: int
+        """
+        self.__resolution = altitude_resolution
+        self.__window = deque(maxlen=window) if window else None
+        self.__groups = dict()  # altitude step -> [count, accel_sum]
+        self.__accel_squares_sum = 0.0
+
+    def __len__(self):
+        return sum(count for count, _ in self.__groups.values())
+
+    def add(self, acceleration, altitude):
+        """
+        Add a single sample.
+
+        :type acceleration: float
+        :type altitude: float
+        """
+        step = round(altitude / self.__resolution)
+        if self.__window is not None:
+            if len(self.__window) == self.__window.maxlen:
+                self.__remove(*self.__window[0])
+            self.__window.append((acceleration, step))
+        group = self.__groups.setdefault(step, [0, 0.0])
+        group[0] += 1
+        group[1] += acceleration
+        self.__accel_squares_sum += acceleration**2
+
+    def __remove(self, acceleration, step):
+        group = self.__groups[step]
+        group[0] -= 1
+        group[1] -= acceleration
+        if not group[0]:
+            del self.__groups[step]
+        self.__accel_squares_sum -= acceleration**2
+
+    def fit(self, **kwargs):
+        """
+        Fit mass and radius to the collected samples.
+
+        Keyword arguments are passed to fit_grouped.
+
+        :return: tuple (mass, radius, error) of the best fit
+        :rtype: tuple
+        """
+        steps = np.fromiter(self.__groups.keys(), dtype=np.float64,
+                            count=len(self.__groups))
+        groups = np.array(list(self.__groups.values()),
+                          dtype=np.float64).reshape(-1, 2)
+        return fit_grouped(steps * self.__resolution, groups[:, 0],
+                           groups[:, 1], max(self.__accel_squares_sum, 0.0),
+                           **kwargs)
@@ -0,0 +1,89 @@
+import numbers
+
+from tsparser.timestamp import format_timestamp
+
+
+class Record:
+    """
+    Base class of records of parsed and calculated data. Records are
+    lightweight objects with fixed set of fields (given by __slots__ of
+    subclasses); they are converted to dicts only when sent to the server.
+    Fields which have not been set are None. Timestamp is number of seconds
+    since the epoch, formatted as string only in the dict.
+    """
+    __slots__ = ()
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.pop(name, None))
+        if fields:
+            raise TypeError('{} has no fields {}'.format(
+                self.__class__.__name__, ', '.join(sorted(fields))))
+
+    def __eq__(self, other):
+        return (self.__class__ is other.__class__ and
+                all(getattr(self, name) == getattr(other, name)
+                    for name in self.__slots__))
+
+    def __repr__(self):
+        return '{}({})'.format(self.__class__.__name__, ', '.join(
+            '{}={!r}'.format(name, getattr(self, name))
+            for name in self.__slots__ if getattr(self, name) is not None))
+
+    def get(self, name, default=None):
+        """
+        :return: value of the field, or default if it has not been set
+        """
+        value = getattr(self, name, None)
+        return default if value is None else value
+
+    def to_dict(self):
+        """
+        :return: dict of fields that have been set, as sent to the server
+        :rtype: dict
+        """
+        return _format_timestamp({name: getattr(self, name)
+                                  for name in self.__slots__
+                                  if getattr(self, name) is not None})
+
+
+class IMURecord(Record):
+    __slots__ = ('timestamp', 'gyro_x', 'gyro_y', 'gyro_z',
+                 'accel_x', 'accel_y', 'accel_z',
+                 'magnet_x', 'magnet_y', 'magnet_z', 'pressure')
+
+
+class GPSRecord(Record):
+    __slots__ = ('timestamp', 'latitude', 'longitude', 'altitude', 'quality',
+                 'active_satellites', 'hdop', 'fix_type', 'pdop', 'vdop',
+                 'satellites_in_view', 'speed_over_ground', 'direction',
+                 'mean_snr')
+
+
+class SHTRecord(Record):
+    __slots__ = ('timestamp', 'temperature', 'humidity')
+
+
+class PlanetaryRecord(Record):
+    __slots__ = ('timestamp', 'radius', 'mass', 'density', 'escape_speed',
+                 'esi', 'wind_direction', 'wind_speed')
+
+
+def to_dict(data):
+    """
+    :param data: record or dict
+    :return: data as dict, as sent to the server
+    :rtype: dict
+    """
+    if isinstance(data, Record):
+        return data.to_dict()
+    if isinstance(data.get('timestamp'), numbers.Real):
+        return _format_timestamp(dict(data))
+    return data
+
+
+def _format_timestamp(data):
+    timestamp = data.get('timestamp')
+    if isinstance(timestamp, numbers.Real):
+        data['timestamp'] = format_timestamp(timestamp)
+    return data
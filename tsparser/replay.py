@@ -0,0 +1,207 @@
+"""
+Re-processing of recorded raw data files at full speed, without sending
+anything to the server.
+
+Usage:
+    python -m tsparser.replay [-p PROCESSES] [-o OUTPUT.npz] RAW_DATA...
+"""
+import argparse
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import multiprocessing
+import numbers
+import os
+
+import numpy as np
+
+from tsparser import config, main as parser_main, records, sender, stream
+from tsparser.parser import GPSParser
+
+# Number of lines whose GPS checksums are validated at once
+CHECKSUM_BATCH_SIZE = 4096
+
+
+class DryRunSink:
+    """
+    Sink only counting records sent to each URL.
+    """
+
+    def __init__(self):
+        self.counts = Counter()
+
+    def __call__(self, data, url, file=None):
+        self.counts[url] += 1
+
+    def close(self):
+        pass
+
+
+class ColumnarSink(DryRunSink):
+    """
+    Sink saving records to NumPy .npz file, with one array per field of
+    records sent to each endpoint, named '<endpoint>/<field>' (for example
+    'imu/gyro_x'). Numeric fields are stored as floats (NaN where record does
+    not have the field); other ones as strings. Timestamps are stored as
+    numbers of seconds since the epoch, so records can be selected by time
+    range. Contents of files (photos) are not stored.
+    """
+
+    def __init__(self, filename):
+        """
+        :param filename: name of .npz file to write on close
+        :type filename: str
+        """
+        super().__init__()
+        self.__filename = filename
+        self.__records = OrderedDict()  # endpoint -> list of records
+
+    def __call__(self, data, url, file=None):
+        super().__call__(data, url, file)
+        endpoint = url[len(config.URL):].strip('/')
+        record = records.to_dict(data)
+        # Kept as number of seconds since the epoch, not formatted
+        record['timestamp'] = data.get('timestamp')
+        self.__records.setdefault(endpoint, list()).append(record)
+
+    def close(self):
+        columns = OrderedDict()
+        for endpoint, endpoint_records in self.__records.items():
+            fields = OrderedDict.fromkeys(key for record in endpoint_records
+                                          for key in record)
+            for field in fields:
+                columns[endpoint + '/' + field] = _to_array(
+                    [record.get(field) for record in endpoint_records])
+        np.savez(self.__filename, **columns)
+
+
+def _to_array(values):
+    present = [value for value in values if value is not None]
+    if all(isinstance(value, numbers.Real) and not isinstance(value, bool)
+           for value in present):
+        return np.array([np.nan if value is None else value
+                         for value in values], dtype=np.float64)
+    return np.array(['' if value is None else str(value)
+                     for value in values])
+
+
+def replay(filenames, sink, processes=1):
+    """
+    Parse raw data files, passing parsed records to the sink instead of
+    sending them. Planetary data are not calculated and photos are converted
+    by the parser itself. Records are not added to the telemetry store.
+    Checksums of GPS sentences are validated in batches of
+    CHECKSUM_BATCH_SIZE lines.
+
+    When more than one process is used, each file is split into chunks of
+    whole lines, which are parsed independently. Records made of lines from
+    two chunks (e.g. IMU record, whose lines are split between chunks) are
+    lost then.
+
+    :param filenames: names of raw data files, in order
+    :type filenames: list
+    :param sink: callable taking the same arguments as sender.send_data
+    :type sink: collections.Callable
+    :param processes: number of processes to use
+    :type processes: int
+    """
+    if processes <= 1:
+        for filename in filenames:
+            _replay_range(filename, 0, None, sink)
+        return
+
+    ranges = [(filename, start, end) for filename in filenames
+              for start, end in _split_into_chunks(filename, processes)]
+    with ProcessPoolExecutor(processes,
+                             multiprocessing.get_context('spawn')) as executor:
+        for sent_records in executor.map(_replay_range_to_list,
+                                         *zip(*ranges)):
+            for record in sent_records:
+                sink(*record)
+
+
+def _split_into_chunks(filename, count):
+    """
+    :return: list of (start, end) positions of chunks of the file, each one
+        starting at the beginning of a line
+    :rtype: list
+    """
+    size = os.path.getsize(filename)
+    boundaries = [0]
+    with open(filename, 'rb') as file:
+        for i in range(1, count):
+            file.seek(max(size * i // count - 1, boundaries[-1]))
+            file.readline()
+            boundaries.append(max(file.tell(), boundaries[-1]))
+    boundaries.append(size)
+    return [(start, end) for start, end in zip(boundaries, boundaries[1:])
+            if start < end]
+
+
+def _replay_range(filename, start, end, sink):
+    calculator_enabled = config.CALCULATOR_ENABLED
+    photo_workers = config.PHOTO_WORKERS
+    gps_fix_timeout = config.GPS_FIX_TIMEOUT
+    receiving_latency_measured = config.RECEIVING_LATENCY_MEASURED
+    telemetry_enabled = config.TELEMETRY_ENABLED
+    config.CALCULATOR_ENABLED = False
+    config.PHOTO_WORKERS = 0
+    # Lines are replayed much faster than they were received
+    config.GPS_FIX_TIMEOUT = None
+    config.RECEIVING_LATENCY_MEASURED = False
+    # Replayed records must not be mixed with the ones of the live store
+    config.TELEMETRY_ENABLED = False
+    sender.set_sink(sink)
+    try:
+        parsers = parser_main._get_parsers()
+        gps_parser = next(parser for parser in parsers.values()
+                          if isinstance(parser, GPSParser))
+        lines = stream.FileReader(filename, start, end).lines()
+        while True:
+            batch = list(islice(lines, CHECKSUM_BATCH_SIZE))
+            if not batch:
+                break
+            gps_parser.validate_checksums_in_advance(batch)
+            for line in batch:
+                parser_main._parse_line(parsers, line)
+    finally:
+        sender.set_sink(None)
+        config.CALCULATOR_ENABLED = calculator_enabled
+        config.PHOTO_WORKERS = photo_workers
+        config.GPS_FIX_TIMEOUT = gps_fix_timeout
+        config.RECEIVING_LATENCY_MEASURED = receiving_latency_measured
+        config.TELEMETRY_ENABLED = telemetry_enabled
+
+
+def _replay_range_to_list(filename, start, end):
+    sent_records = list()
+    _replay_range(filename, start, end,
+                  lambda data, url, file=None: sent_records.append(
+                      (data, url, file)))
+    return sent_records
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(
+        description='Parse recorded raw data files at full speed, without '
+                    'sending anything to the server.')
+    argument_parser.add_argument('filenames', nargs='+', metavar='RAW_DATA')
+    argument_parser.add_argument(
+        '-p', '--processes', type=int, default=1,
+        help='number of processes parsing chunks of files (records spanning '
+             'two chunks are lost)')
+    argument_parser.add_argument(
+        '-o', '--output', metavar='OUTPUT.npz',
+        help='save parsed records to columnar file; if not given, records '
+             'are only counted')
+    args = argument_parser.parse_args()
+
+    sink = DryRunSink() if args.output is None else ColumnarSink(args.output)
+    replay(args.filenames, sink, args.processes)
+    sink.close()
+    for url, count in sorted(sink.counts.items()):
+        print('{:40} {:10} records'.format(url, count))
+
+
+if __name__ == '__main__':
+    main()
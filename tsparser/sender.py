@@ -1,23 +1,263 @@
-from queue import Queue
-from threading import Thread
+import asyncio
+from base64 import b64encode
+from queue import Empty
+from threading import Semaphore, Thread
+from time import monotonic, time
 import traceback
 
 import requests
+try:
+    import aiohttp
+except ImportError:  # needed only by the asyncio backend
+    aiohttp = None
 
-from tsparser import config
+from tsparser import config, records
+from tsparser.spool import Spool
 from tsparser.utils import StatisticDataCollector
 
 
-send_queue = Queue()
+send_queue = Spool(config.SPOOL_FILENAME, config.SPOOL_MAX_SIZE,
+                   config.SENDER_MIN_BACKOFF, config.SENDER_MAX_BACKOFF)
+# Callable data are passed to instead of being sent, if set by set_sink
+_sink = None
 
 
 class Sender(Thread):
+    """
+    Worker sending requests from send_queue to the server.
+
+    Each worker keeps its own HTTP session, so connections to the server are
+    reused. If batch_size is greater than 1, records without files that are
+    sent to the same URL are collected and sent as one JSON list, either when
+    batch_size records are collected or when the oldest one has waited for
+    batch_latency seconds.
+    """
+
+    def __init__(self, batch_size=1, batch_latency=0.0, **kwargs):
+        """
+        :param batch_size: maximal number of records sent in one request
+        :type batch_size: int
+        :param batch_latency: maximal time (in seconds) a record can wait for
+            a batch to be completed
+        :type batch_latency: float
+        :param kwargs: arguments passed to Thread constructor
+        """
+        super().__init__(**kwargs)
+        self.__batch_size = batch_size
+        self.__batch_latency = batch_latency
+        self.__batches = dict()  # url -> (deadline, list of requests)
+        # Session keeps connections to the server alive
+        self.__session = requests.Session()
+
     def run(self):
         while True:
-            data, url, file = send_queue.get()
-            _send_data(data, url, file)
-            StatisticDataCollector().on_request_sent((data, url))
-            send_queue.task_done()
+            try:
+                request = send_queue.get(timeout=self.__get_timeout())
+            except Empty:
+                self.__send_expired_batches()
+                continue
+            _on_request_taken(request)
+            if self.__batch_size > 1 and request.file is None:
+                self.__add_to_batch(request)
+            else:
+                packet = (request.data, request.url)
+                start_time = _on_request_started(packet)
+                result = _send_data(request.data, request.url, request.file,
+                                    session=self.__session)
+                _on_request_finished(packet, start_time)
+                _on_result([request], result)
+            self.__send_expired_batches()
+
+    def __get_timeout(self):
+        if not self.__batches:
+            return None
+        earliest_deadline = min(deadline for deadline, _ in
+                                self.__batches.values())
+        return max(0, earliest_deadline - monotonic())
+
+    def __add_to_batch(self, request):
+        deadline, batch = self.__batches.setdefault(
+            request.url, (monotonic() + self.__batch_latency, list()))
+        batch.append(request)
+        if len(batch) >= self.__batch_size:
+            self.__send_batch(request.url)
+
+    def __send_expired_batches(self):
+        now = monotonic()
+        for url, (deadline, _) in list(self.__batches.items()):
+            if deadline <= now:
+                self.__send_batch(url)
+
+    def __send_batch(self, url):
+        _, batch = self.__batches.pop(url)
+        packet = ([request.data for request in batch], url)
+        start_time = _on_request_started(packet)
+        result = _send_batch(packet[0], url, session=self.__session)
+        _on_request_finished(packet, start_time)
+        _on_result(batch, result)
+
+
+class AsyncSender(Thread):
+    """
+    Thread running asyncio event loop, which sends requests from send_queue
+    to the server, keeping up to concurrency of them in flight at once over
+    a shared connection pool. Requires aiohttp.
+    """
+
+    def __init__(self, concurrency, **kwargs):
+        """
+        :param concurrency: maximal number of requests in flight
+        :type concurrency: int
+        :param kwargs: arguments passed to Thread constructor
+        """
+        super().__init__(**kwargs)
+        self.__concurrency = concurrency
+
+    def run(self):
+        asyncio.run(self.__send_loop())
+
+    async def __send_loop(self):
+        loop = asyncio.get_running_loop()
+        ready_requests = asyncio.Queue()
+        # send_queue blocks, so requests are taken from it in another thread,
+        # as long as there is a free slot for a request in flight
+        slots = Semaphore(self.__concurrency)
+        Thread(target=self.__take_requests, args=(loop, ready_requests, slots),
+               daemon=True).start()
+
+        tasks = set()
+        connector = aiohttp.TCPConnector(limit=self.__concurrency)
+        credentials = '{}:{}'.format(config.USERNAME, config.PASSWORD)
+        headers = {'Authorization': 'Basic ' + b64encode(
+            credentials.encode('utf-8')).decode('ascii')}
+        async with aiohttp.ClientSession(connector=connector,
+                                         headers=headers) as session:
+            while True:
+                request = await ready_requests.get()
+                task = loop.create_task(self.__send(session, request, slots))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+    @staticmethod
+    def __take_requests(loop, ready_requests, slots):
+        while True:
+            slots.acquire()
+            request = send_queue.get()
+            _on_request_taken(request)
+            loop.call_soon_threadsafe(ready_requests.put_nowait, request)
+
+    @staticmethod
+    async def __send(session, request, slots):
+        packet = (request.data, request.url)
+        start_time = _on_request_started(packet)
+        try:
+            try:
+                result = await _send_data_async(session, request.data,
+                                                request.url, request.file)
+            except Exception:
+                # Retried as if the server could not be reached, so the
+                # request is not left taken from send_queue forever
+                StatisticDataCollector().get_logger().log(
+                    'sender', traceback.format_exc())
+                result = None
+            _on_request_finished(packet, start_time)
+            _on_result([request], result)
+        finally:
+            slots.release()
+
+
+def _on_result(sent_requests, result):
+    """
+    Remove requests that have been sent from send_queue or schedule them to
+    be retried. The ones rejected by the server are dropped after
+    config.SENDER_MAX_ATTEMPTS attempts.
+
+    :param sent_requests: requests that have been sent
+    :type sent_requests: list
+    :param result: value returned by _send_data or _send_batch
+    :type result: bool
+    """
+    sdc = StatisticDataCollector()
+    for request in sent_requests:
+        packet = (request.data, request.url)
+        if result:
+            send_queue.done(request)
+            sdc.on_request_sent(packet)
+            continue
+        sdc.on_request_failed(packet)
+        if (result is False and
+                request.attempts + 1 >= config.SENDER_MAX_ATTEMPTS):
+            send_queue.done(request)
+            sdc.on_request_dropped(packet)
+            sdc.get_logger().log('sender', 'Request to {} rejected {} '
+                                 'times, dropping it'.format(
+                                     request.url, request.attempts + 1))
+        else:
+            send_queue.retry(request, url_unreachable=result is None)
+
+
+def _on_request_taken(request):
+    if request.queued_at is not None:  # unknown for older spools
+        StatisticDataCollector().on_stage_finished(
+            'send_queue', time() - request.queued_at)
+
+
+def _on_request_started(packet):
+    StatisticDataCollector().on_request_started(packet)
+    return monotonic()
+
+
+def _on_request_finished(packet, start_time):
+    latency = monotonic() - start_time
+    sdc = StatisticDataCollector()
+    sdc.on_request_finished(packet, latency)
+    sdc.on_stage_finished(_get_http_stage(packet[1]), latency)
+
+
+def _get_http_stage(url):
+    """
+    :return: name of stage of HTTP requests to the URL, like 'http/gps'
+    :rtype: str
+    """
+    if url.startswith(config.URL):
+        return 'http' + url[len(config.URL):]
+    return 'http/' + url
+
+
+def start_senders():
+    """
+    Start sender workers, as specified in config
+    """
+    recovered_count = len(send_queue)
+    if recovered_count:
+        sdc = StatisticDataCollector()
+        sdc.on_requests_recovered(recovered_count)
+        sdc.get_logger().log('sender', '{} unsent requests recovered from '
+                             'previous run'.format(recovered_count))
+    if config.SENDER_BACKEND == 'asyncio':
+        if aiohttp is None:
+            raise ImportError('asyncio sender backend requires aiohttp')
+        AsyncSender(config.SENDER_CONCURRENCY, daemon=True).start()
+    elif config.SENDER_BACKEND == 'threads':
+        for _ in range(config.SENDER_WORKERS):
+            Sender(batch_size=config.SENDER_BATCH_SIZE,
+                   batch_latency=config.SENDER_BATCH_LATENCY,
+                   daemon=True).start()
+    else:
+        raise ValueError("Unknown sender backend '{}'"
+                         .format(config.SENDER_BACKEND))
+
+
+def set_sink(sink):
+    """
+    Pass data to sink instead of sending them to the server.
+
+    :param sink: callable taking the same arguments as send_data, or None to
+        send data to the server again
+    :type sink: collections.Callable
+    """
+    global _sink
+    _sink = sink
 
 
 def send_data(data, url, file=None):
@@ -25,17 +265,27 @@ def send_data(data, url, file=None):
     Add data to send to request queue
 
     :param data: data to send
-    :type data: dict
+    :type data: tsparser.records.Record|dict
     :param url: url where data are sent to
     :type url: str
     :param file: content of file to send as multiple encoded file
     :type file: bytearray
     """
-    send_queue.put((data, url, file))
-    StatisticDataCollector().on_new_request((data, url))
+    if _sink is not None:
+        _sink(data, url, file)
+        return
+    data = records.to_dict(data)
+    dropped = send_queue.put(data, url, file)
+    sdc = StatisticDataCollector()
+    sdc.on_new_request((data, url))
+    for packet in dropped:
+        sdc.on_request_dropped(packet)
+    if dropped:
+        sdc.get_logger().log('sender', 'Send queue is full, {} oldest requests '
+                             'dropped'.format(len(dropped)))
 
 
-def _send_data(data, url, file=None):
+def _send_data(data, url, file=None, session=None):
     """
     Send data to server
 
@@ -45,19 +295,69 @@ def _send_data(data, url, file=None):
     :type url: str
     :param file: content of file to send as multiple encoded file
     :type file: bytearray
-    :return True if data have been sent successfully; False otherwise
+    :param session: session to send request with; if None, a new connection
+        is made
+    :type session: requests.Session
+    :return True if data have been sent successfully; False if the server
+        rejected them; None if the server could not be reached
     :rtype bool
     """
+    post = requests.post if session is None else session.post
     try:
         if file is None:
-            response = requests.post(url, data=data,
-                                     auth=(config.USERNAME, config.PASSWORD))
+            response = post(url, data=data,
+                            auth=(config.USERNAME, config.PASSWORD))
         else:
-            response = requests.post(url, data=data,
-                                     auth=(config.USERNAME, config.PASSWORD),
-                                     files={'photo': ("photo.jpg", file)})
+            response = post(url, data=data,
+                            auth=(config.USERNAME, config.PASSWORD),
+                            files={'photo': ("photo.jpg", file)})
     except Exception:
         StatisticDataCollector().get_logger().log('sender',
                                                   traceback.format_exc())
-        return False
+        return None
     return response.status_code == 201
+
+
+def _send_batch(batch, url, session):
+    """
+    Send many records to the server at once, as JSON list
+
+    :param batch: records to send
+    :type batch: list
+    :param url: url where data are sent to
+    :type url: str
+    :param session: session to send request with
+    :type session: requests.Session
+    :return True if data have been sent successfully; False if the server
+        rejected them; None if the server could not be reached
+    :rtype bool
+    """
+    try:
+        response = session.post(url, json=batch,
+                                auth=(config.USERNAME, config.PASSWORD))
+    except Exception:
+        StatisticDataCollector().get_logger().log('sender',
+                                                  traceback.format_exc())
+        return None
+    return response.status_code == 201
+
+
+async def _send_data_async(session, data, url, file=None):
+    """
+    Same as _send_data, but using aiohttp session
+
+    :type session: aiohttp.ClientSession
+    :return True if data have been sent successfully; False if the server
+        rejected them; None if the server could not be reached
+    :rtype bool
+    """
+    form = aiohttp.FormData({key: str(value) for key, value in data.items()})
+    if file is not None:
+        form.add_field('photo', bytes(file), filename='photo.jpg')
+    try:
+        async with session.post(url, data=form) as response:
+            return response.status == 201
+    except Exception:
+        StatisticDataCollector().get_logger().log('sender',
+                                                  traceback.format_exc())
+        return None
@@ -0,0 +1,241 @@
+from collections import namedtuple
+import json
+from queue import Empty
+import sqlite3
+from threading import Condition
+from time import monotonic, time
+
+
+SpooledRequest = namedtuple('SpooledRequest',
+                            'id data url file attempts queued_at')
+
+
+class Spool:
+    """
+    Persistent, thread-safe queue of requests to be sent to the server,
+    stored in SQLite database.
+
+    Requests are kept on disk until they are marked as done, so the ones
+    that have not been sent before a crash are sent after restart. Failed
+    requests are retried with exponential backoff. If the server cannot be
+    reached at all, the whole URL is backed off, so the other requests to it
+    are not tried in vain. When the spool exceeds max_size bytes, the oldest
+    requests are dropped.
+    """
+
+    def __init__(self, filename, max_size=None, min_backoff=1.0,
+                 max_backoff=60.0):
+        """
+        :param filename: name of the database file (':memory:' for
+            non-persistent spool). The file is opened on the first use.
+        :type filename: str
+        :param max_size: maximal total size (in bytes) of spooled data, or
+            None if the size should not be limited
+        :type max_size: int
+        :param min_backoff: delay (in seconds) before the first retry
+        :type min_backoff: float
+        :param max_backoff: maximal delay (in seconds) between retries
+        :type max_backoff: float
+        """
+        self.__filename = filename
+        self.__max_size = max_size
+        self.__min_backoff = min_backoff
+        self.__max_backoff = max_backoff
+        self.__db = None
+        self.__size = 0
+        self.__count = 0
+        self.__claimed = set()  # ids of requests being sent at the moment
+        self.__url_backoff = dict()  # url -> (failures, retry time)
+        self.__condition = Condition()
+
+    def __len__(self):
+        with self.__condition:
+            self.__connect()
+            return self.__count
+
+    def put(self, data, url, file=None):
+        """
+        Add request to the spool.
+
+        :param data: data to send
+        :type data: dict
+        :param url: url where data are sent to
+        :type url: str
+        :param file: content of file to send as multiple encoded file
+        :type file: bytearray
+        :return: requests dropped to make room for the new one, as list of
+            (data, url) tuples
+        :rtype: list
+        """
+        data = json.dumps(data)
+        size = len(data) + len(url) + (len(file) if file is not None else 0)
+        with self.__condition:
+            self.__connect()
+            dropped = self.__make_room(size)
+            self.__db.execute(
+                'INSERT INTO requests (url, data, file, size, attempts, '
+                'next_attempt, queued_at) VALUES (?, ?, ?, ?, 0, 0, ?)',
+                (url, data, file, size, time()))
+            self.__db.commit()
+            self.__size += size
+            self.__count += 1
+            self.__condition.notify()
+        return dropped
+
+    def get(self, timeout=None):
+        """
+        Take the oldest request that can be sent now. The request has to be
+        passed to either done or retry method afterwards.
+
+        :param timeout: maximal time (in seconds) to wait for a request, or
+            None to wait as long as needed
+        :type timeout: float
+        :return: the request
+        :rtype: SpooledRequest
+        :raise queue.Empty: if no request is ready within timeout
+        """
+        deadline = None if timeout is None else monotonic() + timeout
+        with self.__condition:
+            self.__connect()
+            while True:
+                request, wait_time = self.__find_ready_request()
+                if request is not None:
+                    self.__claimed.add(request.id)
+                    return request
+                if deadline is not None:
+                    remaining = deadline - monotonic()
+                    if remaining <= 0:
+                        raise Empty
+                    wait_time = (remaining if wait_time is None
+                                 else min(wait_time, remaining))
+                self.__condition.wait(wait_time)
+
+    def done(self, request):
+        """
+        Remove request, that has been sent, from the spool.
+
+        :type request: SpooledRequest
+        """
+        with self.__condition:
+            self.__delete(request.id)
+            self.__claimed.discard(request.id)
+            self.__url_backoff.pop(request.url, None)
+            self.__condition.notify_all()
+
+    def retry(self, request, url_unreachable=False):
+        """
+        Schedule failed request to be sent again later.
+
+        :type request: SpooledRequest
+        :param url_unreachable: True if server could not be reached, so all
+            requests to the same URL should wait
+        :type url_unreachable: bool
+        """
+        now = time()
+        attempts = request.attempts + 1
+        with self.__condition:
+            self.__db.execute(
+                'UPDATE requests SET attempts = ?, next_attempt = ? '
+                'WHERE id = ?', (attempts, now + self.__backoff(attempts),
+                                 request.id))
+            self.__db.commit()
+            self.__claimed.discard(request.id)
+            if url_unreachable:
+                failures = self.__url_backoff.get(request.url, (0, 0))[0] + 1
+                self.__url_backoff[request.url] = (
+                    failures, now + self.__backoff(failures))
+            self.__condition.notify_all()
+
+    def join(self):
+        """
+        Block until all requests are sent.
+        """
+        with self.__condition:
+            self.__connect()
+            self.__condition.wait_for(lambda: not self.__count)
+
+    def __connect(self):
+        if self.__db is not None:
+            return
+        self.__db = sqlite3.connect(self.__filename, check_same_thread=False)
+        # Commits in WAL mode don't wait for the disk, yet the database
+        # stays consistent after a crash
+        self.__db.execute('PRAGMA journal_mode=WAL')
+        self.__db.execute('PRAGMA synchronous=NORMAL')
+        self.__db.execute(
+            'CREATE TABLE IF NOT EXISTS requests ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, url TEXT NOT NULL, '
+            'data TEXT NOT NULL, file BLOB, size INTEGER NOT NULL, '
+            'attempts INTEGER NOT NULL, next_attempt REAL NOT NULL, '
+            'queued_at REAL)')
+        # Spools created by older versions lack time requests were queued at
+        columns = [row[1] for row in
+                   self.__db.execute('PRAGMA table_info(requests)')]
+        if 'queued_at' not in columns:
+            self.__db.execute('ALTER TABLE requests ADD COLUMN queued_at REAL')
+        self.__db.commit()
+        self.__count, self.__size = self.__db.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM requests').fetchone()
+
+    def __find_ready_request(self):
+        """
+        :return: tuple (request, wait_time) - the oldest request that can be
+            sent now (or None) and time until the next one can be sent (or
+            None if there are no requests waiting)
+        """
+        now = time()
+        blocked_urls = [url for url, (_, retry_time)
+                        in self.__url_backoff.items() if retry_time > now]
+        row = self.__db.execute(
+            'SELECT id, data, url, file, attempts, queued_at FROM requests '
+            'WHERE next_attempt <= ? AND id NOT IN ({}) AND url NOT IN ({}) '
+            'ORDER BY id LIMIT 1'.format(
+                ', '.join('?' * len(self.__claimed)),
+                ', '.join('?' * len(blocked_urls))),
+            [now] + list(self.__claimed) + blocked_urls).fetchone()
+        if row is not None:
+            request_id, data, url, file, attempts, queued_at = row
+            return SpooledRequest(request_id, json.loads(data), url, file,
+                                  attempts, queued_at), None
+
+        wait_time = None
+        for url, next_attempt in self.__db.execute(
+                'SELECT url, MIN(next_attempt) FROM requests '
+                'WHERE id NOT IN ({}) GROUP BY url'.format(
+                    ', '.join('?' * len(self.__claimed))),
+                list(self.__claimed)):
+            retry_time = max(next_attempt,
+                             self.__url_backoff.get(url, (0, 0))[1])
+            if wait_time is None or retry_time - now < wait_time:
+                wait_time = max(0, retry_time - now)
+        return None, wait_time
+
+    def __make_room(self, size):
+        dropped = list()
+        if self.__max_size is None:
+            return dropped
+        while self.__size + size > self.__max_size:
+            oldest = self.__db.execute(
+                'SELECT id, data, url FROM requests WHERE id NOT IN ({}) '
+                'ORDER BY id LIMIT 1'.format(
+                    ', '.join('?' * len(self.__claimed))),
+                list(self.__claimed)).fetchone()
+            if oldest is None:
+                break
+            self.__delete(oldest[0])
+            dropped.append((json.loads(oldest[1]), oldest[2]))
+        return dropped
+
+    def __delete(self, request_id):
+        row = self.__db.execute('SELECT size FROM requests WHERE id = ?',
+                                (request_id,)).fetchone()
+        if row is None:
+            return
+        self.__db.execute('DELETE FROM requests WHERE id = ?', (request_id,))
+        self.__db.commit()
+        self.__size -= row[0]
+        self.__count -= 1
+
+    def __backoff(self, attempts):
+        return min(self.__max_backoff,
+                   self.__min_backoff * 2 ** (attempts - 1))
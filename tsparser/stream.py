@@ -0,0 +1,275 @@
+from abc import ABCMeta, abstractmethod
+import ctypes
+import ctypes.util
+import os
+import select
+import socket
+import stat
+from time import sleep
+
+from tsparser import config
+
+try:
+    _libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    _inotify_init1 = _libc.inotify_init1
+    _inotify_add_watch = _libc.inotify_add_watch
+except (OSError, AttributeError):  # inotify is available only on Linux
+    _inotify_init1 = _inotify_add_watch = None
+
+_IN_MODIFY = 0x00000002
+# Maximal time (in seconds) of waiting for inotify event, in case one is missed
+_INOTIFY_TIMEOUT = 1.0
+
+
+class StreamReader(metaclass=ABCMeta):
+    """
+    Base class of raw data sources. Input is read in chunks as large as
+    possible, which are then split into lines all at once.
+    """
+
+    def __init__(self, chunk_size=None):
+        """
+        :param chunk_size: maximal number of bytes read at once
+        :type chunk_size: int
+        """
+        self.__chunk_size = chunk_size or config.INPUT_CHUNK_SIZE
+
+    def lines(self):
+        """
+        Generate lines of input as they come, without line terminators.
+        Empty lines are skipped.
+
+        :rtype: collections.Iterable[str]
+        """
+        remainder = b''
+        while True:
+            chunk = self._read_chunk(self.__chunk_size)
+            if chunk is None:
+                line = remainder.decode('utf-8', 'replace').rstrip('\r')
+                if line:
+                    yield line
+                return
+            if not chunk:
+                # The writer has gone, so the incomplete line won't be finished
+                remainder = b''
+                continue
+            data = remainder + chunk
+            end = data.rfind(b'\n') + 1
+            remainder = data[end:]
+            if not end:
+                continue
+            for line in data[:end - 1].decode('utf-8', 'replace').split('\n'):
+                line = line.rstrip('\r')
+                if line:
+                    yield line
+
+    @abstractmethod
+    def _read_chunk(self, size):
+        """
+        Wait for input and read it.
+
+        :param size: maximal number of bytes to read
+        :type size: int
+        :return: data read; empty bytes if the writer has disconnected; None
+            if there will be no more input
+        :rtype: bytes
+        """
+
+    def close(self):
+        pass
+
+
+class FileReader(StreamReader):
+    """
+    Reader of the file (or its part) as it is now, without waiting for more
+    data.
+    """
+
+    def __init__(self, filename, start=0, end=None, chunk_size=None):
+        """
+        :param filename: name of file
+        :type filename: str
+        :param start: position of the first byte to read
+        :type start: int
+        :param end: position after the last byte to read, or None to read to
+            the end of file
+        :type end: int
+        :type chunk_size: int
+        """
+        super().__init__(chunk_size)
+        self.__file = open(filename, 'rb')
+        self.__file.seek(start)
+        self.__remaining = None if end is None else end - start
+
+    def _read_chunk(self, size):
+        if self.__remaining is not None:
+            size = min(size, self.__remaining)
+            self.__remaining -= size
+        data = self.__file.read(size) if size else b''
+        if not data:
+            self.close()
+            return None
+        return data
+
+    def close(self):
+        self.__file.close()
+
+
+class FileTailer(StreamReader):
+    """
+    Reader following the file as it grows. When the end of file is reached,
+    it waits for the file to be modified using inotify, or polls the file
+    every poll_interval seconds when inotify is not available.
+    """
+
+    def __init__(self, file, chunk_size=None, poll_interval=0.01):
+        """
+        :param file: name of file, or file opened for reading
+        :type file: str|file
+        :type chunk_size: int
+        :param poll_interval: time (in seconds) between checks whether
+            the file has grown, when inotify is not available
+        :type poll_interval: float
+        """
+        super().__init__(chunk_size)
+        if isinstance(file, str):
+            file = open(file, 'rb', buffering=0)
+        # Use underlying binary file for files opened in text mode
+        self.__file = getattr(file, 'buffer', file)
+        self.__poll_interval = poll_interval
+        self.__inotify_fd = self.__watch(self.__file.name)
+
+    def _read_chunk(self, size):
+        while True:
+            data = self.__file.read(size)
+            if data:
+                return data
+            self.__wait()
+
+    def close(self):
+        self.__file.close()
+        if self.__inotify_fd is not None:
+            os.close(self.__inotify_fd)
+            self.__inotify_fd = None
+
+    @staticmethod
+    def __watch(filename):
+        """
+        :return: inotify file descriptor, or None if inotify is not available
+        :rtype: int
+        """
+        if _inotify_init1 is None or not isinstance(filename, str):
+            return None
+        fd = _inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        if _inotify_add_watch(fd, os.fsencode(filename), _IN_MODIFY) < 0:
+            os.close(fd)
+            return None
+        return fd
+
+    def __wait(self):
+        if self.__inotify_fd is None:
+            sleep(self.__poll_interval)
+            return
+        select.select([self.__inotify_fd], [], [], _INOTIFY_TIMEOUT)
+        try:
+            while os.read(self.__inotify_fd, 4096):
+                pass
+        except BlockingIOError:
+            pass  # all events have been read
+
+
+class PipeReader(StreamReader):
+    """
+    Reader of named pipe, which is created if it does not exist. When the
+    writer closes the pipe, the reader waits for the next one.
+    """
+
+    def __init__(self, path, chunk_size=None):
+        """
+        :param path: path of named pipe
+        :type path: str
+        :type chunk_size: int
+        """
+        super().__init__(chunk_size)
+        if not os.path.exists(path):
+            os.mkfifo(path)
+        elif not stat.S_ISFIFO(os.stat(path).st_mode):
+            raise ValueError('{} is not a named pipe'.format(path))
+        self.__path = path
+        self.__pipe = None
+
+    def _read_chunk(self, size):
+        if self.__pipe is None:
+            # Blocks until there is a writer
+            self.__pipe = open(self.__path, 'rb', buffering=0)
+        data = self.__pipe.read(size)
+        if not data:
+            self.__pipe.close()
+            self.__pipe = None
+        return data
+
+    def close(self):
+        if self.__pipe is not None:
+            self.__pipe.close()
+            self.__pipe = None
+
+
+class SocketReader(StreamReader):
+    """
+    Reader listening on Unix socket. Writers are served one at a time.
+    """
+
+    def __init__(self, path, chunk_size=None):
+        """
+        :param path: path of Unix socket; stale socket file is removed
+        :type path: str
+        :type chunk_size: int
+        """
+        super().__init__(chunk_size)
+        if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+            os.unlink(path)
+        self.__path = path
+        self.__server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.__server.bind(path)
+        self.__server.listen(1)
+        self.__connection = None
+
+    def _read_chunk(self, size):
+        if self.__connection is None:
+            self.__connection, _ = self.__server.accept()
+        try:
+            data = self.__connection.recv(size)
+        except ConnectionError:
+            data = b''
+        if not data:
+            self.__connection.close()
+            self.__connection = None
+        return data
+
+    def close(self):
+        if self.__connection is not None:
+            self.__connection.close()
+            self.__connection = None
+        self.__server.close()
+        os.unlink(self.__path)
+
+
+def open_input(input_file=None):
+    """
+    Open raw data source specified in config.
+
+    :param input_file: file to read instead of the one specified in config
+    :type input_file: file
+    :rtype: StreamReader
+    """
+    if input_file is not None:
+        return FileTailer(input_file)
+    if config.INPUT_MODE == 'file':
+        return FileTailer(config.RAW_DATA_FILENAME)
+    if config.INPUT_MODE == 'pipe':
+        return PipeReader(config.INPUT_STREAM_PATH)
+    if config.INPUT_MODE == 'socket':
+        return SocketReader(config.INPUT_STREAM_PATH)
+    raise ValueError("Unknown input mode '{}'".format(config.INPUT_MODE))
@@ -0,0 +1,256 @@
+import atexit
+from collections import namedtuple
+import os
+from threading import Lock
+
+import numpy as np
+
+from tsparser import config
+from tsparser.timestamp import parse_timestamp
+from tsparser.utils.singleton import Singleton
+
+
+class Field(namedtuple('Field', 'name dtype categories')):
+    """
+    Column of a table. Fields with categories store index of the value in
+    categories. Missing values are stored as NaN in float fields and as -1
+    in integer ones.
+    """
+
+    def __new__(cls, name, dtype, categories=None):
+        return super().__new__(cls, name, np.dtype(dtype), categories)
+
+    @property
+    def missing_value(self):
+        return np.nan if self.dtype.kind == 'f' else -1
+
+    def encode(self, value):
+        if value is None:
+            return self.missing_value
+        if self.categories is not None:
+            return self.categories.index(value)
+        return value
+
+
+def _fields(dtype, *names):
+    return tuple(Field(name, dtype) for name in names)
+
+
+SCHEMAS = {
+    'imu': _fields('<i2', 'gyro_x', 'gyro_y', 'gyro_z',
+                   'accel_x', 'accel_y', 'accel_z',
+                   'magnet_x', 'magnet_y', 'magnet_z') +
+    _fields('<i4', 'pressure'),
+    'gps': _fields('<f8', 'latitude', 'longitude') +
+    _fields('<f4', 'altitude', 'hdop', 'pdop', 'vdop',
+            'speed_over_ground', 'direction', 'mean_snr') +
+    _fields('<i2', 'active_satellites', 'satellites_in_view') + (
+        Field('quality', '<i1', ('no_fix', 'gps', 'dgps')),
+        Field('fix_type', '<i1', ('no_fix', '2d', '3d'))),
+    'sht': _fields('<f4', 'temperature', 'humidity'),
+}
+TIMESTAMP_FIELD = Field('timestamp', '<f8')
+
+
+class Table:
+    """
+    Append-only table of records, stored by columns. Rows are collected in
+    a chunk of fixed size, which is moved to the rest of data when it is
+    full. If path is given, each column is then appended to its own file, so
+    the whole history is kept on disk and memory-mapped when queried.
+    Otherwise, chunks are kept in memory.
+
+    Records are expected to be appended in order of their timestamps.
+    """
+
+    def __init__(self, fields, chunk_size, path=None):
+        """
+        :param fields: fields of records, besides timestamp
+        :type fields: tuple
+        :param chunk_size: number of rows in a chunk
+        :type chunk_size: int
+        :param path: directory to store columns in, or None to keep data in
+            memory. Data already stored there are loaded.
+        :type path: str
+        """
+        self.fields = (TIMESTAMP_FIELD,) + tuple(fields)
+        self.__chunk_size = chunk_size
+        self.__path = path
+        self.__chunk = self.__create_chunk()
+        self.__chunk_length = 0
+        self.__stored_chunks = list()  # used only if path is None
+        self.__stored_length = 0
+        self.__mapped_columns = None  # (length, dict of memory maps)
+        self.__lock = Lock()
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+            stored_rows = [self.__get_stored_rows(field)
+                           for field in self.fields]
+            self.__stored_length = min(
+                (rows for rows in stored_rows if rows is not None), default=0)
+            # Columns differ in length if the last write was interrupted
+            for field, rows in zip(self.fields, stored_rows):
+                with open(self.__get_column_filename(field), 'ab') as file:
+                    if rows is None:  # field added to the schema later
+                        file.write(np.full(self.__stored_length,
+                                           field.missing_value,
+                                           field.dtype).tobytes())
+                    else:
+                        file.truncate(self.__stored_length *
+                                      field.dtype.itemsize)
+
+    def __len__(self):
+        with self.__lock:
+            return self.__stored_length + self.__chunk_length
+
+    def append(self, record):
+        """
+        Add record to the table. Fields not present in the record are stored
+        as missing.
+
+        :param record: record, with timestamp either as number of seconds
+            since the epoch or as string returned by get_timestamp
+        :type record: tsparser.records.Record|dict
+        """
+        timestamp = record.get('timestamp')
+        if isinstance(timestamp, str):
+            timestamp = parse_timestamp(timestamp)
+        with self.__lock:
+            row = self.__chunk_length
+            self.__chunk['timestamp'][row] = timestamp
+            for field in self.fields[1:]:
+                self.__chunk[field.name][row] = field.encode(
+                    record.get(field.name))
+            self.__chunk_length += 1
+            if self.__chunk_length == self.__chunk_size:
+                self.__store_chunk()
+
+    def flush(self):
+        """
+        Write rows that have not been written yet to the disk.
+        """
+        with self.__lock:
+            if self.__path is not None and self.__chunk_length:
+                self.__store_chunk()
+
+    def query(self, start=None, end=None):
+        """
+        Get records with timestamp in [start, end) range.
+
+        :param start: number of seconds since the epoch, or None for no limit
+        :type start: float
+        :param end: number of seconds since the epoch, or None for no limit
+        :type end: float
+        :return: dict mapping field name to array of values. The arrays
+            must not be modified.
+        :rtype: dict
+        """
+        with self.__lock:
+            if self.__path is not None:
+                parts = [self.__get_mapped_columns()]
+            else:
+                parts = list(self.__stored_chunks)
+            parts.append({name: column[:self.__chunk_length].copy()
+                          for name, column in self.__chunk.items()})
+
+        selected = list()
+        for part in parts:
+            timestamps = part['timestamp']
+            first = (0 if start is None
+                     else np.searchsorted(timestamps, start, 'left'))
+            last = (len(timestamps) if end is None
+                    else np.searchsorted(timestamps, end, 'left'))
+            if first < last:
+                selected.append({name: column[first:last]
+                                 for name, column in part.items()})
+        if len(selected) == 1:
+            return selected[0]
+        return {field.name: np.concatenate(
+            [part[field.name] for part in selected] or
+            [np.empty(0, field.dtype)]) for field in self.fields}
+
+    def __create_chunk(self):
+        return {field.name: np.empty(self.__chunk_size, field.dtype)
+                for field in self.fields}
+
+    def __store_chunk(self):
+        if self.__path is None:
+            self.__stored_chunks.append(self.__chunk)
+        else:
+            for field in self.fields:
+                with open(self.__get_column_filename(field), 'ab') as file:
+                    file.write(self.__chunk[field.name]
+                               [:self.__chunk_length].tobytes())
+        self.__stored_length += self.__chunk_length
+        self.__chunk = self.__create_chunk()
+        self.__chunk_length = 0
+
+    def __get_mapped_columns(self):
+        if (self.__mapped_columns is None or
+                self.__mapped_columns[0] != self.__stored_length):
+            if self.__stored_length:
+                columns = {field.name: np.memmap(
+                    self.__get_column_filename(field), field.dtype, 'r',
+                    shape=(self.__stored_length,)) for field in self.fields}
+            else:
+                columns = {field.name: np.empty(0, field.dtype)
+                           for field in self.fields}
+            self.__mapped_columns = (self.__stored_length, columns)
+        return self.__mapped_columns[1]
+
+    def __get_stored_rows(self, field):
+        filename = self.__get_column_filename(field)
+        if not os.path.exists(filename):
+            return None
+        return os.path.getsize(filename) // field.dtype.itemsize
+
+    def __get_column_filename(self, field):
+        return os.path.join(self.__path, field.name + '.bin')
+
+
+class TelemetryStore(metaclass=Singleton):
+    """
+    Store of all parsed IMU, GPS and SHT records, kept in columnar tables.
+    Data are kept in memory, or in config.TELEMETRY_DIRECTORY if it is set.
+    """
+
+    def __init__(self):
+        directory = config.TELEMETRY_DIRECTORY
+        self.tables = {
+            name: Table(fields, config.TELEMETRY_CHUNK_SIZE,
+                        None if directory is None
+                        else os.path.join(directory, name))
+            for name, fields in SCHEMAS.items()}
+        if directory is not None:
+            atexit.register(self.flush)
+
+    def append(self, table, record):
+        """
+        :param table: name of table ('imu', 'gps' or 'sht')
+        :type table: str
+        :param record: record to add
+        :type record: tsparser.records.Record
+        """
+        self.tables[table].append(record)
+
+    def query(self, table, start=None, end=None):
+        """
+        Get records with timestamp in [start, end) range.
+
+        :param table: name of table ('imu', 'gps' or 'sht')
+        :type table: str
+        :param start: number of seconds since the epoch, or None for no limit
+        :type start: float
+        :param end: number of seconds since the epoch, or None for no limit
+        :type end: float
+        :return: dict mapping field name to array of values
+        :rtype: dict
+        """
+        return self.tables[table].query(start, end)
+
+    def flush(self):
+        """
+        Write all records to the disk, if the store is kept there.
+        """
+        for table in self.tables.values():
+            table.flush()
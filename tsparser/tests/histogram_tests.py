@@ -0,0 +1,44 @@
+import unittest
+
+from tsparser.utils import Histogram
+
+
+class TestHistogram(unittest.TestCase):
+    def test_empty(self):
+        histogram = Histogram()
+        self.assertIsNone(histogram.mean)
+        self.assertIsNone(histogram.percentile(50))
+
+    def test_percentiles(self):
+        histogram = Histogram()
+        for i in range(1, 1001):
+            histogram.add(i / 1000)
+        self.assertEqual(histogram.count, 1000)
+        self.assertAlmostEqual(histogram.mean, 0.5005)
+        self.assertEqual(histogram.max, 1)
+        for percent in (1, 50, 90, 99):
+            # Bounds of buckets are 2^(1/8) times greater than previous ones
+            self.assertGreaterEqual(histogram.percentile(percent),
+                                    percent / 100)
+            self.assertLess(histogram.percentile(percent),
+                            percent / 100 * 2 ** (1 / 8))
+        self.assertEqual(histogram.percentile(100), 1)
+
+    def test_values_out_of_range(self):
+        histogram = Histogram()
+        histogram.add(0)
+        histogram.add(1e6)
+        self.assertEqual(histogram.percentile(50), 1e-6)  # the first bound
+        self.assertEqual(histogram.percentile(100), 1e6)
+
+    def test_merge(self):
+        first, second = Histogram(), Histogram()
+        first.add(0.001)
+        second.add(0.003)
+        second.add(0.002)
+        first.merge(second)
+        self.assertEqual(first.count, 3)
+        self.assertAlmostEqual(first.sum, 0.006)
+        self.assertEqual(first.max, 0.003)
+        self.assertEqual(first.percentile(100), 0.003)
+        self.assertEqual(second.count, 2)
@@ -0,0 +1,53 @@
+import os
+import tempfile
+import unittest
+
+from tsparser.utils import Logger
+
+
+class TestLogger(unittest.TestCase):
+    def test_get_logs(self):
+        logger = Logger(capacity=4)
+        for i in range(6):
+            logger.log('even' if i % 2 == 0 else 'odd', str(i))
+        self.assertEqual([message for _, _, message in logger.get_logs()],
+                         ['2', '3', '4', '5'])
+        self.assertEqual([message for _, _, message in
+                          logger.get_logs(['odd', 'unknown'])], ['3', '5'])
+        self.assertEqual(logger.get_all_modules(), {'even', 'odd'})
+
+        logger.clear_logs()
+        self.assertEqual(logger.get_logs(), [])
+        self.assertEqual(logger.get_all_modules(), set())
+        # Dropped and cleared messages are counted too
+        self.assertEqual(logger.get_log_counts(), {'even': 3, 'odd': 3})
+
+    def test_get_logs_since(self):
+        logger = Logger(capacity=4)
+        logger.log('a', '0')
+        next_sequence_number, entries = logger.get_logs_since(0)
+        self.assertEqual(next_sequence_number, 1)
+        self.assertEqual([entry[1:] for entry in entries], [('a', '0')])
+
+        logger.log('b', '1')
+        logger.log('a', '2')
+        next_sequence_number, entries = logger.get_logs_since(
+            next_sequence_number, ['a', 'b'])
+        self.assertEqual(next_sequence_number, 3)
+        self.assertEqual([entry[1:] for entry in entries],
+                         [('b', '1'), ('a', '2')])
+        self.assertEqual(logger.get_logs_since(3), (3, []))
+        self.assertEqual(logger.get_next_sequence_number(), 3)
+
+    def test_log_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'log')
+            logger = Logger(filename, flush_interval=60)
+            logger.log('a', 'first')
+            logger.log('b', 'second\nline')
+            logger.flush()
+            with open(filename) as log_file:
+                lines = log_file.read().splitlines()
+            self.assertEqual(len(lines), 3)
+            self.assertTrue(lines[0].endswith('|a|first'))
+            logger.close()
@@ -0,0 +1,95 @@
+import unittest
+from unittest.mock import patch
+
+from tsparser import main
+from tsparser.parser import BaseParser, get_parser_classes, register_parser
+
+
+class CountingParser(BaseParser):
+    data_ids = frozenset({'$COUNT'})
+
+    def __init__(self):
+        self.values = list()
+
+    def parse(self, line, data_id, *values):
+        self.values.append(values)
+        return True
+
+
+class TestParserRouting(unittest.TestCase):
+    def setUp(self):
+        patcher = patch('tsparser.parser._parser_classes',
+                        get_parser_classes())
+        self.addCleanup(patcher.stop)
+        patcher.start()
+
+    def test_registered_parser(self):
+        register_parser(CountingParser)
+        parsers = main._get_parsers()
+        self.assertIsInstance(parsers['$COUNT'], CountingParser)
+        main._parse_line(parsers, '$COUNT,1,2,1420113600.5', False)
+        self.assertEqual(parsers['$COUNT'].values, [('1', '2')])
+        self.assertEqual(BaseParser.timestamp, 1420113600.5)
+
+    def test_unknown_data_id(self):
+        with patch('tsparser.utils.Logger.log') as log_mock:
+            main._parse_line(main._get_parsers(), '$UNKNOWN,1,1420113600.5')
+        self.assertIn('not parsed by any parser', log_mock.call_args[0][1])
+
+    def test_invalid_timestamp(self):
+        with patch('tsparser.utils.Logger.log') as log_mock:
+            main._parse_line(main._get_parsers(), '$TERM,1,timestamp')
+        self.assertIn('Invalid timestamp', log_mock.call_args[0][1])
+
+    def test_stages(self):
+        register_parser(CountingParser)
+        with patch('tsparser.utils.StatisticDataCollector.on_line_parsed') \
+                as line_parsed_mock, \
+                patch('tsparser.main.now', return_value=1000.5):
+            main._parse_line(main._get_parsers(), '$COUNT,1,999.75')
+        stage, _, receiving_latency = line_parsed_mock.call_args[0]
+        self.assertEqual(stage, 'parse/CountingParser')
+        self.assertEqual(receiving_latency, 0.75)
+
+        # Timestamp ahead of the parser's clock
+        with patch('tsparser.utils.StatisticDataCollector.on_line_parsed') \
+                as line_parsed_mock, \
+                patch('tsparser.main.now', return_value=999.5):
+            main._parse_line(main._get_parsers(), '$COUNT,1,999.75')
+        self.assertEqual(line_parsed_mock.call_args[0][2], 0)
+
+        with patch('tsparser.utils.StatisticDataCollector.on_line_parsed') \
+                as line_parsed_mock, \
+                patch('tsparser.config.RECEIVING_LATENCY_MEASURED', False):
+            main._parse_line(main._get_parsers(), '$COUNT,1,999.75')
+        self.assertIsNone(line_parsed_mock.call_args[0][2])
+
+    def test_rejected_line_not_counted_as_parsed(self):
+        class RejectingParser(CountingParser):
+            def parse(self, line, data_id, *values):
+                return False
+        with patch('tsparser.utils.StatisticDataCollector.on_line_parsed') \
+                as line_parsed_mock, \
+                patch('tsparser.utils.StatisticDataCollector.on_parse_error') \
+                as parse_error_mock, patch('tsparser.utils.Logger.log'):
+            main._parse_line({'$COUNT': RejectingParser()}, '$COUNT,1,999.75')
+        self.assertFalse(line_parsed_mock.called)
+        parse_error_mock.assert_called_once_with('system', 'NotParsed')
+
+    def test_parse_errors_counted(self):
+        with patch('tsparser.utils.StatisticDataCollector.on_parse_error') \
+                as parse_error_mock, patch('tsparser.utils.Logger.log'):
+            parsers = main._get_parsers()
+            main._parse_line(parsers, '$UNKNOWN,1,1420113600.5')
+            main._parse_line(parsers, '$TERM,1,timestamp')
+            main._parse_line(parsers, '$TERM,1,2,1420113600.5')
+        self.assertEqual([call[0] for call in parse_error_mock.call_args_list],
+                         [('system', 'NotParsed'),
+                          ('system', 'InvalidTimestamp'),
+                          ('SHTParser', 'ValueError')])
+
+    def test_data_id_conflict(self):
+        class ConflictingParser(CountingParser):
+            data_ids = frozenset({'$GYRO'})
+        register_parser(ConflictingParser)
+        self.assertRaises(ValueError, main._get_parsers)
@@ -0,0 +1,59 @@
+import unittest
+from unittest.mock import patch
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+from tsparser import metrics
+from tsparser.tests.statistic_data_collector_tests import create_collector
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        # Collector without log file, so the real one is not written
+        self.sdc = create_collector()
+        patcher = patch('tsparser.metrics.StatisticDataCollector',
+                        return_value=self.sdc)
+        self.addCleanup(patcher.stop)
+        patcher.start()
+
+    def test_format_metrics(self):
+        sdc = self.sdc
+        sdc.on_line_parsed('parse/MetricsTestParser', 0.003, 0.01)
+        sdc.on_parse_error('MetricsTestParser', 'Value"Error')
+        sdc.get_logger().log('metrics_test', 'message')
+        lines = metrics.format_metrics().splitlines()
+        self.assertIn('# TYPE tsparser_parsed_lines_total counter', lines)
+        self.assertIn('tsparser_parsed_lines_total{parser="MetricsTestParser"}'
+                      ' 1', lines)
+        self.assertIn('tsparser_parse_errors_total{parser="MetricsTestParser",'
+                      'type="Value\\"Error"} 1', lines)
+        self.assertIn('tsparser_log_messages_total{module="metrics_test"} 1',
+                      lines)
+        self.assertIn('tsparser_stage_seconds_bucket{'
+                      'stage="parse/MetricsTestParser",le="0.002048"} 0',
+                      lines)
+        self.assertIn('tsparser_stage_seconds_bucket{'
+                      'stage="parse/MetricsTestParser",le="0.004096"} 1',
+                      lines)
+        self.assertIn('tsparser_stage_seconds_bucket{'
+                      'stage="parse/MetricsTestParser",le="+Inf"} 1', lines)
+        self.assertIn('tsparser_stage_seconds_count{'
+                      'stage="parse/MetricsTestParser"} 1', lines)
+        for line in lines:
+            if not line.startswith('#'):
+                self.assertRegex(line, r'^tsparser_\w+(\{.*\})? \S+$')
+
+    def test_server(self):
+        server = metrics.start_metrics_server('127.0.0.1', 0)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = 'http://127.0.0.1:{}'.format(server.server_address[1])
+        with urlopen(url + '/metrics') as response:
+            self.assertEqual(response.headers['Content-Type'],
+                             metrics.CONTENT_TYPE)
+            self.assertIn('tsparser_received_lines_total',
+                          response.read().decode('utf-8'))
+        with self.assertRaises(HTTPError) as context:
+            urlopen(url + '/other')
+        context.exception.close()
+        self.assertEqual(context.exception.code, 404)
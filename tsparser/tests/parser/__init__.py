@@ -1,8 +1,8 @@
 import types
 import unittest
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 
-from tsparser import main
+from tsparser import main, records
 
 
 DEFAULT_TIMESTAMP = '2015-01-01T12:00:00.000000'
@@ -19,7 +19,7 @@ class ParserTestCase(unittest.TestCase):
 
     def setUp(self):
         # Add functions to test parsers easily
-        parsers = main._get_parsers()
+        self.parsers = parsers = main._get_parsers()
         # Append timestamp so it does not have to be included in test data
         self.parse_line = lambda line: (
             main._parse_line(parsers, line + ',' + DEFAULT_TIMESTAMP, False))
@@ -27,10 +27,19 @@ class ParserTestCase(unittest.TestCase):
 
         # Replace send_data with mock, so it does not actually send any data
         # nor need access to the internet, but we can check whether
-        # the function was actually called
-        self.patcher = patch('tsparser.sender.send_data')
+        # the function was actually called. Records are passed to the mock
+        # as dicts, the way they are sent to the server.
+        self.send_data_mock = Mock()
+        self.patcher = patch('tsparser.sender.send_data', (
+            lambda data, *args: self.send_data_mock(records.to_dict(data),
+                                                    *args)))
         self.addCleanup(self.patcher.stop)
-        self.send_data_mock = self.patcher.start()
+        self.patcher.start()
+
+        # Watchdog completing GPS fixes could fire after the test has finished
+        timeout_patcher = patch('tsparser.config.GPS_FIX_TIMEOUT', None)
+        self.addCleanup(timeout_patcher.stop)
+        timeout_patcher.start()
 
 
 def _parse_output(self, output):
@@ -1,4 +1,8 @@
+from functools import reduce
+import threading
+from time import sleep
 import unittest
+from unittest.mock import patch
 
 from tsparser.parser import gps
 from tsparser.tests.parser import DEFAULT_TIMESTAMP, ParserTestCase
@@ -34,40 +38,116 @@ $GPRMC,002905.799,V,,,,,0.00,0.00,060180,,,N*4B''')
             {'timestamp': DEFAULT_TIMESTAMP, 'active_satellites': 0,
              'quality': 'no_fix', 'fix_type': 'no_fix'}, gps.GPSParser.url)
 
+    def test_gps_parser_lost_sentences(self):
+        """Test GPSParser when $GPVTG and then $GPGGA are lost"""
+        self.parse_output('''
+$GPGGA,123519,4807.038,N,01130.000,E,1,08,0.9,545.4,M,46.9,M,,*46
+$GPGSA,A,3,04,05,,09,12,,,24,,,,,2.5,1.3,2.1*39''')
+        self.assertEqual(self.send_data_mock.called, False)
+        # The next fix starts, so the previous one is complete
+        self.parse_line('$GPRMC,123520,A,4807.038,N,01131.000,E,022.4,084.4,'
+                        '230394,003.1,W*60')
+        self.send_data_mock.assert_called_once_with(
+            {'timestamp': DEFAULT_TIMESTAMP,
+             'latitude': 48.1173, 'longitude': 11.5, 'altitude': 545.4,
+             'quality': 'gps', 'fix_type': '3d', 'pdop': 2.5, 'hdop': 1.3,
+             'vdop': 2.1, 'active_satellites': 8},
+            gps.GPSParser.url)
+        self.parse_line('$GPVTG,054.7,T,034.4,M,005.5,N,010.2,K*48')
+        data = self.send_data_mock.call_args[0][0]
+        self.assertAlmostEqual(data['latitude'], 48.1173)
+        self.assertAlmostEqual(data['longitude'], 11.516667, 4)
+        self.assertAlmostEqual(data['speed_over_ground'], 41.4848)
 
-class TestGPSUtils(unittest.TestCase):
-    def test_parse_latitude(self):
-        self.assertAlmostEqual(gps._parse_latitude('3855.23816', 'N'),
-                               38.920636, 4)
-        self.assertAlmostEqual(gps._parse_latitude('3855.23816', 'S'),
-                               -38.920636, 4)
-        self.assertRaises(ValueError, gps._parse_latitude, '3855.23816', 'X')
+    def test_gps_parser_required_fields(self):
+        """Test GPSParser sending fix as soon as required fields are parsed"""
+        with patch('tsparser.config.GPS_REQUIRED_FIELDS',
+                   ('latitude', 'fix_type')):
+            self.parse_output('''
+$GPGGA,123519,4807.038,N,01130.000,E,1,08,0.9,545.4,M,46.9,M,,*46
+$GPGSA,A,3,04,05,,09,12,,,24,,,,,2.5,1.3,2.1*39''')
+            self.assertEqual(self.send_data_mock.call_count, 1)
+            # Late sentences of the sent fix are ignored
+            self.parse_output('''
+$GPRMC,123519,A,4807.038,N,01131.000,E,022.4,084.4,230394,003.1,W*6A
+$GPVTG,054.7,T,034.4,M,005.5,N,010.2,K*48''')
+            self.assertEqual(self.send_data_mock.call_count, 1)
+
+    def test_gps_parser_timeout(self):
+        """Test GPSParser sending fix when it is not completed in time"""
+        with patch('tsparser.config.GPS_FIX_TIMEOUT', 0.05):
+            self.parse_output('''
+$GPGGA,123519,4807.038,N,01130.000,E,1,08,0.9,545.4,M,46.9,M,,*46''')
+            # No more sentences come
+            for _ in range(100):
+                if self.send_data_mock.called:
+                    break
+                sleep(0.05)
+            self.parse_output('''
+$GPGSA,A,3,04,05,,09,12,,,24,,,,,2.5,1.3,2.1*39''')
+        self.assertEqual(self.send_data_mock.call_count, 1)
+        data = self.send_data_mock.call_args[0][0]
+        self.assertEqual(data['quality'], 'gps')
+        self.assertNotIn('fix_type', data)
 
-    def test_parse_longitude(self):
-        self.assertAlmostEqual(gps._parse_longitude('00924.41358', 'E'),
-                               9.406893, 4)
-        self.assertAlmostEqual(gps._parse_longitude('00924.41358', 'W'),
-                               -9.406893, 4)
-        self.assertRaises(ValueError, gps._parse_longitude, '3855.23816', 'X')
+    def test_gps_parser_timeout_threads(self):
+        """Test that GPSParser does not start thread for each fix"""
+        with patch('tsparser.config.GPS_FIX_TIMEOUT', 60), \
+                patch('tsparser.parser.gps.Thread',
+                      wraps=threading.Thread) as thread_mock:
+            for utc_time in range(123519, 123529):
+                self.parse_line('$GPGGA,{},4807.038,N,01130.000,E,1,08,0.9,'
+                                '545.4,M,46.9,M,,*'.format(utc_time) +
+                                '%.2X' % _xor('GPGGA,{},4807.038,N,01130.000,'
+                                              'E,1,08,0.9,545.4,M,46.9,M,,'
+                                              .format(utc_time)))
+        self.assertEqual(self.send_data_mock.call_count, 9)
+        self.assertEqual(thread_mock.call_count, 1)
+
+    def test_gps_parser_multi_constellation(self):
+        """Test GPSParser with GPS and GLONASS receiver (NMEA 4.1)"""
+        self.parse_output('''
+$GNGGA,123519,4807.038,N,01130.000,E,1,12,0.9,545.4,M,46.9,M,,*53
+$GNGSA,A,3,04,05,09,12,24,,,,,,,,2.5,1.3,2.1,1*3A
+$GNGSA,A,3,65,67,,,,,,,,,,,2.5,1.3,2.1,2*36
+$GPGSV,2,1,05,04,40,083,46,05,17,308,41,09,07,344,39,12,22,228,45*76
+$GPGSV,2,2,05,24,10,010,,1*57
+$GLGSV,1,1,02,65,40,083,30,67,17,308,40*60
+$GNRMC,123519,A,4807.038,N,01131.000,E,022.4,084.4,230394,003.1,W,A*19
+$GNVTG,054.7,T,034.4,M,005.5,N,010.2,K,A*3B''')
+        data = self.send_data_mock.call_args[0][0]
+        self.assertEqual(data['satellites_in_view'], 7)
+        self.assertAlmostEqual(data['mean_snr'], 241 / 6)
+        self.assertEqual(data['fix_type'], '3d')
+        self.assertEqual(data['vdop'], 2.1)
+        self.assertAlmostEqual(data['latitude'], 48.1173)
+        parser = self.parsers['$GNGGA']
+        self.assertEqual(sorted(parser.satellites), ['GL', 'GP'])
+        self.assertEqual([satellite.snr for satellite in
+                          parser.satellites['GP']], [46, 41, 39, 45, None])
 
-    def test_parse_quality(self):
-        self.assertEqual(gps._parse_quality('0'), 'no_fix')
-        self.assertEqual(gps._parse_quality('1'), 'gps')
-        self.assertEqual(gps._parse_quality('2'), 'dgps')
-        self.assertRaises(IndexError, gps._parse_quality, '4')
-        self.assertRaises(ValueError, gps._parse_quality, 'lol1337')
+    def test_checksums_validated_in_advance(self):
+        valid = ('$GPVTG,054.7,T,034.4,M,005.5,N,010.2,K*48,' +
+                 DEFAULT_TIMESTAMP)
+        invalid = ('$GPVTG,054.7,T,034.4,M,005.5,N,010.2,K*49,' +
+                   DEFAULT_TIMESTAMP)
+        parser = self.parsers['$GPVTG']
+        parser.validate_checksums_in_advance([valid, invalid])
+        with patch('tsparser.parser.gps._checksum_valid') as checksum_valid:
+            self.parse_line(valid[:-len(DEFAULT_TIMESTAMP) - 1])
+            self.assertRaises(ValueError, self.parse_line,
+                              invalid[:-len(DEFAULT_TIMESTAMP) - 1])
+        self.assertFalse(checksum_valid.called)
+        parser.validate_checksums_in_advance(None)
+        self.assertRaises(ValueError, self.parse_line,
+                          invalid[:-len(DEFAULT_TIMESTAMP) - 1])
 
-    def test_parse_fix_type(self):
-        self.assertEqual(gps._parse_fix_type('1'), 'no_fix')
-        self.assertEqual(gps._parse_fix_type('2'), '2d')
-        self.assertEqual(gps._parse_fix_type('3'), '3d')
-        self.assertRaises(IndexError, gps._parse_quality, '4')
-        self.assertRaises(ValueError, gps._parse_quality, 'lol1337')
 
-    def test_parse_speed(self):
-        self.assertAlmostEqual(gps._parse_speed('31.332'), 58.026864, 3)
-        self.assertRaises(ValueError, gps._parse_speed, 'lol1337')
+def _xor(data):
+    return reduce(lambda checksum, char: checksum ^ ord(char), data, 0)
 
+
+class TestGPSUtils(unittest.TestCase):
     def test_checksum_valid(self):
         self.assertEqual(gps._checksum_valid(
             '$GPGSA,A,3,04,05,,09,12,,,24,,,,,2.5,1.3,2.1*39'), True)
@@ -80,3 +160,23 @@ class TestGPSUtils(unittest.TestCase):
         self.assertRaises(ValueError, gps._checksum_valid, 'random')
         self.assertRaises(ValueError, gps._checksum_valid, '$lol')
         self.assertRaises(ValueError, gps._checksum_valid, 'lol*')
+
+    def test_validate_checksums(self):
+        lines = [
+            '$GPGSA,A,3,04,05,,09,12,,,24,,,,,2.5,1.3,2.1*39,timestamp',
+            '$GPVTG,054.7,T,034.4,M,005.5,N,010.2,K*48',
+            '$GPVTG,054.7,T,034.4,M,005.5,N,010.2,K*4',
+            '$GPGSA,B,3,04,05,,09,12,,,24,,,,,2.5,1.3,2.1*39',
+            '$GPVTG,054.7,T,034.4,M,005.5,N,010.2,K*48',
+            'random', 'lol*', '$lol', '$*00', '$GPVTG,0*4a',
+            '$' + 'A' * 300 + '*00',
+        ]
+        self.assertEqual(gps.validate_checksums(lines).tolist(),
+                         [True, True, False, False, True,
+                          False, False, False, True, False, True])
+        self.assertEqual(gps.validate_checksums([]).tolist(), [])
+        self.assertEqual(gps.validate_checksums(['no', 'dollar']).tolist(),
+                         [False, False])
+        # Long sentence is folded correctly
+        self.assertTrue(gps._checksum_valid('$' + 'A' * 300 + '*00'))
+        self.assertFalse(gps._checksum_valid('$' + 'A' * 301 + '*00'))
@@ -0,0 +1,73 @@
+import unittest
+
+from tsparser.parser import nmea
+
+
+class TestNMEAUtils(unittest.TestCase):
+    def test_parse_latitude(self):
+        self.assertAlmostEqual(nmea.parse_latitude('3855.23816', 'N'),
+                               38.920636, 4)
+        self.assertAlmostEqual(nmea.parse_latitude('3855.23816', 'S'),
+                               -38.920636, 4)
+        self.assertRaises(ValueError, nmea.parse_latitude, '3855.23816', 'X')
+
+    def test_parse_longitude(self):
+        self.assertAlmostEqual(nmea.parse_longitude('00924.41358', 'E'),
+                               9.406893, 4)
+        self.assertAlmostEqual(nmea.parse_longitude('00924.41358', 'W'),
+                               -9.406893, 4)
+        self.assertRaises(ValueError, nmea.parse_longitude, '3855.23816', 'X')
+
+    def test_parse_quality(self):
+        self.assertEqual(nmea.parse_quality('0'), 'no_fix')
+        self.assertEqual(nmea.parse_quality('1'), 'gps')
+        self.assertEqual(nmea.parse_quality('2'), 'dgps')
+        self.assertRaises(IndexError, nmea.parse_quality, '4')
+        self.assertRaises(ValueError, nmea.parse_quality, 'lol1337')
+
+    def test_parse_fix_type(self):
+        self.assertEqual(nmea.parse_fix_type('1'), 'no_fix')
+        self.assertEqual(nmea.parse_fix_type('2'), '2d')
+        self.assertEqual(nmea.parse_fix_type('3'), '3d')
+        self.assertRaises(IndexError, nmea.parse_quality, '4')
+        self.assertRaises(ValueError, nmea.parse_quality, 'lol1337')
+
+    def test_parse_speed(self):
+        self.assertAlmostEqual(nmea.parse_speed('31.332'), 58.026864, 3)
+        self.assertRaises(ValueError, nmea.parse_speed, 'lol1337')
+
+
+class TestSentences(unittest.TestCase):
+    def test_parse_sentence(self):
+        sentence = nmea.parse_sentence('$GNGGA', '123519,4807.038,N,01130.000,'
+                                       'E,1,08,0.9,545.4,M,,M,,'.split(','))
+        self.assertIsInstance(sentence, nmea.GGA)
+        self.assertEqual(sentence.talker, 'GN')
+        self.assertAlmostEqual(sentence.latitude, 48.1173)
+        self.assertEqual(sentence.active_satellites, 8)
+        self.assertIsNone(sentence.geoidal_separation)
+        self.assertIsNone(nmea.parse_sentence('$GNTXT', ['01']))
+        self.assertIsNone(nmea.parse_sentence('$XXGGA', ['01']))
+        self.assertIn('$GLGSV', nmea.get_data_ids())
+
+    def test_lazy_decoding(self):
+        sentence = nmea.parse_sentence('$GPGSA', ['A', 'x'] + [''] * 12 +
+                                       ['2.5', '1.3', '2.1'])
+        self.assertEqual(sentence.pdop, 2.5)  # invalid fix type not decoded
+        self.assertRaises(ValueError, getattr, sentence, 'fix_type')
+
+    def test_gsv_assembler(self):
+        assembler = nmea.GSVAssembler()
+        first = nmea.parse_sentence(
+            '$GLGSV', '2,1,05,65,40,083,46,66,17,308,,67,07,344,39,68,22,'
+            '228,45'.split(','))
+        second = nmea.parse_sentence('$GLGSV', '2,2,05,69,10,010,30'
+                                     .split(','))
+        self.assertIsNone(assembler.add(first))
+        satellites = assembler.add(second)
+        self.assertEqual([satellite.prn for satellite in satellites],
+                         [65, 66, 67, 68, 69])
+        self.assertEqual(satellites[1], nmea.Satellite('GL', 66, 17, 308,
+                                                       None))
+        # Message with missing first part is discarded
+        self.assertIsNone(assembler.add(second))
@@ -0,0 +1,104 @@
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+import unittest
+
+from tsparser import main
+from tsparser.parser import photo
+from tsparser.tests.parser import ParserTestCase, DEFAULT_TIMESTAMP
+from tsparser.timestamp import format_timestamp
+
+
+class TestPhoto(ParserTestCase):
+    def test_photo_parser(self):
+        """Test PhotoParser with raw photo file"""
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'photo')
+            with open(filename, 'wb') as raw_photo:
+                raw_photo.write(b'\x1f\xf8' * photo.PHOTO_WIDTH * 240)
+            self.parse_line('$PHOTO,' + filename + ',1.0000')
+            self.photo_parser().wait_for_pending_photos()
+            self.assertTrue(os.path.exists(filename + '.jpg'))
+        data, url, jpg_photo = self.send_data_mock.call_args[0]
+        self.assertEqual(data, {'timestamp': DEFAULT_TIMESTAMP})
+        self.assertEqual(url, photo.PhotoParser.url)
+        self.assertEqual(jpg_photo[:2], b'\xff\xd8')  # JPEG SOI marker
+
+    def test_photo_parser_order(self):
+        """Test that photos are sent in the order they were parsed in"""
+        with tempfile.TemporaryDirectory() as directory:
+            for i in range(6):
+                filename = os.path.join(directory, str(i))
+                with open(filename, 'wb') as raw_photo:
+                    # the first photos are bigger, so they take longer
+                    raw_photo.write(os.urandom(2 * photo.PHOTO_WIDTH *
+                                               (240 - i * 40)))
+                main._parse_line(self.parsers,
+                                 '$PHOTO,{},{}'.format(filename, i), False)
+            self.photo_parser().wait_for_pending_photos()
+        timestamps = [call[0][0]['timestamp']
+                      for call in self.send_data_mock.call_args_list]
+        self.assertEqual(timestamps, [format_timestamp(i) for i in range(6)])
+
+    def test_photo_parser_invalid_data(self):
+        """Test PhotoParser with invalid input"""
+        self.assertRaises(ValueError, self.parse_line, '$PHOTO')
+        self.assertRaises(ValueError, self.parse_line, '$PHOTO,a,b,c')
+        self.assertRaises(ValueError, self.parse_line, '$PHOTO,a,b')
+
+    def photo_parser(self):
+        return self.parsers['$PHOTO']
+
+
+# Script converting a photo in the process pool; it imports main.py of the
+# project, as spawned workers import the script itself again
+POOL_SCRIPT = textwrap.dedent('''
+    from unittest.mock import patch
+
+    import main
+    from tsparser import config, main as parser_main
+
+    if __name__ == '__main__':
+        config.PHOTO_WORKERS = 1
+        with patch('tsparser.sender.send_data') as send_data_mock:
+            parsers = parser_main._get_parsers()
+            parser_main._parse_line(parsers, '$PHOTO,{},1.0,1420113600',
+                                    False)
+            parsers['$PHOTO'].wait_for_pending_photos()
+        print(send_data_mock.call_count)
+''')
+
+
+class TestPhotoPool(unittest.TestCase):
+    def test_pool_from_script(self):
+        """Test that workers spawned from script entry point convert photos"""
+        project_directory = os.path.dirname(os.path.dirname(
+            os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'photo')
+            with open(filename, 'wb') as raw_photo:
+                raw_photo.write(b'\x1f\xf8' * photo.PHOTO_WIDTH * 240)
+            script_filename = os.path.join(directory, 'script.py')
+            with open(script_filename, 'w') as script:
+                script.write(POOL_SCRIPT.format(filename))
+            environment = dict(os.environ, PYTHONPATH=project_directory)
+            output = subprocess.run(
+                [sys.executable, script_filename], cwd=directory,
+                env=environment, stdout=subprocess.PIPE,
+                stdin=subprocess.DEVNULL, timeout=60, check=True).stdout
+            self.assertTrue(os.path.exists(filename + '.jpg'))
+        self.assertEqual(output.strip(), b'1')
+
+
+class TestPhotoUtils(unittest.TestCase):
+    def test_get_rgb_from_bytearray(self):
+        # little endian: red, green, blue, white, black, 0x1234
+        raw = b'\x00\xf8\xe0\x07\x1f\x00\xff\xff\x00\x00\x34\x12'
+        rgb = photo.PhotoParser.get_rgb_from_bytearray(raw, 3)
+        self.assertEqual(rgb.shape, (2, 3, 3))
+        self.assertEqual(rgb.tolist(), [
+            [[248, 0, 0], [0, 252, 0], [0, 0, 248]],
+            [[248, 252, 248], [0, 0, 0], [16, 68, 160]]
+        ])
@@ -0,0 +1,103 @@
+import os
+import tempfile
+from threading import Event
+import unittest
+from unittest.mock import patch
+
+from tsparser import pipeline
+from tsparser.pipeline import ArchiveWriter, RingBuffer
+from tsreceiver.usart import Usart
+
+
+class TestRingBuffer(unittest.TestCase):
+    def test_fifo(self):
+        ring_buffer = RingBuffer(3)
+        for i in range(3):
+            self.assertTrue(ring_buffer.put(i))
+        self.assertEqual(ring_buffer.get(), 0)
+        self.assertTrue(ring_buffer.put(3))
+        self.assertEqual([ring_buffer.get() for _ in range(3)], [1, 2, 3])
+        self.assertEqual(len(ring_buffer), 0)
+
+    def test_overwrite(self):
+        ring_buffer = RingBuffer(2)
+        ring_buffer.put(0)
+        ring_buffer.put(1)
+        self.assertFalse(ring_buffer.put(2))
+        self.assertEqual(len(ring_buffer), 2)
+        self.assertEqual([ring_buffer.get() for _ in range(2)], [1, 2])
+
+
+class TestPipeline(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.raw_data_filename = os.path.join(directory.name, 'raw_data')
+
+    def test_archive_writer(self):
+        writer = ArchiveWriter(self.raw_data_filename, 0)
+        writer.start()
+        writer.write('$SHT,1\r\n')
+        writer.write('$SHT,2\r\n')
+        writer.close()
+        writer.join(5)
+        self.assertFalse(writer.is_alive())
+        writer.write('$SHT,3\r\n')
+        writer.flush()
+        with open(self.raw_data_filename) as raw_data:
+            self.assertEqual(raw_data.read(), '$SHT,1\n$SHT,2\n')
+
+    def test_receive_records(self):
+        usart = Usart.__new__(Usart)
+        usart.uart_connection = SerialDeviceMock([b'$SHT,1,2\n',
+                                                  b'$GPGGA,3\n'])
+        with patch('tsparser.config.RAW_DATA_FILENAME',
+                   self.raw_data_filename), \
+                patch('tsreceiver.main.now', return_value=1.5):
+            records = pipeline.receive_records(usart)
+            self.assertEqual(next(records),
+                             ('$SHT,1,2,1.500000',
+                              ['$SHT', '1', '2', '1.500000']))
+            self.assertEqual(next(records),
+                             ('$GPGGA,3,1.500000',
+                              ['$GPGGA', '3', '1.500000']))
+
+    def test_receiver_messages_logged(self):
+        usart = Usart.__new__(Usart)
+        usart.uart_connection = SerialDeviceMock([b'\xff\n', b'$SHT,1\n'])
+        with patch('tsparser.config.RAW_DATA_FILENAME',
+                   self.raw_data_filename), \
+                patch('tsparser.utils.Logger.log') as log_mock:
+            records = pipeline.receive_records(usart)
+            self.assertEqual(next(records)[1][:2], ['$SHT', '1'])
+        self.assertEqual(log_mock.call_args[0][0], 'receiver')
+        self.assertIn('cannot be decoded', log_mock.call_args[0][1])
+
+    def test_receiving_failure(self):
+        usart = Usart.__new__(Usart)
+        usart.uart_connection = SerialDeviceMock([b'$SHT,1,2\n', OSError()])
+        with patch('tsparser.config.RAW_DATA_FILENAME',
+                   self.raw_data_filename), \
+                patch('tsparser.utils.Logger.log') as log_mock:
+            records = list(pipeline.receive_records(usart))
+        self.assertEqual(len(records), 1)
+        self.assertIn('Receiving has failed', log_mock.call_args[0][1])
+        with open(self.raw_data_filename) as raw_data:
+            self.assertTrue(raw_data.read().startswith('$SHT,1,2,'))
+
+
+class SerialDeviceMock:
+    """
+    Serial device returning given lines (or raising given exceptions), then
+    waiting forever
+    """
+    def __init__(self, lines):
+        self.lines = lines
+
+    def readline(self):
+        if not self.lines:
+            Event().wait()
+        line = self.lines.pop(0)
+        if isinstance(line, Exception):
+            raise line
+        return line
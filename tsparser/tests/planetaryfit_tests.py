@@ -0,0 +1,69 @@
+import random
+import unittest
+
+from tsparser import planetaryfit
+
+
+def _brute_force_fit(samples, max_radius):
+    """Check every integer radius, exactly as the calculator used to do"""
+    best = (float('inf'), 0, 0)
+    for radius in range(1, max_radius + 1):
+        numerator = sum(planetaryfit.G * a / (radius + h)**2 for a, h in samples)
+        denominator = sum(planetaryfit.G / (radius + h)**2 for a, h in samples)
+        mass = numerator / denominator**2
+        error = sum((a - planetaryfit.G * mass / (radius + h)**2)**2
+                    for a, h in samples)
+        if error < best[0]:
+            best = (error, mass, radius)
+    return best
+
+
+class TestFitMassAndRadius(unittest.TestCase):
+    def test_same_result_as_brute_force(self):
+        """Test that the search finds the same radius as checking every one"""
+        rand = random.Random(7)
+        for count in (2, 5, 20, 50):
+            samples = [(rand.uniform(0.8, 1.2), rand.uniform(0, 1000))
+                       for _ in range(count)]
+            error, mass, radius = _brute_force_fit(samples, 3000)
+            fit = planetaryfit.fit_mass_and_radius(*zip(*samples),
+                                                   max_radius=3000)
+            self.assertEqual(fit[1], radius)
+            self.assertAlmostEqual(fit[0] / mass, 1, 9)
+
+    def test_invalid_input(self):
+        self.assertRaises(ValueError, planetaryfit.fit_mass_and_radius, [], [])
+        self.assertRaises(ValueError, planetaryfit.fit_mass_and_radius,
+                          [1.0, 2.0], [1.0])
+
+
+class TestFitAccumulator(unittest.TestCase):
+    def setUp(self):
+        rand = random.Random(3)
+        # altitudes are rounded to the resolution, so grouping is lossless
+        self.samples = [(rand.uniform(0.8, 1.2), rand.randrange(0, 500) / 10)
+                        for _ in range(300)]
+
+    def test_same_result_as_ungrouped(self):
+        accumulator = planetaryfit.FitAccumulator(altitude_resolution=0.1)
+        for sample in self.samples:
+            accumulator.add(*sample)
+        self.assertEqual(len(accumulator), len(self.samples))
+        grouped = accumulator.fit()
+        ungrouped = planetaryfit.fit_mass_and_radius(*zip(*self.samples))
+        self.assertEqual(grouped[1], ungrouped[1])
+        self.assertAlmostEqual(grouped[0] / ungrouped[0], 1, 9)
+
+    def test_window(self):
+        accumulator = planetaryfit.FitAccumulator(altitude_resolution=0.1,
+                                                  window=50)
+        for sample in self.samples:
+            accumulator.add(*sample)
+        self.assertEqual(len(accumulator), 50)
+        windowed = accumulator.fit()
+        expected = planetaryfit.fit_mass_and_radius(*zip(*self.samples[-50:]))
+        self.assertEqual(windowed[1], expected[1])
+        self.assertAlmostEqual(windowed[0] / expected[0], 1, 9)
+
+    def test_empty(self):
+        self.assertRaises(ValueError, planetaryfit.FitAccumulator().fit)
@@ -0,0 +1,16 @@
+import unittest
+
+from tsparser.records import SHTRecord, to_dict
+
+
+class TestRecords(unittest.TestCase):
+    def test_to_dict(self):
+        record = SHTRecord(timestamp='T', temperature=20.5)
+        self.assertEqual(record.humidity, None)
+        self.assertEqual(to_dict(record), {'timestamp': 'T',
+                                           'temperature': 20.5})
+        self.assertEqual(to_dict({'a': 1}), {'a': 1})
+
+    def test_unknown_field(self):
+        self.assertRaises(TypeError, SHTRecord, pressure=1)
+        self.assertRaises(AttributeError, setattr, SHTRecord(), 'pressure', 1)
@@ -0,0 +1,97 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from tsparser import config, replay
+from tsparser.timestamp import parse_timestamp
+from tsparser.utils import Logger
+
+RAW_DATA = '''$GYRO,-413,-1286,-2545,2015-01-01T12:00:01.000000\r
+$ACCEL,14400,3328,5440,2015-01-01T12:00:01.000000\r
+$MAGNET,13310,-32001,5118,2015-01-01T12:00:01.000000\r
+$MBAR,3981106,2015-01-01T12:00:01.000000\r
+$TERM,26000,2015-01-01T12:00:02.000000\r
+$HYDR,24000,2015-01-01T12:00:02.000000\r
+$GYRO,1,2,3,2015-01-01T12:00:03.000000\r
+$ACCEL,4,5,6,2015-01-01T12:00:03.000000\r
+$MAGNET,7,8,9,2015-01-01T12:00:03.000000\r
+$MBAR,10,2015-01-01T12:00:03.000000'''
+
+
+class TestReplay(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.raw_data_filename = os.path.join(self.directory, 'raw_data')
+        with open(self.raw_data_filename, 'w') as raw_data:
+            raw_data.write(RAW_DATA)
+        # Parse errors are logged without file, so the real one is not written
+        for patcher in (patch('tsparser.config.LOG_FILENAME', None),
+                        patch('tsparser.utils.StatisticDataCollector'
+                              '.get_logger', return_value=Logger())):
+            self.addCleanup(patcher.stop)
+            patcher.start()
+
+    def test_dry_run(self):
+        sink = replay.DryRunSink()
+        replay.replay([self.raw_data_filename] * 2, sink)
+        self.assertEqual(sink.counts, {config.URL + '/imu': 4,
+                                       config.URL + '/sht': 2})
+        self.assertTrue(config.CALCULATOR_ENABLED)
+
+    def test_telemetry_not_stored(self):
+        with patch('tsparser.telemetry.TelemetryStore') as store_mock:
+            replay.replay([self.raw_data_filename], replay.DryRunSink())
+        self.assertFalse(store_mock.called)
+        self.assertTrue(config.TELEMETRY_ENABLED)
+
+    def test_gps_checksums(self):
+        with open(self.raw_data_filename, 'w') as raw_data:
+            raw_data.write(
+                '$GPGGA,123519,4807.038,N,01130.000,E,1,08,0.9,545.4,M,46.9,'
+                'M,,*46,2015-01-01T12:00:00.000000\n'
+                '$GPGGA,123520,4807.038,N,01130.000,E,1,08,0.9,545.4,M,46.9,'
+                'M,,*46,2015-01-01T12:00:01.000000\n'
+                '$GPVTG,054.7,T,034.4,M,005.5,N,010.2,K*48,'
+                '2015-01-01T12:00:02.000000\n')
+        sink = replay.DryRunSink()
+        with patch.object(replay, 'CHECKSUM_BATCH_SIZE', 2):
+            replay.replay([self.raw_data_filename], sink)
+        # The second sentence, with invalid checksum, is rejected
+        self.assertEqual(sink.counts, {config.URL + '/gps': 1})
+
+    def test_columnar_output(self):
+        filename = os.path.join(self.directory, 'output.npz')
+        sink = replay.ColumnarSink(filename)
+        replay.replay([self.raw_data_filename], sink)
+        sink.close()
+        with np.load(filename) as output:
+            self.assertEqual(output['imu/timestamp'].dtype, np.float64)
+            self.assertEqual(output['imu/timestamp'].tolist(),
+                             [parse_timestamp('2015-01-01T12:00:01.000000'),
+                              parse_timestamp('2015-01-01T12:00:03.000000')])
+            self.assertEqual(output['imu/gyro_z'].tolist(), [-2545, 3])
+            self.assertEqual(output['sht/temperature'].shape, (1,))
+
+    def test_multiple_processes(self):
+        with open(self.raw_data_filename, 'w') as raw_data:
+            raw_data.write('\n'.join([RAW_DATA] * 10))
+        sink = replay.DryRunSink()
+        replay.replay([self.raw_data_filename], sink, processes=2)
+        # Record split between the chunks may be lost
+        self.assertIn(sink.counts[config.URL + '/imu'], (19, 20))
+        self.assertIn(sink.counts[config.URL + '/sht'], (9, 10))
+
+    def test_split_into_chunks(self):
+        chunks = replay._split_into_chunks(self.raw_data_filename, 3)
+        self.assertEqual(chunks[0][0], 0)
+        self.assertEqual(chunks[-1][1],
+                         os.path.getsize(self.raw_data_filename))
+        with open(self.raw_data_filename, 'rb') as raw_data:
+            content = raw_data.read()
+        for start, end in chunks:
+            self.assertTrue(start == 0 or content[start - 1:start] == b'\n')
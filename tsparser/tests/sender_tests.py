@@ -0,0 +1,168 @@
+import os
+from queue import Empty
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from tsparser import sender
+from tsparser.spool import Spool
+from tsparser.tests.statistic_data_collector_tests import create_collector
+
+
+class TestSender(unittest.TestCase):
+    def setUp(self):
+        patcher = patch('tsparser.sender.send_queue',
+                        Spool(':memory:', min_backoff=0.01))
+        self.addCleanup(patcher.stop)
+        patcher.start()
+        # Collector without log file, so the real one is not written
+        collector_patcher = patch('tsparser.sender.StatisticDataCollector',
+                                  return_value=create_collector())
+        self.addCleanup(collector_patcher.stop)
+        collector_patcher.start()
+
+    def start_sender(self, **kwargs):
+        sender.Sender(daemon=True, **kwargs).start()
+
+    @patch('tsparser.sender._send_data', return_value=True)
+    def test_send_without_batching(self, send_data_mock):
+        self.start_sender()
+        sender.send_data({'a': 1}, 'url1')
+        sender.send_data({'a': 2}, 'url2', b'file')
+        sender.send_queue.join()
+        self.assertEqual(send_data_mock.call_count, 2)
+        self.assertEqual(send_data_mock.call_args[0], ({'a': 2}, 'url2', b'file'))
+
+    @patch('tsparser.sender._send_data', return_value=True)
+    @patch('tsparser.sender._send_batch', return_value=True)
+    def test_batching(self, send_batch_mock, send_data_mock):
+        self.start_sender(batch_size=3, batch_latency=0.05)
+        for i in range(4):
+            sender.send_data({'a': i}, 'url1')
+        sender.send_data({'b': 0}, 'url2')
+        sender.send_data({'c': 0}, 'url1', b'file')
+        sender.send_queue.join()
+
+        batches = sorted(((call[0][1], call[0][0])
+                          for call in send_batch_mock.call_args_list),
+                         key=lambda batch: batch[0])
+        self.assertEqual(batches, [
+            ('url1', [{'a': 0}, {'a': 1}, {'a': 2}]),
+            ('url1', [{'a': 3}]),  # sent after batch_latency
+            ('url2', [{'b': 0}])
+        ])
+        # Files are never batched
+        self.assertEqual(send_data_mock.call_args[0][:3],
+                         ({'c': 0}, 'url1', b'file'))
+
+    @patch('tsparser.sender._send_data')
+    def test_retry(self, send_data_mock):
+        """Test that requests are retried until the server accepts them"""
+        results = {'url1': [None, True], 'url2': [None, False, True]}
+        send_data_mock.side_effect = (
+            lambda data, url, *args, **kwargs: results[url].pop(0))
+        self.start_sender()
+        sender.send_data({'a': 1}, 'url1')
+        sender.send_data({'a': 2}, 'url2')
+        sender.send_queue.join()
+        self.assertEqual(results, {'url1': [], 'url2': []})
+
+    @patch('tsparser.sender._send_data', return_value=False)
+    @patch('tsparser.config.SENDER_MAX_ATTEMPTS', 3)
+    def test_drop_rejected(self, send_data_mock):
+        """Test that request rejected too many times is dropped"""
+        with patch('tsparser.sender.send_queue',
+                   Spool(':memory:', min_backoff=0.01)):
+            self.start_sender()
+            sender.send_data({'a': 1}, 'url1')
+            sender.send_queue.join()
+        self.assertEqual(send_data_mock.call_count, 3)
+
+    @unittest.skipIf(sender.aiohttp is None, 'aiohttp is not installed')
+    @patch('tsparser.sender._send_data_async', new_callable=AsyncMock)
+    def test_async_sender(self, send_data_mock):
+        failures = [{'a': 1}]
+
+        def send(session, data, url, file=None):
+            if data in failures:
+                failures.remove(data)
+                return None
+            return True
+        send_data_mock.side_effect = send
+        sender.AsyncSender(concurrency=2, daemon=True).start()
+        for i in range(5):
+            sender.send_data({'a': i}, 'url1')
+        sender.send_queue.join()
+        # request with a == 1 failed the first time
+        self.assertEqual(send_data_mock.await_count, 6)
+
+    @unittest.skipIf(sender.aiohttp is None, 'aiohttp is not installed')
+    @patch('tsparser.utils.Logger.log')
+    @patch('tsparser.sender._send_data_async', new_callable=AsyncMock)
+    def test_async_sender_exception(self, send_data_mock, log_mock):
+        send_data_mock.side_effect = [ConnectionError('refused'), True]
+        sender.AsyncSender(concurrency=2, daemon=True).start()
+        sender.send_data({'a': 1}, 'url1')
+        sender.send_queue.join()
+        self.assertEqual(send_data_mock.await_count, 2)
+        self.assertIn('ConnectionError', log_mock.call_args[0][1])
+
+
+class TestSpool(unittest.TestCase):
+    def test_persistence(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'spool.db')
+            spool = Spool(filename)
+            spool.put({'a': 1}, 'url1')
+            spool.put({'a': 2}, 'url1', b'file')
+            spool.get()  # taken, but not sent
+            del spool
+
+            spool = Spool(filename)
+            self.assertEqual(len(spool), 2)
+            first = spool.get()
+            second = spool.get()
+            self.assertEqual((first.data, first.url, first.file),
+                             ({'a': 1}, 'url1', None))
+            self.assertEqual((second.data, second.url, second.file),
+                             ({'a': 2}, 'url1', b'file'))
+            spool.done(first)
+            self.assertEqual(len(spool), 1)
+
+    def test_url_backoff(self):
+        spool = Spool(':memory:', min_backoff=10)
+        spool.put({'a': 1}, 'url1')
+        spool.put({'a': 2}, 'url1')
+        spool.put({'b': 1}, 'url2')
+        spool.retry(spool.get(), url_unreachable=True)
+        # Both requests to url1 are waiting now
+        self.assertEqual(spool.get(timeout=0).url, 'url2')
+        self.assertRaises(Empty, spool.get, timeout=0)
+
+    def test_max_size(self):
+        spool = Spool(':memory:', max_size=30)
+        self.assertEqual(spool.put({'a': 1}, 'url1'), [])
+        self.assertEqual(spool.put({'a': 2}, 'url1'), [])
+        self.assertEqual(spool.put({'a': 3}, 'url1'), [({'a': 1}, 'url1')])
+        self.assertEqual(len(spool), 2)
+
+    def test_spool_of_older_version(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'spool.db')
+            db = sqlite3.connect(filename)
+            db.execute(
+                'CREATE TABLE requests (id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                'url TEXT NOT NULL, data TEXT NOT NULL, file BLOB, '
+                'size INTEGER NOT NULL, attempts INTEGER NOT NULL, '
+                'next_attempt REAL NOT NULL)')
+            db.execute("INSERT INTO requests (url, data, size, attempts, "
+                       "next_attempt) VALUES ('url1', '{}', 6, 0, 0)")
+            db.commit()
+            db.close()
+
+            spool = Spool(filename)
+            spool.put({'a': 1}, 'url1')
+            old_request = spool.get()
+            self.assertIsNone(old_request.queued_at)
+            self.assertIsNotNone(spool.get().queued_at)
@@ -0,0 +1,155 @@
+import os
+import tempfile
+from threading import Thread
+import unittest
+from unittest.mock import patch
+
+from tsparser.utils import StatisticDataCollector
+
+
+def create_collector():
+    # Separate instance, not the singleton used by the rest of the tests
+    with patch('tsparser.config.LOG_FILENAME', None):
+        return type.__call__(StatisticDataCollector)
+
+
+class TestStatisticDataCollector(unittest.TestCase):
+    def setUp(self):
+        patcher = patch('tsparser.utils.statistic_data_collector.monotonic',
+                        return_value=1000.5)
+        self.monotonic_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.sdc = create_collector()
+
+    def test_counters_of_threads(self):
+        def receive():
+            for _ in range(100):
+                self.sdc.on_new_received_data('line\n')
+        threads = [Thread(target=receive) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        statistics = self.sdc.get_statistics()
+        self.assertEqual(statistics.total_lines_received, 400)
+        self.assertEqual(statistics.total_data_received, 2000)
+
+    def test_counters_of_ended_threads(self):
+        def parse(second):
+            self.monotonic_mock.return_value = second + 0.5
+            self.sdc.on_new_received_data('line\n')
+            self.sdc.on_stage_finished('parse/SHTParser', 0.001)
+            self.sdc.on_parse_error('SHTParser', 'ValueError')
+        for second in (1000, 1001, 1001):
+            thread = Thread(target=parse, args=(second,))
+            thread.start()
+            thread.join()
+            self.sdc.get_statistics()
+        self.assertEqual(
+            len(self.sdc._StatisticDataCollector__thread_counters), 0)
+        self.monotonic_mock.return_value = 1002.5
+        statistics = self.sdc.get_statistics()
+        self.assertEqual(statistics.total_lines_received, 3)
+        self.assertEqual(statistics.lines_receiving_rates[1], 2)
+        self.assertEqual(statistics.lines_receiving_rates[10], 0.3)
+        stage_statistics = self.sdc.get_stage_statistics()['parse/SHTParser']
+        self.assertEqual(stage_statistics.count, 3)
+        self.assertEqual(stage_statistics.rates[1], 2)
+        self.assertEqual(self.sdc.get_parse_errors(),
+                         {('SHTParser', 'ValueError'): 3})
+
+    def test_rates(self):
+        for second in range(1000, 1020):
+            self.monotonic_mock.return_value = second + 0.5
+            for _ in range(second % 3):
+                self.sdc.on_new_received_data('12345')
+        self.monotonic_mock.return_value = 1020.5
+        statistics = self.sdc.get_statistics()
+        self.assertEqual(statistics.lines_receiving_rates,
+                         {1: 2, 10: 1.1, 60: 0.35})
+        self.assertEqual(statistics.data_receiving_rates[1], 10)
+        # No data for a while
+        self.monotonic_mock.return_value = 1100.5
+        statistics = self.sdc.get_statistics()
+        self.assertEqual(statistics.lines_receiving_rates,
+                         {1: 0, 10: 0, 60: 0})
+        self.assertEqual(statistics.time_since_last_data_receiving
+                         .total_seconds(), 81)
+
+    def test_requests(self):
+        self.sdc.on_requests_recovered(2)
+        for _ in range(3):
+            self.sdc.on_new_request(None)
+        self.sdc.on_request_dropped(None)
+        self.sdc.on_request_started(None)
+        self.sdc.on_request_started(None)
+        self.sdc.on_request_finished(None, 0.1)
+        self.sdc.on_request_sent(None)
+        self.sdc.on_request_failed(None)
+        self.monotonic_mock.return_value = 1001.5
+        statistics = self.sdc.get_statistics()
+        self.assertEqual(statistics.count_of_queued_requests, 3)
+        self.assertEqual(statistics.count_of_requests_in_flight, 1)
+        self.assertEqual(statistics.total_count_of_sent_requests, 1)
+        self.assertEqual(statistics.total_count_of_dropped_requests, 1)
+        self.assertEqual(statistics.total_count_of_failed_requests, 1)
+        self.assertEqual(statistics.average_request_latency, 0.1)
+        self.assertEqual(statistics.sending_rates[1], 1)
+        self.assertEqual(self.sdc.get_count_of_queued_requests(), 3)
+
+    def test_stage_statistics(self):
+        for second in range(1000, 1010):
+            self.monotonic_mock.return_value = second + 0.5
+            for duration in (0.001, 0.002, 0.004):
+                self.sdc.on_stage_finished('parse', duration)
+        self.monotonic_mock.return_value = 1010.5
+        thread = Thread(target=self.sdc.on_stage_finished, args=('http', 1))
+        thread.start()
+        thread.join()
+        stages = self.sdc.get_stage_statistics()
+        self.assertEqual(set(stages), {'parse', 'http'})
+        self.assertEqual(stages['parse'].count, 30)
+        self.assertEqual(stages['parse'].rates, {1: 3, 10: 3, 60: 0.5})
+        self.assertAlmostEqual(stages['parse'].mean, 0.007 / 3)
+        # Percentiles are approximated by bounds of buckets
+        self.assertAlmostEqual(stages['parse'].percentiles[50], 0.002,
+                               delta=0.0002)
+        self.assertEqual(stages['parse'].percentiles[99], 0.004)
+        self.assertEqual(stages['parse'].max, 0.004)
+        self.assertEqual(stages['http'].count, 1)
+        self.assertEqual(stages['http'].rates[1], 0)  # in the current second
+
+    def test_parse_errors(self):
+        self.sdc.on_parse_error('GPSParser', 'ParseException')
+        thread = Thread(target=self.sdc.on_parse_error,
+                        args=('GPSParser', 'ParseException'))
+        thread.start()
+        thread.join()
+        self.sdc.on_parse_error('system', 'NotParsed')
+        self.assertEqual(self.sdc.get_parse_errors(),
+                         {('GPSParser', 'ParseException'): 2,
+                          ('system', 'NotParsed'): 1})
+
+    def test_line_parsed(self):
+        self.sdc.on_line_parsed('parse/GPSParser', 0.001, 0.01)
+        stages = self.sdc.get_stage_statistics()
+        self.assertEqual(stages['parse/GPSParser'].max, 0.001)
+        self.assertEqual(stages['receive_to_parse'].max, 0.01)
+        self.sdc.on_line_parsed('parse/GPSParser', 0.001, None)
+        stages = self.sdc.get_stage_statistics()
+        self.assertEqual(stages['parse/GPSParser'].count, 2)
+        self.assertEqual(stages['receive_to_parse'].count, 1)
+
+    def test_dump_stage_statistics(self):
+        self.sdc.on_stage_finished('calculate', 0.25)
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'stages.txt')
+            self.sdc.dump_stage_statistics(filename)
+            self.sdc.dump_stage_statistics(filename)
+            with open(filename) as file:
+                lines = file.read().splitlines()
+        self.assertEqual(len(lines), 8)
+        self.assertTrue(lines[0].startswith('# '))
+        self.assertEqual(lines[1].split()[:2], ['Stage', 'Count'])
+        self.assertEqual(lines[2].split()[:2], ['calculate', '1'])
+        self.assertEqual(lines[2].split()[-1], '250.000')
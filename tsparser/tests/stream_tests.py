@@ -0,0 +1,102 @@
+import os
+import socket
+import tempfile
+from threading import Thread
+from time import monotonic
+import unittest
+from unittest.mock import patch
+
+from tsparser.stream import FileTailer, PipeReader, SocketReader
+from tsreceiver.stream import LineStreamer
+
+
+class TestStreamReaders(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'raw_data')
+
+    def read_lines(self, reader, count):
+        lines = reader.lines()
+        return [next(lines) for _ in range(count)]
+
+    def append_line(self, line):
+        with open(self.path, 'a') as raw:
+            raw.write(line)
+
+    def test_file_tailer(self):
+        with open(self.path, 'w') as raw:
+            raw.write('$GPGGA,1\r\n$GPR')
+        reader = FileTailer(self.path, chunk_size=4)
+        self.addCleanup(reader.close)
+        Thread(target=self.append_line,
+               args=('MC,2\r\n\r\n$SHT,3\n',)).start()
+        self.assertEqual(self.read_lines(reader, 3),
+                         ['$GPGGA,1', '$GPRMC,2', '$SHT,3'])
+
+    @patch('tsparser.stream._inotify_init1', None)
+    def test_file_tailer_without_inotify(self):
+        with open(self.path, 'w') as raw:
+            raw.write('$SHT,1\n')
+        with open(self.path, 'r') as raw_file:
+            reader = FileTailer(raw_file)
+            Thread(target=self.append_line, args=('$SHT,2\n',)).start()
+            self.assertEqual(self.read_lines(reader, 2), ['$SHT,1', '$SHT,2'])
+
+    def test_pipe_reader(self):
+        reader = PipeReader(self.path)
+        self.addCleanup(reader.close)
+        Thread(target=self.stream_lines,
+               args=(['$SHT,1\r\n', '$SHT,2\r\n'], ['$SHT,3\r\n'])).start()
+        self.assertEqual(self.read_lines(reader, 3),
+                         ['$SHT,1', '$SHT,2', '$SHT,3'])
+
+    def test_socket_reader(self):
+        reader = SocketReader(self.path)
+        self.addCleanup(reader.close)
+        Thread(target=self.stream_lines,
+               args=(['$SHT,1\r\n', '$SHT,2\r\n$SH'], ['$SHT,3\r\n'])).start()
+        # Incomplete line of the first writer is discarded
+        self.assertEqual(self.read_lines(reader, 3),
+                         ['$SHT,1', '$SHT,2', '$SHT,3'])
+
+    def test_streamer_does_not_wait_for_parser(self):
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.addCleanup(server.close)
+        server.bind(self.path)
+        server.listen(1)
+        streamer = LineStreamer(self.path, reconnect_interval=5,
+                                log=lambda message: None, buffer_size=100)
+        start = monotonic()
+        # The parser reads nothing, so socket buffers get full
+        passed = [streamer.write('$SHT,{}\r\n'.format(i))
+                  for i in range(100000)]
+        self.assertLess(monotonic() - start, 5)
+        self.assertFalse(all(passed))
+
+        connection, _ = server.accept()
+        self.addCleanup(connection.close)
+        received = list()
+        reader = Thread(target=lambda: received.extend(
+            iter(lambda: connection.recv(65536), b'')))
+        reader.start()
+        streamer.close()
+        reader.join()
+        lines = b''.join(received).decode('utf-8').split('\r\n')
+        self.assertEqual(lines.pop(), '')
+        numbers = [int(line[len('$SHT,'):]) for line in lines]
+        self.assertEqual(numbers, sorted(numbers))
+        self.assertEqual(len(numbers), passed.count(True))
+
+    def stream_lines(self, *writers):
+        """
+        Stream lines to the parser, using new connection for every list
+        """
+        for lines in writers:
+            streamer = LineStreamer(self.path, reconnect_interval=0,
+                                    log=lambda message: None)
+            while not streamer.write(lines[0]):
+                pass  # wait for the reader
+            for line in lines[1:]:
+                streamer.write(line)
+            streamer.close()
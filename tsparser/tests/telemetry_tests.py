@@ -0,0 +1,66 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from tsparser.telemetry import Field, Table, parse_timestamp
+
+
+class TestTable(unittest.TestCase):
+    fields = (Field('value', '<i2'), Field('level', '<f4'),
+              Field('quality', '<i1', ('bad', 'good')))
+
+    def fill(self, table, count):
+        for i in range(count):
+            record = {'timestamp': 100.0 + i, 'value': i, 'quality': 'good'}
+            if i % 2:
+                record['level'] = i / 2
+            table.append(record)
+
+    def test_query(self):
+        table = Table(self.fields, chunk_size=4)
+        self.fill(table, 10)
+        self.assertEqual(len(table), 10)
+        result = table.query(102.5, 107)
+        self.assertEqual(result['timestamp'].tolist(), [103, 104, 105, 106])
+        self.assertEqual(result['value'].tolist(), [3, 4, 5, 6])
+        np.testing.assert_array_equal(result['level'], [1.5, np.nan, 2.5,
+                                                        np.nan])
+        self.assertEqual(result['quality'].tolist(), [1] * 4)
+        self.assertEqual(len(table.query()['value']), 10)
+        self.assertEqual(len(table.query(200)['value']), 0)
+
+    def test_storage_on_disk(self):
+        with tempfile.TemporaryDirectory() as directory:
+            table = Table(self.fields, chunk_size=4, path=directory)
+            self.fill(table, 6)
+            self.assertEqual(table.query(103)['value'].tolist(), [3, 4, 5])
+            table.flush()
+            # Interrupted write of the last chunk
+            with open(os.path.join(directory, 'value.bin'), 'ab') as file:
+                file.write(b'\x00\x00')
+
+            table = Table(self.fields, chunk_size=4, path=directory)
+            self.assertEqual(len(table), 6)
+            table.append({'timestamp': 106.0, 'value': 6})
+            self.assertIsInstance(table.query(None, 104)['value'], np.memmap)
+            self.assertEqual(table.query(104)['value'].tolist(), [4, 5, 6])
+            self.assertEqual(table.query(104)['quality'].tolist(), [1, 1, -1])
+
+    def test_field_added_to_stored_table(self):
+        with tempfile.TemporaryDirectory() as directory:
+            table = Table(self.fields[:1], chunk_size=4, path=directory)
+            self.fill(table, 3)
+            table.flush()
+
+            table = Table(self.fields, chunk_size=4, path=directory)
+            self.assertEqual(len(table), 3)
+            self.assertEqual(table.query()['value'].tolist(), [0, 1, 2])
+            self.assertEqual(table.query()['quality'].tolist(), [-1] * 3)
+
+    def test_timestamp(self):
+        table = Table(self.fields, chunk_size=4)
+        table.append({'timestamp': '2015-01-01T12:00:00.500000'})
+        self.assertEqual(table.query()['timestamp'].tolist(),
+                         [parse_timestamp('2015-01-01T12:00:00.500000')])
@@ -0,0 +1,27 @@
+from datetime import datetime
+import unittest
+
+from tsparser.timestamp import DT_FORMAT, format_timestamp, now, \
+    parse_timestamp
+
+
+class TestTimestamp(unittest.TestCase):
+    def test_format_timestamp(self):
+        for timestamp in (1420113600.0, 1420113600.25, 1420113600.9999996,
+                          1420113601.000001, 1420199999.5, 1420200000.5):
+            self.assertEqual(format_timestamp(timestamp),
+                             datetime.fromtimestamp(timestamp)
+                             .strftime(DT_FORMAT))
+
+    def test_parse_timestamp(self):
+        self.assertEqual(parse_timestamp('1420113600.500000\r\n'),
+                         1420113600.5)
+        timestamp = parse_timestamp('2015-01-01T12:00:00.500000')
+        self.assertEqual(format_timestamp(timestamp),
+                         '2015-01-01T12:00:00.500000')
+        self.assertRaises(ValueError, parse_timestamp, 'timestamp')
+        self.assertRaises(ValueError, parse_timestamp, 'nan')
+
+    def test_now(self):
+        self.assertAlmostEqual(now(), datetime.now().timestamp(), 0)
+        self.assertLessEqual(now(), now())
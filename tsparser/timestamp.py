@@ -1,7 +1,66 @@
 from datetime import datetime
+from math import isfinite
+from time import monotonic, time
 
 DT_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
 
+# Wall-clock time of monotonic clock's zero, captured once, so timestamps
+# returned by now() never go backwards, even if system time is changed
+_EPOCH_OFFSET = time() - monotonic()
+# (whole seconds since the epoch, the same formatted without fraction)
+_format_cache = (None, None)
+
+
+def now():
+    """
+    :return: current time as number of seconds since the epoch
+    :rtype: float
+    """
+    return _EPOCH_OFFSET + monotonic()
+
+
+def format_timestamp(timestamp):
+    """
+    Serialize timestamp as simplified ISO 8601 (without timezone) string, in
+    local time. Consecutive timestamps usually fall within the same second,
+    so the part up to seconds is formatted only when the second changes.
+
+    :param timestamp: number of seconds since the epoch
+    :type timestamp: float
+    :return: serialized timestamp
+    :rtype: str
+    """
+    global _format_cache
+    seconds = int(timestamp // 1)
+    microseconds = round((timestamp - seconds) * 1e6)
+    if microseconds == 1000000:
+        seconds += 1
+        microseconds = 0
+    cached_seconds, formatted_seconds = _format_cache
+    if seconds != cached_seconds:
+        formatted_seconds = datetime.fromtimestamp(seconds).strftime(
+            DT_FORMAT[:DT_FORMAT.index('.')])
+        _format_cache = (seconds, formatted_seconds)
+    return '{}.{:06}'.format(formatted_seconds, microseconds)
+
+
+def parse_timestamp(timestamp):
+    """
+    :param timestamp: number of seconds since the epoch, or simplified ISO
+        8601 string (as in raw data recorded by older receivers)
+    :type timestamp: str
+    :return: number of seconds since the epoch
+    :rtype: float
+    :raises ValueError: if timestamp is in neither format
+    """
+    try:
+        seconds = float(timestamp)
+    except ValueError:
+        return datetime.fromisoformat(timestamp.strip()).timestamp()
+    if not isfinite(seconds):
+        raise ValueError('Timestamp {!r} is not finite'.format(timestamp))
+    return seconds
+
 
 def get_timestamp():
     """
@@ -11,4 +70,4 @@ def get_timestamp():
     :return: serialized datetime
     :rtype: str
     """
-    return datetime.now().strftime(DT_FORMAT)
+    return format_timestamp(now())
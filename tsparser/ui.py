@@ -3,18 +3,34 @@ from bisect import bisect_left
 import math
 import os
 from threading import Thread
-from time import sleep
+from time import monotonic
 
+from tsparser import config
 from tsparser.utils import Singleton, StatisticDataCollector
+from tsparser.utils.statistic_data_collector import RATE_WINDOWS
 
 
 class UserInterface(metaclass=Singleton):
     """
     User Interface is a singleton. Once ran, it renders UI until exiting the app.
+
+    Windows are created once and redrawn only when their content changes; all of them are then put on the screen at
+    once. The UI refreshes at refreshing_frequency while there are new logs or key presses, and slows down to
+    idle_refreshing_frequency when nothing happens (key presses are still handled immediately).
     """
 
-    def __init__(self, refreshing_frequency=30):
+    def __init__(self, refreshing_frequency=30, idle_refreshing_frequency=2, statistics_interval=0.5):
+        """
+        :param refreshing_frequency: frames per second when there is activity
+        :type refreshing_frequency: float
+        :param idle_refreshing_frequency: frames per second when there is no activity
+        :type idle_refreshing_frequency: float
+        :param statistics_interval: time (in seconds) between updates of statistics
+        :type statistics_interval: float
+        """
         self.__REFRESHING_FREQUENCY = refreshing_frequency
+        self.__IDLE_REFRESHING_FREQUENCY = idle_refreshing_frequency
+        self.__STATISTICS_INTERVAL = statistics_interval
 
     def run(self):
         Thread(target=self.__interface_thread, daemon=True).start()
@@ -22,11 +38,15 @@ class UserInterface(metaclass=Singleton):
     def __interface_thread(self):
         try:
             self.__init_curses()
+            frame_interval = 1 / self.__REFRESHING_FREQUENCY
             while True:
-                sleep(1/self.__REFRESHING_FREQUENCY)
                 self.__update_filter()
-                self.__process_events()
-                self.__render_frame()
+                active = self.__process_events(frame_interval)
+                active = self.__render_frame() or active
+                if active:
+                    frame_interval = 1 / self.__REFRESHING_FREQUENCY
+                else:  # slow down gradually
+                    frame_interval = min(frame_interval * 1.5, 1 / self.__IDLE_REFRESHING_FREQUENCY)
         except Exception as err:
             error_message = '{}: {}'.format(err.__class__.__name__, err)
             StatisticDataCollector().get_logger().log('ui', error_message)
@@ -37,7 +57,6 @@ class UserInterface(metaclass=Singleton):
         self.__screen = curses.initscr()
         curses.start_color()
         curses.curs_set(0)
-        self.__screen.nodelay(True)
         self.__screen.keypad(True)
         self.__SCREEN_MINIMAL_SIZE = 24, 80  # lines, cols
 
@@ -57,10 +76,17 @@ class UserInterface(metaclass=Singleton):
         self.__scroll_position = 0
         self.__log_index_to_last_line_no = list()
         self.__cached_processed_logs = list()
+        self.__next_log_sequence_number = 0
         self.__filter_window_active = False
         self.__filter = dict()
         self.__filter_selected_index = int()
         self.__filter_selected_module = str()
+        self.__windows = None
+        self.__dirty_windows = set()
+        self.__displayed_statistics = None
+        self.__next_statistics_update = 0
+        self.__stages_panel_active = False
+        self.__create_windows()
         StatisticDataCollector().get_logger().log('ui', 'User interface initialized!')
 
     def __init_color_pair(self, fb, bg):
@@ -72,24 +98,53 @@ class UserInterface(metaclass=Singleton):
         for module_name in StatisticDataCollector().get_logger().get_all_modules():
             if module_name not in self.__filter:
                 self.__filter[module_name] = True
+                self.__dirty_windows.add('filter')
 
-    def __process_events(self):
-        while True:
-            key_code = self.__screen.getch()
-            if key_code == curses.ERR:
-                return
+    def __process_events(self, timeout):
+        """
+        Wait up to timeout (in seconds) for key press and process all pressed keys.
+
+        :return: True if any key has been pressed
+        :rtype: bool
+        """
+        self.__screen.timeout(max(1, int(timeout * 1000)))
+        key_code = self.__screen.getch()
+        self.__screen.nodelay(True)
+        if key_code == curses.ERR:
+            return False
+        while key_code != curses.ERR:
             if key_code == curses.KEY_RESIZE:
                 self.__delete_cached_logs()
-                continue
-
-            if self.__filter_window_active:
+                self.__create_windows()
+            elif self.__filter_window_active:
                 self.__filter_window_process_event(key_code)
+                # Filter window covers other windows, which have to be redrawn when it is closed
+                self.__dirty_windows.update(('filter',) if self.__filter_window_active else self.__windows or ())
             else:
                 self.__main_window_process_event(key_code)
+                self.__dirty_windows.update(('logs', 'info_bar', 'filter'))
+            key_code = self.__screen.getch()
+        return True
 
     def __delete_cached_logs(self):
         self.__cached_processed_logs.clear()
         self.__log_index_to_last_line_no.clear()
+        self.__next_log_sequence_number = 0
+        self.__dirty_windows.add('logs')
+
+    def __trim_cached_logs(self):
+        """
+        Forget the oldest processed logs when there are much more of them than logger keeps.
+        """
+        limit = config.LOG_BUFFER_SIZE
+        if len(self.__cached_processed_logs) <= 2 * limit:
+            return
+        dropped_count = len(self.__cached_processed_logs) - limit
+        dropped_lines_count = self.__log_index_to_last_line_no[dropped_count - 1] + 1
+        del self.__cached_processed_logs[:dropped_count]
+        self.__log_index_to_last_line_no = [line_no - dropped_lines_count
+                                            for line_no in self.__log_index_to_last_line_no[dropped_count:]]
+        self.__scroll_position = max(0, self.__scroll_position - dropped_lines_count)
 
     def __filter_window_process_event(self, key_code):
         if key_code == 27:  # escape
@@ -117,6 +172,18 @@ class UserInterface(metaclass=Singleton):
         elif key_code == curses.KEY_F4:
             StatisticDataCollector().get_logger().clear_logs()
             self.__delete_cached_logs()
+        elif key_code == curses.KEY_F5:
+            self.__stages_panel_active = not self.__stages_panel_active
+            self.__next_statistics_update = 0  # fetch statistics of the other panel now
+        elif key_code == curses.KEY_F6:
+            sdc = StatisticDataCollector()
+            try:
+                sdc.dump_stage_statistics(config.STAGE_STATISTICS_FILENAME)
+            except OSError as err:
+                sdc.get_logger().log('ui', 'Cannot save statistics of stages: {}'.format(err))
+            else:
+                sdc.get_logger().log('ui', 'Statistics of stages appended to {}'.format(
+                    config.STAGE_STATISTICS_FILENAME))
         elif key_code == curses.KEY_F9:
             curses.endwin()
             os.kill(os.getpid(), 15)
@@ -130,39 +197,89 @@ class UserInterface(metaclass=Singleton):
                 else:
                     self.__scroll_position += 1
 
-    def __render_frame(self):
+    def __create_windows(self):
+        self.__screen.clear()
+        self.__screen.noutrefresh()
         lines, cols = self.__screen.getmaxyx()
         min_lines, min_cols = self.__SCREEN_MINIMAL_SIZE
+        self.__dirty_windows = {'logs', 'statistics', 'info_bar', 'filter'}
+        self.__displayed_statistics = None
         if lines < min_lines or cols < min_cols:
-            self.__screen.clear()
+            self.__windows = None
             self.__screen.addstr('Terminal size should be at least {}x{}!\n'.format(min_cols, min_lines))
-            self.__screen.refresh()
+            self.__screen.noutrefresh()
             return
         statistics_window_width = 40
+        width, height = 60, 20
+        self.__windows = {
+            'logs': self.__screen.subwin(lines - 1, cols - statistics_window_width, 0, 0),
+            'statistics': self.__screen.subwin(lines - 1, statistics_window_width,
+                                               0, cols - statistics_window_width),
+            'info_bar': self.__screen.subwin(1, cols, lines - 1, 0),
+            'filter': self.__screen.subwin(height, width, (lines - height) // 2, (cols - width) // 2),
+        }
 
-        logs_windows = self.__screen.subwin(lines - 1, cols - statistics_window_width, 0, 0)
-        self.__render_logs_window(logs_windows)
-        statistics_window = self.__screen.subwin(lines - 1, statistics_window_width, 0, cols - statistics_window_width)
-        self.__render_statistics_window(statistics_window)
-        info_bar_window = self.__screen.subwin(1, cols, lines - 1, 0)
-        self.__render_info_bar(info_bar_window)
-        if self.__filter_window_active:
-            width, height = 60, 20
-            filter_window = self.__screen.subwin(height, width, (lines - height) // 2, (cols - width) // 2)
-            self.__render_filter_window(filter_window)
-        self.__screen.refresh()
+    def __render_frame(self):
+        """
+        Redraw windows whose content has changed.
+
+        :return: True if there were new logs
+        :rtype: bool
+        """
+        if self.__windows is None:  # terminal is too small
+            curses.doupdate()
+            return False
+        new_logs = self.__fetch_new_logs()
+        if monotonic() >= self.__next_statistics_update:
+            self.__next_statistics_update = monotonic() + self.__STATISTICS_INTERVAL
+            sdc = StatisticDataCollector()
+            snapshot = sdc.get_statistics()
+            statistics = (self.__prepare_stats(snapshot),
+                          (snapshot.progress, snapshot.progress_title, snapshot.progress_subtitle),
+                          self.__prepare_stage_stats(sdc.get_stage_statistics())
+                          if self.__stages_panel_active else None)
+            if statistics != self.__displayed_statistics:
+                self.__displayed_statistics = statistics
+                self.__dirty_windows.add('statistics')
+
+        if self.__filter_window_active and self.__dirty_windows:
+            self.__dirty_windows.add('filter')  # windows below it share the screen memory
+        renderers = (
+            ('logs', self.__render_logs_window),
+            ('statistics', self.__render_statistics_window),
+            ('info_bar', self.__render_info_bar),
+            ('filter', self.__render_filter_window),
+        )
+        for name, render in renderers:
+            if name not in self.__dirty_windows or name == 'filter' and not self.__filter_window_active:
+                continue
+            window = self.__windows[name]
+            render(window)
+            window.noutrefresh()
+        self.__dirty_windows.clear()
+        curses.doupdate()
+        return new_logs
+
+    def __fetch_new_logs(self):
+        """
+        :return: True if there were new logs
+        :rtype: bool
+        """
+        lines, cols = self.__windows['logs'].getmaxyx()
+        selected_modules = [module_name for module_name in self.__filter if self.__filter[module_name]]
+        self.__next_log_sequence_number, new_logs = StatisticDataCollector().get_logger().get_logs_since(
+            self.__next_log_sequence_number, selected_modules)
+        if not new_logs:
+            return False
+        self.__cache_new_log_entries(new_logs, cols - 2)
+        self.__trim_cached_logs()
+        self.__dirty_windows.add('logs')
+        return True
 
     def __render_logs_window(self, window):
-        window.clear()
+        window.erase()
         self.__draw_entitled_box(window, 'Logs')
-
-        sub_win = self.__get_sub_window(window)
-        lines, cols = sub_win.getmaxyx()
-        selected_modules = [module_name for module_name in self.__filter if self.__filter[module_name]]
-        logs = StatisticDataCollector().get_logger().get_logs(selected_modules)
-        new_logs = logs[len(self.__cached_processed_logs):]
-        self.__cache_new_log_entries(new_logs, cols)
-        self.__render_visible_log_entries(sub_win)
+        self.__render_visible_log_entries(self.__get_sub_window(window))
 
     def __cache_new_log_entries(self, new_entries, line_width):
         for timestamp, module_name, message in new_entries:
@@ -242,16 +359,22 @@ class UserInterface(metaclass=Singleton):
             window.addstr(line)
 
     def __render_statistics_window(self, window):
-        window.clear()
-        self.__draw_entitled_box(window, 'Statistics')
+        window.erase()
+        stats_to_display, progress, stage_stats_to_display = self.__displayed_statistics
         sub_win = self.__get_sub_window(window)
-        stats_to_display = self.__prepare_stats()
-        for name, value in stats_to_display:
-            sub_win.addstr('{}: {}\n'.format(name, value))
-        self.__render_progress_window(window)
+        if stage_stats_to_display is None:
+            self.__draw_entitled_box(window, 'Statistics')
+            for name, value in stats_to_display:
+                sub_win.addstr('{}: {}\n'.format(name, value))
+        else:
+            self.__draw_entitled_box(window, 'Stages')
+            lines, cols = sub_win.getmaxyx()
+            for line in stage_stats_to_display[:lines - 1]:
+                sub_win.addstr(line[:cols - 1] + '\n')
+        self.__render_progress_window(window, *progress)
 
     @staticmethod
-    def __prepare_stats():
+    def __prepare_stats(statistics):
         def timedelta_to_str(timedelta_obj):
             seconds = timedelta_obj.total_seconds()
             if seconds < 1:
@@ -276,23 +399,49 @@ class UserInterface(metaclass=Singleton):
                 last_good_result = '{:.3f} {}'.format(data_amount / bound, unit)
             return last_good_result
 
-        sdc = StatisticDataCollector()
+        def latency_to_str(latency):
+            if latency is None:
+                return '-'
+            return '{:.0f} ms'.format(latency * 1000)
+
+        def rates_to_str(rates, rate_format):
+            return '/'.join(rate_format.format(rates[window]) for window in RATE_WINDOWS)
+
+        windows_str = '/'.join(map(str, RATE_WINDOWS))
+
         stats_scheme = (
-            ('Time since last receiving', timedelta_to_str(sdc.get_time_since_last_data_receiving())),
-            ('Time since start', timedelta_to_str(sdc.get_time_since_start())),
-            ('Data receiving speed', data_amount_to_str(sdc.get_data_receiving_speed())+'/s'),
-            ('Total data received', data_amount_to_str(sdc.get_total_data_received())),
-            ('Queued requests', str(sdc.get_count_of_queued_requests())),
-            ('Total sent requests', str(sdc.get_total_count_of_sent_requests()))
+            ('Time since last receiving', timedelta_to_str(statistics.time_since_last_data_receiving)),
+            ('Time since start', timedelta_to_str(statistics.time_since_start)),
+            ('Data receiving speed', data_amount_to_str(statistics.data_receiving_rates[1])+'/s'),
+            ('Total data received', data_amount_to_str(statistics.total_data_received)),
+            ('Lines/s ({}s)'.format(windows_str), rates_to_str(statistics.lines_receiving_rates, '{:.0f}')),
+            ('Queued requests', str(statistics.count_of_queued_requests)),
+            ('Requests in flight', str(statistics.count_of_requests_in_flight)),
+            ('Request latency', latency_to_str(statistics.average_request_latency)),
+            ('Sent/s ({}s)'.format(windows_str), rates_to_str(statistics.sending_rates, '{:.1f}')),
+            ('Total sent requests', str(statistics.total_count_of_sent_requests)),
+            ('Total dropped requests', str(statistics.total_count_of_dropped_requests))
         )
         return stats_scheme
 
-    def __render_progress_window(self, window):
-        sdc = StatisticDataCollector()
-        progress = sdc.get_progress()
-        title = sdc.get_progress_title()
-        subtitle = sdc.get_progress_subtitle()
-
+    @staticmethod
+    def __prepare_stage_stats(stage_statistics):
+        def duration_to_str(duration):
+            if duration is None:
+                return '-'
+            milliseconds = duration * 1000
+            return '{:.0f}'.format(milliseconds) if milliseconds >= 100 else '{:.3g}'.format(milliseconds)
+
+        window = RATE_WINDOWS[len(RATE_WINDOWS) // 2]
+        line_format = '{:<17.17}{:>6}{:>7}{:>7}'
+        lines = [line_format.format('Stage', '/s', 'p50ms', 'p99ms')]
+        for stage, statistics in sorted(stage_statistics.items()):
+            lines.append(line_format.format(
+                stage, '{:.1f}'.format(statistics.rates[window]),
+                duration_to_str(statistics.percentiles[50]), duration_to_str(statistics.percentiles[99])))
+        return tuple(lines)
+
+    def __render_progress_window(self, window, progress, title, subtitle):
         if progress == -1:
             return
 
@@ -336,11 +485,13 @@ class UserInterface(metaclass=Singleton):
         return window.subwin(lines - margin * 2, cols - margin * 2, beg_y + margin, beg_x + margin)
 
     def __render_info_bar(self, window):
-        window.clear()
+        window.erase()
         info_bar_scheme = (
             ('F2', '{} auto scrolling'.format('Disable' if self.__logs_auto_scrolling else 'Enable')),
             ('F3', 'Filter'),
             ('F4', 'Clear'),
+            ('F5', 'Statistics' if self.__stages_panel_active else 'Stages'),
+            ('F6', 'Dump stages'),
             ('F9', 'Exit'),
             ('↑↓', 'Scroll')
         )
@@ -349,7 +500,7 @@ class UserInterface(metaclass=Singleton):
             window.addstr(description, curses.color_pair(self.__INFO_BAR_DESC_COLOR))
 
     def __render_filter_window(self, window):
-        window.clear()
+        window.erase()
         window.bkgd(' ', curses.color_pair(self.__FILTER_WINDOW_BACKGROUND))
         self.__draw_entitled_box(window, 'Filter')
         sub_win = self.__get_sub_window(window)
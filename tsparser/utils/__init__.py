@@ -1,3 +1,4 @@
+from .histogram import Histogram
 from .logger import Logger
 from .singleton import Singleton
 from .statistic_data_collector import StatisticDataCollector
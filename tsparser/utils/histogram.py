@@ -0,0 +1,94 @@
+from bisect import bisect_left
+
+# Upper bounds (in seconds) of buckets: from 1 us to about 17 min, each one
+# 2^(1/8) times greater than the previous one, so a percentile is off by
+# at most 9 %. Greater values fall into an extra, unbounded bucket.
+BUCKET_BOUNDS = tuple(1e-6 * 2 ** (i / 8) for i in range(8 * 30 + 1))
+
+
+class Histogram:
+    """
+    Histogram of durations with logarithmic buckets. Adding a value takes
+    constant time and memory, whatever the number of values is.
+
+    Histogram is not thread-safe: it should be updated by one thread only.
+    """
+    __slots__ = ('counts', 'count', 'sum', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        """
+        :param value: duration (in seconds)
+        :type value: float
+        """
+        self.counts[bisect_left(BUCKET_BOUNDS, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        """
+        Add all values of other histogram to this one.
+
+        :type other: Histogram
+        """
+        counts = self.counts
+        for i, count in enumerate(other.counts):
+            if count:
+                counts[i] += count
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    @property
+    def mean(self):
+        """
+        :return: mean of values or None if there are none
+        :rtype: float
+        """
+        return self.sum / self.count if self.count else None
+
+    def percentile(self, percent):
+        """
+        :param percent: percent of values that are not greater than
+            the result, from 0 to 100
+        :type percent: float
+        :return: upper bound of bucket containing the percentile (but not
+            more than the maximal value) or None if there are no values
+        :rtype: float
+        """
+        if not self.count:
+            return None
+        rank = max(1, percent / 100 * self.count)
+        cumulative_count = 0
+        for i, count in enumerate(self.counts):
+            cumulative_count += count
+            if cumulative_count >= rank:
+                if i == len(BUCKET_BOUNDS):
+                    break
+                return min(BUCKET_BOUNDS[i], self.max)
+        return self.max
+
+    def get_cumulative_counts(self, step=1):
+        """
+        :param step: only every step-th bound of BUCKET_BOUNDS, starting from
+            the first one, is included
+        :type step: int
+        :return: list of tuples (bound, number of values not greater than
+            bound), ending with (infinity, number of all values)
+        :rtype: list
+        """
+        cumulative_counts = list()
+        cumulative_count = 0
+        for i, count in enumerate(self.counts[:-1]):
+            cumulative_count += count
+            if i % step == 0:
+                cumulative_counts.append((BUCKET_BOUNDS[i], cumulative_count))
+        cumulative_counts.append((float('inf'), self.count))
+        return cumulative_counts
@@ -1,5 +1,9 @@
-from threading import Lock
+import atexit
+from collections import deque
 from datetime import datetime
+from heapq import merge
+from itertools import islice
+from threading import Event, Lock, Thread
 
 DT_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
 
@@ -8,18 +12,36 @@ class Logger:
     """
     Class responsible for simple logging. Logger requires module name for each message and it's possible to get filtered
     logs. Logger is also thread safe.
+
+    Only the most recent entries are kept in memory, in a ring buffer, with separate index of entries of each module.
+    Each entry gets a sequence number, so readers can get only entries logged since they last asked. Entries are saved
+    to the log file by a background thread, in batches.
     """
 
-    def __init__(self, log_filename=None):
+    def __init__(self, log_filename=None, capacity=10000, flush_interval=0.5):
         """
         :param log_filename: name of file which the log will be saved to or None if such a file should not exist
         :type log_filename: str
+        :param capacity: maximal number of entries kept in memory; the oldest ones are dropped when it is exceeded
+        :type capacity: int
+        :param flush_interval: time (in seconds) between writes of new entries to the file
+        :type flush_interval: float
         :return:
         """
         self.__logfile_handle = open(log_filename, 'a') if log_filename else None
-        self.__logs = list()
-        self.__modules_names = set()
+        self.__capacity = capacity
+        self.__flush_interval = flush_interval
+        self.__logs = deque()  # entries: (sequence_number, datetime_timestamp, module_name, message)
+        self.__module_logs = dict()  # module name -> deque of its entries in __logs
+        self.__module_log_counts = dict()  # module name -> number of messages ever logged
+        self.__next_sequence_number = 0
+        self.__unsaved_logs = list()
         self.__data_mutex = Lock()
+        self.__file_mutex = Lock()
+        if self.__logfile_handle is not None:
+            self.__closed = Event()
+            Thread(target=self.__writer_thread, daemon=True).start()
+            atexit.register(self.close)
 
     def log(self, module_name, message):
         """
@@ -30,28 +52,71 @@ class Logger:
         :param message: message to be logged
         :type message: str
         """
-        log_entry = (datetime.now(), module_name, message)
-        self.__data_mutex.acquire()
-        self.__save_log_entry_to_file(log_entry)
-        self.__logs.append(log_entry)
-        self.__modules_names.add(module_name)
-        self.__data_mutex.release()
+        timestamp = datetime.now()
+        with self.__data_mutex:
+            log_entry = (self.__next_sequence_number, timestamp, module_name, message)
+            self.__next_sequence_number += 1
+            if len(self.__logs) == self.__capacity:
+                dropped_entry = self.__logs.popleft()
+                self.__module_logs[dropped_entry[2]].popleft()
+            self.__logs.append(log_entry)
+            self.__module_logs.setdefault(module_name, deque()).append(log_entry)
+            self.__module_log_counts[module_name] = self.__module_log_counts.get(module_name, 0) + 1
+            if self.__logfile_handle is not None and not self.__logfile_handle.closed:
+                self.__unsaved_logs.append(log_entry)
 
     def get_logs(self, module_filter=None):
         """
-        Get all logged messages, optionally filter them by modules.
+        Get all logged messages kept in memory, optionally filter them by modules.
 
         :param module_filter: list of selected modules' names. If None, don't filter.
         :type module_filter: list
         :return: list of tuples containing logs, each tuple format: (datetime_timestamp, module_name, message)
         :rtype: list
         """
-        if module_filter is None:
-            module_filter = self.get_all_modules()
-        self.__data_mutex.acquire()
-        chosen_logs = [log_entry for log_entry in self.__logs if log_entry[1] in module_filter]
-        self.__data_mutex.release()
-        return chosen_logs
+        return self.get_logs_since(0, module_filter)[1]
+
+    def get_logs_since(self, sequence_number, module_filter=None):
+        """
+        Get messages logged since the one with given sequence number, optionally filter them by modules. Time taken is
+        proportional to the number of such messages.
+
+        :param sequence_number: sequence number of the first message to get; messages which have been dropped from
+            memory are skipped
+        :type sequence_number: int
+        :param module_filter: list of selected modules' names. If None, don't filter.
+        :type module_filter: list
+        :return: tuple (sequence number of the next message to be logged, list of tuples containing logs, each tuple
+            format: (datetime_timestamp, module_name, message))
+        :rtype: tuple
+        """
+        with self.__data_mutex:
+            next_sequence_number = self.__next_sequence_number
+            if module_filter is None:
+                new_entries = self.__get_last_entries(self.__logs, sequence_number)
+            else:
+                new_entries = list(merge(*(self.__get_last_entries(self.__module_logs[module_name], sequence_number)
+                                           for module_name in module_filter if module_name in self.__module_logs)))
+        return next_sequence_number, [log_entry[1:] for log_entry in new_entries]
+
+    @staticmethod
+    def __get_last_entries(entries, sequence_number):
+        count = 0
+        for log_entry in reversed(entries):
+            if log_entry[0] < sequence_number:
+                break
+            count += 1
+        new_entries = list(islice(reversed(entries), count))
+        new_entries.reverse()
+        return new_entries
+
+    def get_next_sequence_number(self):
+        """
+        :return: sequence number of the next message to be logged
+        :rtype: int
+        """
+        with self.__data_mutex:
+            return self.__next_sequence_number
 
     def get_all_modules(self):
         """
@@ -60,25 +125,56 @@ class Logger:
         :return: set of all registered modules.
         :rtype: set
         """
-        self.__data_mutex.acquire()
-        modules_names = set(self.__modules_names)
-        self.__data_mutex.release()
-        return modules_names
+        with self.__data_mutex:
+            return set(self.__module_logs)
+
+    def get_log_counts(self):
+        """
+        Get number of messages logged by each module since the logger was created, including the ones dropped from
+        memory or cleared.
+
+        :return: dict mapping module name to number of its messages
+        :rtype: dict
+        """
+        with self.__data_mutex:
+            return dict(self.__module_log_counts)
 
     def clear_logs(self):
         """
         Clears internal log buffer releasing occupied memory. Logs saved on disk are kept.
         """
-        self.__data_mutex.acquire()
-        self.__logs.clear()
-        self.__modules_names.clear()
-        self.__data_mutex.release()
+        with self.__data_mutex:
+            self.__logs.clear()
+            self.__module_logs.clear()
 
-    def __save_log_entry_to_file(self, log_entry):
+    def flush(self):
+        """
+        Save all logged messages to the file now.
+        """
         if self.__logfile_handle is None:
             return
-        timestamp = log_entry[0].strftime(DT_FORMAT)
-        module_name = log_entry[1]
-        message = log_entry[2]
-        self.__logfile_handle.write('{}|{}|{}\n'.format(timestamp, module_name, message))
-        self.__logfile_handle.flush()
+        with self.__file_mutex:
+            with self.__data_mutex:
+                unsaved_logs = self.__unsaved_logs
+                self.__unsaved_logs = list()
+            if not unsaved_logs or self.__logfile_handle.closed:
+                return
+            self.__logfile_handle.write(''.join(
+                '{}|{}|{}\n'.format(timestamp.strftime(DT_FORMAT), module_name, message)
+                for _, timestamp, module_name, message in unsaved_logs))
+            self.__logfile_handle.flush()
+
+    def close(self):
+        """
+        Save all logged messages to the file and close it. Messages logged later are kept in memory only.
+        """
+        if self.__logfile_handle is None:
+            return
+        self.__closed.set()
+        self.flush()
+        with self.__file_mutex, self.__data_mutex:
+            self.__logfile_handle.close()
+
+    def __writer_thread(self):
+        while not self.__closed.wait(self.__flush_interval):
+            self.flush()
@@ -1,33 +1,180 @@
-from datetime import datetime, timedelta
-from threading import Lock
+from collections import namedtuple
+from datetime import timedelta
+from threading import Lock, current_thread, local
+from time import monotonic
 
 from tsparser import config
-from tsparser.utils import Logger, Singleton
+from tsparser.timestamp import format_timestamp, now
+from tsparser.utils import Histogram, Logger, Singleton
+
+# Indexes of counters
+(RECEIVED_LINES, RECEIVED_BYTES, QUEUED_REQUESTS, RECOVERED_REQUESTS,
+ SENT_REQUESTS, DROPPED_REQUESTS, FAILED_REQUESTS, STARTED_REQUESTS,
+ FINISHED_REQUESTS, REQUESTS_LATENCY) = range(10)
+_COUNTERS_COUNT = 10
+# Lengths (in seconds) of windows rates are averaged over
+RATE_WINDOWS = (1, 10, 60)
+# Number of per-second buckets kept: the longest window and the current second
+_HISTORY = max(RATE_WINDOWS) + 1
+# Percentiles of stage durations reported in StageStatistics
+PERCENTILES = (50, 90, 99)
+
+Statistics = namedtuple('Statistics', (
+    'time_since_last_data_receiving', 'time_since_start',
+    'total_data_received', 'total_lines_received',
+    'data_receiving_rates', 'lines_receiving_rates', 'sending_rates',
+    'count_of_queued_requests', 'count_of_requests_in_flight',
+    'total_count_of_sent_requests', 'total_count_of_dropped_requests',
+    'total_count_of_failed_requests', 'average_request_latency',
+    'progress', 'progress_title', 'progress_subtitle'))
+Statistics.__doc__ = """
+Snapshot of all statistics. Rates are dicts mapping length of window (one of
+RATE_WINDOWS, in seconds) to average count per second over the last complete
+seconds of the window.
+"""
+
+StageStatistics = namedtuple('StageStatistics', (
+    'count', 'rates', 'mean', 'percentiles', 'max'))
+StageStatistics.__doc__ = """
+Statistics of durations of a pipeline stage (in seconds). Rates are counts
+per second, as in Statistics; percentiles is a dict mapping each of
+PERCENTILES to the approximate duration.
+"""
+
+
+class _ThreadCounters:
+    """
+    Counters updated by a single thread only, so they need no locking. Besides
+    totals, counts in each of the last seconds are kept. Durations of stages
+    are kept in histograms, with counts of each stage in each second.
+    """
+    __slots__ = ('totals', 'buckets', 'second', 'last_data_time',
+                 'histograms', 'stage_buckets', 'parse_errors')
+
+    def __init__(self, second):
+        self.totals = [0] * _COUNTERS_COUNT
+        # Counts in second s are in buckets[s % _HISTORY]
+        self.buckets = [[0] * _COUNTERS_COUNT for _ in range(_HISTORY)]
+        self.second = second  # the latest second anything was counted in
+        self.last_data_time = None
+        self.histograms = dict()  # stage name -> Histogram
+        self.stage_buckets = [dict() for _ in range(_HISTORY)]
+        self.parse_errors = dict()  # (parser name, error type) -> count
+
+    def advance(self, second):
+        for passed_second in range(max(self.second + 1, second - _HISTORY + 1),
+                                   second + 1):
+            bucket = self.buckets[passed_second % _HISTORY]
+            for i in range(_COUNTERS_COUNT):
+                bucket[i] = 0
+            self.stage_buckets[passed_second % _HISTORY].clear()
+        self.second = second
+
+    def add_duration(self, stage, duration, second):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = Histogram()
+        histogram.add(duration)
+        stage_counts = self.stage_buckets[second % _HISTORY]
+        stage_counts[stage] = stage_counts.get(stage, 0) + 1
+
+    def merge(self, other):
+        """
+        Add all counts of other counters, which are not updated any more, to
+        these ones.
+
+        :type other: _ThreadCounters
+        """
+        second = max(self.second, other.second)
+        self.advance(second)
+        for i, total in enumerate(other.totals):
+            self.totals[i] += total
+        # Buckets of seconds after other.second are stale
+        for passed_second in range(second - _HISTORY + 1, other.second + 1):
+            bucket = self.buckets[passed_second % _HISTORY]
+            for i, count in enumerate(other.buckets[passed_second % _HISTORY]):
+                bucket[i] += count
+            stage_counts = self.stage_buckets[passed_second % _HISTORY]
+            for stage, count in other.stage_buckets[
+                    passed_second % _HISTORY].items():
+                stage_counts[stage] = stage_counts.get(stage, 0) + count
+        if other.last_data_time is not None:
+            self.last_data_time = max(self.last_data_time or 0,
+                                      other.last_data_time)
+        for stage, histogram in other.histograms.items():
+            self.histograms.setdefault(stage, Histogram()).merge(histogram)
+        for key, count in other.parse_errors.items():
+            self.parse_errors[key] = self.parse_errors.get(key, 0) + count
 
 
 class StatisticDataCollector(metaclass=Singleton):
     """
     Thread-safe singleton destined for collecting statistic data.
+
+    Each thread counts events in its own counters, without locking; counters
+    of all threads are summed up when statistics are read. Counters of threads
+    which have ended are merged into one, so short-lived threads (like ones
+    handling HTTP requests) do not make reading statistics slower.
     """
 
     def __init__(self):
-        self.__start_time = datetime.now()
-        self.__last_data_time = self.__start_time
+        self.__start_time = monotonic()
 
-        self.__bytes_received_this_second = 0
-        self.__bytes_received_last_second = 0
-        self.__total_bytes_received = 0
-
-        self.__count_of_queued_requests = 0
-        self.__total_count_of_sent_requests = 0
+        self.__thread_counters = list()  # (thread, counters) tuples
+        # Counters of threads which have ended; replaced rather than updated,
+        # so it can be read without locking
+        self.__retired_counters = _ThreadCounters(int(monotonic()))
+        self.__local = local()
 
         self.__progress = -1
         self.__progress_title = ''
         self.__progress_subtitle = ''
 
-        self.__logger = Logger(config.LOG_FILENAME)
+        self.__logger = Logger(config.LOG_FILENAME, config.LOG_BUFFER_SIZE,
+                               config.LOG_FLUSH_INTERVAL)
         self.__data_mutex = Lock()
 
+    def __get_counters(self):
+        try:
+            return self.__local.counters
+        except AttributeError:
+            counters = self.__local.counters = _ThreadCounters(int(monotonic()))
+            with self.__data_mutex:
+                self.__thread_counters.append((current_thread(), counters))
+            return counters
+
+    def __get_all_counters(self):
+        """
+        Merge counters of threads which have ended into retired counters.
+
+        Must be called with __data_mutex acquired.
+
+        :return: list of counters of running threads and retired counters
+        :rtype: list
+        """
+        running, ended = list(), list()
+        for thread, counters in self.__thread_counters:
+            if thread.is_alive():
+                running.append((thread, counters))
+            else:
+                ended.append(counters)
+        if ended:
+            self.__thread_counters = running
+            retired_counters = _ThreadCounters(int(monotonic()))
+            for counters in [self.__retired_counters] + ended:
+                retired_counters.merge(counters)
+            self.__retired_counters = retired_counters
+        return ([counters for _, counters in self.__thread_counters] +
+                [self.__retired_counters])
+
+    def __count(self, counter, value=1):
+        counters = self.__get_counters()
+        second = int(monotonic())
+        if second != counters.second:
+            counters.advance(second)
+        counters.totals[counter] += value
+        counters.buckets[second % _HISTORY][counter] += value
+
     def on_new_received_data(self, data):
         """
         Method for calculating statistics.
@@ -35,15 +182,18 @@ class StatisticDataCollector(metaclass=Singleton):
         :param data: new received data
         :type data: str
         """
-        now = datetime.now()
-        self.__data_mutex.acquire()
-        if self.__last_data_time.second != now.second:
-            self.__bytes_received_last_second = self.__bytes_received_this_second
-            self.__bytes_received_this_second = 0
-        self.__last_data_time = now
-        self.__bytes_received_this_second += len(data)
-        self.__total_bytes_received += len(data)
-        self.__data_mutex.release()
+        counters = self.__get_counters()
+        now = monotonic()
+        second = int(now)
+        if second != counters.second:
+            counters.advance(second)
+        counters.last_data_time = now
+        totals = counters.totals
+        bucket = counters.buckets[second % _HISTORY]
+        totals[RECEIVED_LINES] += 1
+        bucket[RECEIVED_LINES] += 1
+        totals[RECEIVED_BYTES] += len(data)
+        bucket[RECEIVED_BYTES] += len(data)
 
     def on_new_request(self, packet):
         """
@@ -52,9 +202,7 @@ class StatisticDataCollector(metaclass=Singleton):
         :param packet: packet prepared to be sent
         :type packet: tuple
         """
-        self.__data_mutex.acquire()
-        self.__count_of_queued_requests += 1
-        self.__data_mutex.release()
+        self.__count(QUEUED_REQUESTS)
 
     def on_request_sent(self, packet):
         """
@@ -63,17 +211,116 @@ class StatisticDataCollector(metaclass=Singleton):
         :param packet: sent packet
         :type packet: tuple
         """
-        self.__data_mutex.acquire()
-        self.__count_of_queued_requests -= 1
-        self.__total_count_of_sent_requests += 1
-        self.__data_mutex.release()
+        self.__count(SENT_REQUESTS)
+
+    def on_request_started(self, packet):
+        """
+        Method for calculating statistics.
+
+        :param packet: packet which HTTP request has just been started for
+        :type packet: tuple
+        """
+        self.__count(STARTED_REQUESTS)
+
+    def on_request_finished(self, packet, latency):
+        """
+        Method for calculating statistics.
+
+        :param packet: packet which HTTP request has finished (successfully
+            or not) for
+        :type packet: tuple
+        :param latency: time (in seconds) the request took
+        :type latency: float
+        """
+        self.__count(FINISHED_REQUESTS)
+        self.__count(REQUESTS_LATENCY, latency)
+
+    def on_request_failed(self, packet):
+        """
+        Method for calculating statistics.
+
+        :param packet: packet which has been rejected by the server or could
+            not be delivered to it
+        :type packet: tuple
+        """
+        self.__count(FAILED_REQUESTS)
+
+    def on_request_dropped(self, packet):
+        """
+        Method for calculating statistics.
+
+        :param packet: packet that will not be sent
+        :type packet: tuple
+        """
+        self.__count(DROPPED_REQUESTS)
+
+    def on_requests_recovered(self, count):
+        """
+        Method for calculating statistics.
+
+        :param count: count of requests left unsent by previous run
+        :type count: int
+        """
+        self.__count(RECOVERED_REQUESTS, count)
+
+    def on_stage_finished(self, stage, duration):
+        """
+        Method for calculating statistics of pipeline stages.
+
+        :param stage: name of the stage, like 'parse/GPSParser'
+        :type stage: str
+        :param duration: time (in seconds) the stage took
+        :type duration: float
+        """
+        counters = self.__get_counters()
+        second = int(monotonic())
+        if second != counters.second:
+            counters.advance(second)
+        counters.add_duration(stage, duration, second)
+
+    def on_line_parsed(self, stage, duration, receiving_latency):
+        """
+        Method for calculating statistics of pipeline stages. Equivalent to
+        calling on_stage_finished for the parsing stage and for
+        'receive_to_parse' stage, but faster, as it is called for each line.
+
+        :param stage: name of the parsing stage, like 'parse/GPSParser'
+        :type stage: str
+        :param duration: time (in seconds) the parsing took
+        :type duration: float
+        :param receiving_latency: time (in seconds) since the line was
+            received from the serial port till it was parsed, or None if it
+            is not known
+        :type receiving_latency: float
+        """
+        counters = self.__get_counters()
+        second = int(monotonic())
+        if second != counters.second:
+            counters.advance(second)
+        counters.add_duration(stage, duration, second)
+        if receiving_latency is not None:
+            counters.add_duration('receive_to_parse', receiving_latency,
+                                  second)
+
+    def on_parse_error(self, parser_name, error_type):
+        """
+        Method for calculating statistics.
+
+        :param parser_name: name of parser which failed to parse a line, or
+            'system' if the line was not passed to any parser
+        :type parser_name: str
+        :param error_type: name of exception class or other kind of error
+        :type error_type: str
+        """
+        parse_errors = self.__get_counters().parse_errors
+        key = (parser_name, error_type)
+        parse_errors[key] = parse_errors.get(key, 0) + 1
 
     def on_progress_changed(self, progress, title, subtitle):
-        self.__data_mutex.acquire()
-        self.__progress = progress
-        self.__progress_title = title
-        self.__progress_subtitle = subtitle
-        self.__data_mutex.release()
+        with self.__data_mutex:
+            self.__progress = progress
+            self.__progress_title = title
+            self.__progress_subtitle = subtitle
 
     def get_logger(self):
         """
@@ -82,72 +329,208 @@ class StatisticDataCollector(metaclass=Singleton):
         """
         return self.__logger
 
+    def get_statistics(self):
+        """
+        :return: all statistics at once
+        :rtype: Statistics
+        """
+        now = monotonic()
+        current_second = int(now)
+        with self.__data_mutex:
+            thread_counters = self.__get_all_counters()
+            progress = (self.__progress, self.__progress_title,
+                        self.__progress_subtitle)
+
+        totals = [0] * _COUNTERS_COUNT
+        # Counts in each of the last complete seconds, the most recent first
+        history = [[0] * _COUNTERS_COUNT for _ in range(_HISTORY - 1)]
+        last_data_time = self.__start_time
+        for counters in thread_counters:
+            for i, total in enumerate(counters.totals):
+                totals[i] += total
+            if counters.last_data_time is not None:
+                last_data_time = max(last_data_time, counters.last_data_time)
+            # Buckets of seconds after counters.second are stale
+            for age in range(max(1, current_second - counters.second),
+                             _HISTORY):
+                bucket = counters.buckets[(current_second - age) % _HISTORY]
+                for i, count in enumerate(bucket):
+                    history[age - 1][i] += count
+
+        def rates(counter):
+            return {window: sum(counts[counter]
+                                for counts in history[:window]) / window
+                    for window in RATE_WINDOWS}
+
+        finished_requests = sum(counts[FINISHED_REQUESTS]
+                                for counts in history)
+        return Statistics(
+            time_since_last_data_receiving=timedelta(
+                seconds=now - last_data_time),
+            time_since_start=timedelta(seconds=now - self.__start_time),
+            total_data_received=totals[RECEIVED_BYTES],
+            total_lines_received=totals[RECEIVED_LINES],
+            data_receiving_rates=rates(RECEIVED_BYTES),
+            lines_receiving_rates=rates(RECEIVED_LINES),
+            sending_rates=rates(SENT_REQUESTS),
+            count_of_queued_requests=(totals[QUEUED_REQUESTS] +
+                                      totals[RECOVERED_REQUESTS] -
+                                      totals[SENT_REQUESTS] -
+                                      totals[DROPPED_REQUESTS]),
+            count_of_requests_in_flight=(totals[STARTED_REQUESTS] -
+                                         totals[FINISHED_REQUESTS]),
+            total_count_of_sent_requests=totals[SENT_REQUESTS],
+            total_count_of_dropped_requests=totals[DROPPED_REQUESTS],
+            total_count_of_failed_requests=totals[FAILED_REQUESTS],
+            average_request_latency=(
+                sum(counts[REQUESTS_LATENCY] for counts in history) /
+                finished_requests if finished_requests else None),
+            progress=progress[0], progress_title=progress[1],
+            progress_subtitle=progress[2])
+
+    def get_stage_histograms(self):
+        """
+        :return: dict mapping name of each stage to Histogram of its durations
+            in all threads
+        :rtype: dict
+        """
+        with self.__data_mutex:
+            thread_counters = self.__get_all_counters()
+        histograms = dict()
+        for counters in thread_counters:
+            # Copied at once, as the thread may add stages in the meantime
+            for stage, histogram in list(counters.histograms.items()):
+                histograms.setdefault(stage, Histogram()).merge(histogram)
+        return histograms
+
+    def get_parse_errors(self):
+        """
+        :return: dict mapping (parser name, error type) tuple to number of
+            such errors, as counted by on_parse_error
+        :rtype: dict
+        """
+        with self.__data_mutex:
+            thread_counters = self.__get_all_counters()
+        parse_errors = dict()
+        for counters in thread_counters:
+            for key, count in list(counters.parse_errors.items()):
+                parse_errors[key] = parse_errors.get(key, 0) + count
+        return parse_errors
+
+    def get_stage_statistics(self):
+        """
+        :return: dict mapping name of each stage to its StageStatistics
+        :rtype: dict
+        """
+        current_second = int(monotonic())
+        with self.__data_mutex:
+            thread_counters = self.__get_all_counters()
+
+        histograms = self.get_stage_histograms()
+        # Counts of each stage in each of the last complete seconds, the most
+        # recent first
+        history = [dict() for _ in range(_HISTORY - 1)]
+        for counters in thread_counters:
+            for age in range(max(1, current_second - counters.second),
+                             _HISTORY):
+                bucket = dict(counters.stage_buckets[
+                    (current_second - age) % _HISTORY])
+                counts = history[age - 1]
+                for stage, count in bucket.items():
+                    counts[stage] = counts.get(stage, 0) + count
+
+        return {stage: StageStatistics(
+            count=histogram.count,
+            rates={window: sum(counts.get(stage, 0)
+                               for counts in history[:window]) / window
+                   for window in RATE_WINDOWS},
+            mean=histogram.mean,
+            percentiles={percent: histogram.percentile(percent)
+                         for percent in PERCENTILES},
+            max=histogram.max) for stage, histogram in histograms.items()}
+
+    def dump_stage_statistics(self, filename):
+        """
+        Append table of statistics of all stages to the file.
+
+        :param filename: name of the file
+        :type filename: str
+        """
+        window = RATE_WINDOWS[len(RATE_WINDOWS) // 2]
+        columns = (['Stage', 'Count', 'Rate/s ({}s)'.format(window),
+                    'Mean ms'] +
+                   ['p{} ms'.format(percent) for percent in PERCENTILES] +
+                   ['Max ms'])
+        row_format = '{:<32} ' + ' '.join('{:>12}' for _ in columns[1:])
+        lines = ['# {}'.format(format_timestamp(now())),
+                 row_format.format(*columns)]
+        for stage, statistics in sorted(self.get_stage_statistics().items()):
+            durations = ([statistics.mean] +
+                         [statistics.percentiles[percent]
+                          for percent in PERCENTILES] + [statistics.max])
+            lines.append(row_format.format(
+                stage, statistics.count,
+                '{:.1f}'.format(statistics.rates[window]),
+                *('{:.3f}'.format(duration * 1000) for duration in durations)))
+        with open(filename, 'a') as file:
+            file.write('\n'.join(lines) + '\n\n')
+
     def get_time_since_last_data_receiving(self):
         """
         :return: time since last data receiving
         :rtype: datetime.timedelta
         """
-        self.__data_mutex.acquire()
-        time_since_last_data = datetime.now() - self.__last_data_time
-        self.__data_mutex.release()
-        return time_since_last_data
+        return self.get_statistics().time_since_last_data_receiving
 
     def get_time_since_start(self):
         """
         :return: time since start
         :rtype: datetime.timedelta
         """
-        return datetime.now() - self.__start_time
+        return timedelta(seconds=monotonic() - self.__start_time)
 
     def get_data_receiving_speed(self):
         """
         :return: count of received bytes in last second
         :rtype: int
         """
-        self.__data_mutex.acquire()
-        if datetime.now() - self.__last_data_time <= timedelta(seconds=1):
-            data_transfer_speed = self.__bytes_received_last_second
-        else:
-            data_transfer_speed = 0
-        self.__data_mutex.release()
-        return data_transfer_speed
+        return int(self.get_statistics().data_receiving_rates[1])
 
     def get_total_data_received(self):
         """
         :return: count of received bytes
         :rtype: int
         """
-        self.__data_mutex.acquire()
-        total_data_received = self.__total_bytes_received
-        self.__data_mutex.release()
-        return total_data_received
+        return self.get_statistics().total_data_received
 
     def get_count_of_queued_requests(self):
-        self.__data_mutex.acquire()
-        queued_requests = self.__count_of_queued_requests
-        self.__data_mutex.release()
-        return queued_requests
+        return self.get_statistics().count_of_queued_requests
 
     def get_total_count_of_sent_requests(self):
-        self.__data_mutex.acquire()
-        total_sent_requests = self.__total_count_of_sent_requests
-        self.__data_mutex.release()
-        return total_sent_requests
+        return self.get_statistics().total_count_of_sent_requests
+
+    def get_total_count_of_dropped_requests(self):
+        return self.get_statistics().total_count_of_dropped_requests
+
+    def get_count_of_requests_in_flight(self):
+        return self.get_statistics().count_of_requests_in_flight
+
+    def get_average_request_latency(self):
+        """
+        :return: average HTTP request time (in seconds) in the last minute or
+            None if no request has been finished then
+        :rtype: float
+        """
+        return self.get_statistics().average_request_latency
 
     def get_progress(self):
-        self.__data_mutex.acquire()
-        progress = self.__progress
-        self.__data_mutex.release()
-        return progress
+        with self.__data_mutex:
+            return self.__progress
 
     def get_progress_title(self):
-        self.__data_mutex.acquire()
-        progress_title = self.__progress_title
-        self.__data_mutex.release()
-        return progress_title
+        with self.__data_mutex:
+            return self.__progress_title
 
     def get_progress_subtitle(self):
-        self.__data_mutex.acquire()
-        progress_subtitle = self.__progress_subtitle
-        self.__data_mutex.release()
-        return progress_subtitle
+        with self.__data_mutex:
+            return self.__progress_subtitle
@@ -5,4 +5,12 @@ BAUDRATE = 9600
 PHOTO_PACKET_SIZE = 20
 PHOTO_HEADER = "$FOTO:xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx"
 # PHOTO_DIRECTORY must end with slash
-PHOTO_DIRECTORY = "/home/piotr/PycharmProjects/techswarm-receiver/photos/"
\ No newline at end of file
+PHOTO_DIRECTORY = "/home/piotr/PycharmProjects/techswarm-receiver/photos/"
+# Minimal time (in seconds) between two photo reception progress messages
+PHOTO_PROGRESS_INTERVAL = 1
+# Named pipe or Unix socket the parser reads from (see INPUT_MODE in parser's
+# config). Received lines are streamed there in addition to being written to
+# RAW_NAME. None disables streaming.
+STREAM_PATH = None
+# Minimal time (in seconds) between attempts to connect to the parser
+STREAM_RECONNECT_INTERVAL = 1
@@ -1,6 +1,7 @@
 from tsreceiver.usart import Usart
+from tsreceiver.stream import LineStreamer
 from tsreceiver import config
-from tsparser.timestamp import get_timestamp
+from tsparser.timestamp import format_timestamp, now
 
 
 def receive():
@@ -11,31 +12,71 @@ def receive():
     raw = open(config.RAW_NAME, 'a')
 
     usart = Usart()
+    streamer = None
+    if config.STREAM_PATH is not None:
+        streamer = LineStreamer(config.STREAM_PATH,
+                                config.STREAM_RECONNECT_INTERVAL)
 
+    for line in receive_lines(usart):
+        raw.write(line)
+        raw.flush()
+        if streamer is not None:
+            streamer.write(line)
+
+
+def receive_lines(usart, log=print):
+    """
+    Receive data from serial device. Photos are saved to PHOTO_DIRECTORY.
+
+    :type usart: tsreceiver.usart.Usart
+    :param log: function messages are passed to
+    :type log: collections.Callable
+    :return: generator of received lines, with timestamp (number of seconds
+        since the epoch) appended, in format of raw dump file
+    :rtype: collections.Iterable[str]
+    """
     while True:
         try:
             rawline = usart.readline()
             line = rawline.decode("utf-8").strip("/n")
         except UnicodeDecodeError:
-            print(rawline)
-            print("line cannot be decoded\n")
+            log("line cannot be decoded: {!r}".format(rawline))
             continue
         if line.find(config.PHOTO_HEADER) is not -1:
-            photo_RGB565 = usart.get_photo_as_bytearray(320, 240)
-            timestamp = get_timestamp()
+            photo = usart.receive_photo(320, 240)
+            completeness = photo.get_completeness()
+            log("Photo received, {:.1f} % complete"
+                .format(completeness * 100))
+            missing_packets = photo.get_missing_packets()
+            photo.fill_missing_packets()
+            photo_RGB565 = photo.photo
+            timestamp = now()
+            filename = config.PHOTO_DIRECTORY + format_timestamp(timestamp)
             try:
-                photo_file = open(config.PHOTO_DIRECTORY + timestamp, "wb")
+                photo_file = open(filename, "wb")
                 photo_file.write(photo_RGB565)
                 photo_file.close()
+                if missing_packets:
+                    _write_missing_packets(filename + '.missing',
+                                           missing_packets)
             except IOError:
-                print("ERROR while writing photo")
+                log("ERROR while writing photo")
                 continue
-            line = '$PHOTO,' + config.PHOTO_DIRECTORY + timestamp + ',' + timestamp +'\n'
-            raw.write(line)
-            raw.flush()
-
+            yield '$PHOTO,{},{:.4f},{:.6f}\n'.format(filename, completeness,
+                                                    timestamp)
         else:
-            line = str(line).strip('\r\n') + ',' + get_timestamp() + '\r\n'
-            raw.write(line)
-            raw.flush()
-            # print(line)
+            yield '{},{:.6f}\r\n'.format(str(line).strip('\r\n'), now())
+
+
+def _write_missing_packets(filename, missing_packets):
+    """
+    Write positions of packets to be retransmitted, one "x,y" per line
+
+    :type filename: str
+    :param missing_packets: list of (x, y) tuples
+    :type missing_packets: list
+    """
+    missing_file = open(filename, "w")
+    for x, y in missing_packets:
+        missing_file.write('{},{}\n'.format(x, y))
+    missing_file.close()
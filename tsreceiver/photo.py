@@ -0,0 +1,172 @@
+from time import monotonic
+
+
+class PhotoAssembler:
+    """
+    Assembles photo out of packets received from the probe.
+
+    Each packet consists of two bytes with its x and y position (x being
+    the index of packet within a row of pixels and y being the index of
+    the row) followed by the payload. Payloads are copied into preallocated
+    buffer, and received packets are marked in a bitmap, so it's known
+    which parts of the photo are missing.
+    """
+
+    def __init__(self, width, height, payload_size, bytes_per_pixel=2):
+        """
+        :param width: width of image in pixels
+        :type width: int
+        :param height: height of image in pixels
+        :type height: int
+        :param payload_size: size of packet payload in bytes
+        :type payload_size: int
+        :param bytes_per_pixel: size of a single pixel in bytes
+        :type bytes_per_pixel: int
+        """
+        self.width = width
+        self.height = height
+        self.payload_size = payload_size
+        self.row_size = width * bytes_per_pixel
+        if self.row_size % payload_size:
+            raise ValueError('Row size must be multiple of payload size')
+        self.packets_per_row = self.row_size // payload_size
+        self.photo = bytearray(self.row_size * height)
+        # 1 for every packet that has been received, row by row
+        self.received = bytearray(self.packets_per_row * height)
+        self.received_count = 0
+        self.__photo_view = memoryview(self.photo)
+
+    def add_packet(self, packet):
+        """
+        Copy packet's payload into the photo.
+
+        :param packet: whole packet, including position
+        :type packet: bytes
+        :return: position (x, y) of the packet
+        :rtype: tuple
+        """
+        x, y = packet[0], packet[1]
+        if not self.is_valid_position(x, y):
+            raise ValueError('Packet position ({}, {}) is out of the photo'
+                             .format(x, y))
+        offset = self.__get_offset(x, y)
+        self.__photo_view[offset:offset + self.payload_size] = (
+            packet[2:2 + self.payload_size])
+        index = y * self.packets_per_row + x
+        if not self.received[index]:
+            self.received[index] = 1
+            self.received_count += 1
+        return x, y
+
+    def is_valid_position(self, x, y):
+        return x < self.packets_per_row and y < self.height
+
+    def is_last_packet(self, x, y):
+        return x == self.packets_per_row - 1 and y == self.height - 1
+
+    def get_completeness(self):
+        """
+        :return: fraction of packets received
+        :rtype: float
+        """
+        return self.received_count / len(self.received)
+
+    def get_missing_packets(self):
+        """
+        :return: positions (x, y) of packets that have not been received
+        :rtype: list
+        """
+        return [(index % self.packets_per_row, index // self.packets_per_row)
+                for index, received in enumerate(self.received)
+                if not received]
+
+    def fill_missing_packets(self):
+        """
+        Fill pixels of packets that have not been received by linear
+        interpolation between the nearest received packets above and below
+        in the same column. If there is such a packet on one side only, its
+        pixels are copied. Pixels are assumed to be little endian RGB565.
+        """
+        for x, y in self.get_missing_packets():
+            above = self.__find_received_packet(x, y, -1)
+            below = self.__find_received_packet(x, y, 1)
+            if above is None and below is None:
+                continue  # whole column is missing
+            offset = self.__get_offset(x, y)
+            if above is None or below is None:
+                source = self.__get_offset(x, below if above is None else above)
+                self.__photo_view[offset:offset + self.payload_size] = (
+                    self.__photo_view[source:source + self.payload_size])
+                continue
+
+            weight = (y - above) / (below - above)
+            offset_above = self.__get_offset(x, above)
+            offset_below = self.__get_offset(x, below)
+            for i in range(0, self.payload_size, 2):
+                pixel = _interpolate_rgb565(
+                    int.from_bytes(self.photo[offset_above + i:
+                                              offset_above + i + 2], 'little'),
+                    int.from_bytes(self.photo[offset_below + i:
+                                              offset_below + i + 2], 'little'),
+                    weight)
+                self.photo[offset + i:offset + i + 2] = pixel.to_bytes(
+                    2, 'little')
+
+    def __find_received_packet(self, x, y, step):
+        y += step
+        while 0 <= y < self.height:
+            if self.received[y * self.packets_per_row + x]:
+                return y
+            y += step
+        return None
+
+    def __get_offset(self, x, y):
+        return y * self.row_size + x * self.payload_size
+
+
+def _interpolate_rgb565(pixel_a, pixel_b, weight):
+    """
+    Interpolate each color channel of two RGB565 pixels separately
+
+    :param weight: weight of pixel_b (0 gives pixel_a, 1 gives pixel_b)
+    :type weight: float
+    :rtype: int
+    """
+    result = 0
+    for shift, mask in ((11, 31), (5, 63), (0, 31)):
+        a = (pixel_a >> shift) & mask
+        b = (pixel_b >> shift) & mask
+        result |= round(a + (b - a) * weight) << shift
+    return result
+
+
+class ProgressReporter:
+    """
+    Prints progress, but not more often than once per given interval.
+    """
+
+    def __init__(self, title, interval, log=print):
+        """
+        :param title: text printed before the progress
+        :type title: str
+        :param interval: minimal time (in seconds) between two prints
+        :type interval: float
+        :param log: function progress messages are passed to
+        :type log: collections.Callable
+        """
+        self.__title = title
+        self.__interval = interval
+        self.__log = log
+        self.__last_report_time = None
+
+    def report(self, progress):
+        """
+        :param progress: progress in percents
+        :type progress: float
+        """
+        now = monotonic()
+        if (self.__last_report_time is not None and
+                now - self.__last_report_time < self.__interval):
+            return
+        self.__last_report_time = now
+        self.__log('{} {:.1f} %'.format(self.__title, progress))
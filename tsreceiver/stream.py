@@ -0,0 +1,146 @@
+import errno
+import os
+import socket
+import stat
+from time import monotonic
+
+
+class LineStreamer:
+    """
+    LineStreamer class passes received lines straight to the parser through
+    named pipe or Unix socket. It never waits for the parser, so receiving
+    is not stalled: if the parser is not running or cannot keep up, lines
+    are dropped (they are still in the raw dump file).
+
+    Socket is non-blocking. Bytes the socket does not accept at once are kept
+    in a send buffer of at most buffer_size bytes and sent before the next
+    lines, so lines are never split; when the buffer is full, new lines are
+    dropped as a whole.
+    """
+    def __init__(self, path, reconnect_interval=1, log=print,
+                 buffer_size=64 * 1024):
+        """
+        :param path: path of named pipe or Unix socket the parser listens on
+        :type path: str
+        :param reconnect_interval: minimal time (in seconds) between attempts
+            to connect to the parser
+        :type reconnect_interval: float
+        :param log: function messages are passed to
+        :type log: collections.Callable
+        :param buffer_size: maximal number of bytes waiting to be sent through
+            the socket
+        :type buffer_size: int
+        """
+        self.path = path
+        self.reconnect_interval = reconnect_interval
+        self.log = log
+        self.buffer_size = buffer_size
+        self.__pipe_fd = None
+        self.__socket = None
+        self.__send_buffer = bytearray()
+        self.__last_attempt = None
+
+    def write(self, line):
+        """
+        Pass line to the parser
+
+        :param line: line ending with line terminator
+        :type line: str
+        :return: True if line has been passed to the parser (or to the send
+            buffer)
+        :rtype: bool
+        """
+        if not self.__is_connected() and not self.__connect():
+            return False
+        data = line.encode("utf-8")
+        try:
+            if self.__socket is not None:
+                return self.__send(data)
+            # Writes shorter than PIPE_BUF are all-or-nothing
+            os.write(self.__pipe_fd, data)
+            return True
+        except BlockingIOError:
+            self.log("Parser is not keeping up, line dropped")
+            return False
+        except OSError:
+            self.log("Parser has disconnected")
+            self.__send_buffer.clear()
+            self.close()
+            return False
+
+    def close(self):
+        """
+        Close connection to the parser. Lines in the send buffer are passed
+        to the parser first, if it accepts them within reconnect_interval.
+        """
+        if self.__socket is not None:
+            if self.__send_buffer:
+                try:
+                    self.__socket.settimeout(self.reconnect_interval)
+                    self.__socket.sendall(self.__send_buffer)
+                except OSError:
+                    pass
+                self.__send_buffer.clear()
+            self.__socket.close()
+            self.__socket = None
+        if self.__pipe_fd is not None:
+            os.close(self.__pipe_fd)
+            self.__pipe_fd = None
+
+    def __send(self, data):
+        """
+        :return: True if data have been sent or added to the send buffer
+        :raise OSError: if the parser has disconnected
+        """
+        buffer = self.__send_buffer
+        if buffer:  # the parser has not accepted previous lines yet
+            self.__flush_send_buffer()
+        if not buffer:
+            try:
+                sent = self.__socket.send(data)
+            except BlockingIOError:
+                sent = 0
+            data = data[sent:]
+            if not data:
+                return True
+        elif len(buffer) + len(data) > self.buffer_size:
+            self.log("Parser is not keeping up, line dropped")
+            return False
+        buffer += data
+        return True
+
+    def __flush_send_buffer(self):
+        try:
+            sent = self.__socket.send(self.__send_buffer)
+        except BlockingIOError:
+            return
+        del self.__send_buffer[:sent]
+
+    def __is_connected(self):
+        return self.__socket is not None or self.__pipe_fd is not None
+
+    def __connect(self):
+        now = monotonic()
+        if (self.__last_attempt is not None and
+                now - self.__last_attempt < self.reconnect_interval):
+            return False
+        self.__last_attempt = now
+        try:
+            if stat.S_ISFIFO(os.stat(self.path).st_mode):
+                # Fails with ENXIO when nobody reads the pipe
+                self.__pipe_fd = os.open(self.path,
+                                         os.O_WRONLY | os.O_NONBLOCK)
+            else:
+                self.__socket = socket.socket(socket.AF_UNIX,
+                                              socket.SOCK_STREAM)
+                # Don't wait for the parser longer than between reconnects
+                self.__socket.settimeout(self.reconnect_interval)
+                self.__socket.connect(self.path)
+                self.__socket.setblocking(False)
+        except OSError as e:
+            self.close()
+            if e.errno not in (errno.ENOENT, errno.ENXIO, errno.ECONNREFUSED):
+                self.log("Cannot connect to the parser: {}".format(e))
+            return False
+        self.log("Connected to the parser")
+        return True
@@ -0,0 +1,76 @@
+from contextlib import redirect_stdout
+import io
+import unittest
+
+from tsreceiver import config
+from tsreceiver.photo import PhotoAssembler
+from tsreceiver.usart import Usart
+
+
+def _packet(x, y, payload_size=4):
+    return bytes([x, y]) + bytes([x * 16 + y]) * payload_size
+
+
+class TestPhotoAssembler(unittest.TestCase):
+    def setUp(self):
+        # 4x3 pixels, 2 packets per row
+        self.assembler = PhotoAssembler(4, 3, 4)
+
+    def test_add_packet(self):
+        self.assertEqual(self.assembler.add_packet(_packet(1, 2)), (1, 2))
+        self.assertEqual(self.assembler.photo[20:24], b'\x12' * 4)
+        self.assertEqual(self.assembler.photo.count(0), 20)
+        self.assertTrue(self.assembler.is_last_packet(1, 2))
+        self.assertFalse(self.assembler.is_last_packet(0, 2))
+
+    def test_missing_packets(self):
+        for x, y in ((0, 0), (1, 0), (1, 1), (1, 1), (0, 2)):
+            self.assembler.add_packet(_packet(x, y))
+        self.assertEqual(self.assembler.get_missing_packets(), [(0, 1), (1, 2)])
+        self.assertAlmostEqual(self.assembler.get_completeness(), 4 / 6)
+
+    def test_invalid_packet(self):
+        self.assertRaises(ValueError, self.assembler.add_packet, _packet(2, 0))
+        self.assertRaises(ValueError, self.assembler.add_packet, _packet(0, 3))
+
+    def test_fill_missing_packets(self):
+        # RGB565 pixels: 0x0000 in the first row, 0xffff in the last one
+        self.assembler.add_packet(b'\x00\x00' + b'\x00' * 4)
+        self.assembler.add_packet(b'\x00\x02' + b'\xff' * 4)
+        self.assembler.add_packet(b'\x01\x00' + b'\x21\x08' * 2)
+        self.assembler.fill_missing_packets()
+        # halfway between black and white
+        self.assertEqual(self.assembler.photo[8:12],
+                         (0x8410).to_bytes(2, 'little') * 2)
+        # copied from the only packet in the column
+        self.assertEqual(self.assembler.photo[12:16], b'\x21\x08' * 2)
+        self.assertEqual(self.assembler.photo[20:24], b'\x21\x08' * 2)
+
+
+class TestUsartPhoto(unittest.TestCase):
+    def test_receive_photo(self):
+        payload_size = config.PHOTO_PACKET_SIZE * 2
+        header = config.PHOTO_HEADER.encode('utf-8').ljust(payload_size + 2)
+        packets = [_packet(x, y, payload_size)
+                   for y in range(2) for x in range(16)]
+        usart = Usart.__new__(Usart)
+        usart.uart_connection = io.BytesIO(header * 2 + b''.join(packets))
+        usart.log = print
+        with redirect_stdout(io.StringIO()):
+            photo = usart.receive_photo(320, 2)
+        self.assertEqual(photo.get_completeness(), 1)
+        self.assertEqual(bytes(photo.photo), b''.join(p[2:] for p in packets))
+
+    def test_receive_photo_with_lost_packets(self):
+        payload_size = config.PHOTO_PACKET_SIZE * 2
+        packets = [_packet(x, y, payload_size)
+                   for y in range(3) for x in range(16)]
+        del packets[20]  # (4, 1)
+        packets[3], packets[4] = packets[4], packets[3]
+        usart = Usart.__new__(Usart)
+        usart.uart_connection = io.BytesIO(b''.join(packets) + b'$TERM,1\n')
+        usart.log = print
+        with redirect_stdout(io.StringIO()):
+            photo = usart.receive_photo(320, 4)
+        self.assertEqual(photo.get_missing_packets(),
+                         [(4, 1)] + [(x, 3) for x in range(16)])
@@ -1,14 +1,20 @@
 import serial
-import array
 import tsreceiver.config as config
+from tsreceiver.photo import PhotoAssembler, ProgressReporter
 
 class Usart:
     """
     Usart class implement communication with USART device,
     receiving records and photos
     """
-    def __init__(self):
+    def __init__(self, log=print):
+        """
+        :param log: function messages are passed to (print by default; the
+            parser's logger when the receiver runs in the parser's process)
+        :type log: collections.Callable
+        """
         self.uart_connection = serial.Serial(config.SERIAL_DEVICE_NAME, config.BAUDRATE)
+        self.log = log
         #self.uart_connection = open("/home/piotr/testinput", "rb")
 
     def readline(self):
@@ -19,49 +25,47 @@ class Usart:
         """
         return self.uart_connection.readline()
 
-    def get_photo_as_bytearray(self, width, height):
+    def receive_photo(self, width, height):
         """
+        Receive photo sent as packets following the photo header.
+
         :param width: width of image in pixels
         :type width: int
         :param height: height of image in pixels
         :type height: int
-        :return: photo as byte array encoded in RGB565
-        :rtype: bytearray
+        :return: assembler containing photo encoded in RGB565 along with
+            the map of packets that have been received
+        :rtype: tsreceiver.photo.PhotoAssembler
         """
-        # skip all headers
-
-        print("Entering byte reading mode")	
-
-        input_data = self.uart_connection.read(config.PHOTO_PACKET_SIZE*2 + 2)
-        try:
-            while input_data.decode("utf-8").find(config.PHOTO_HEADER) != -1:
-                input_data = self.uart_connection.read(config.PHOTO_PACKET_SIZE*2 + 2)
-        except UnicodeDecodeError:
-            pass
+        packet_size = config.PHOTO_PACKET_SIZE*2 + 2
+        assembler = PhotoAssembler(width, height, config.PHOTO_PACKET_SIZE*2)
+        progress = ProgressReporter("Byte reading",
+                                    config.PHOTO_PROGRESS_INTERVAL, self.log)
 
-        photo = array.array('B')
-        for i in range(2*320*240):
-            photo.append(0)
-
-        lastx = -1
-        lasty = -1
-        for i in range(16*240):
-            print("Byte reading", lasty / 240 * 100, "%")
-            if lasty > input_data[1]:
-                break
-            if lasty == input_data[1] and lastx >= input_data[0]:
-                break
-            lastx = input_data[0]
-            lasty = input_data[1]
+        # skip all headers
+        self.log("Entering byte reading mode")
 
-            for j in range(40):
-                photo[input_data[1]*640 + input_data[0]*40 + j] = input_data[2 + j]
+        header = config.PHOTO_HEADER.encode("utf-8")
+        input_data = self.uart_connection.read(packet_size)
+        while header in input_data:
+            input_data = self.uart_connection.read(packet_size)
 
-            if input_data[0] == 15 and input_data[1] == 239:
+        # Packets can be lost or come out of order, which does not end the
+        # photo, as long as they come from the same or further rows
+        lasty = 0
+        for _ in range(assembler.packets_per_row * height):
+            progress.report(assembler.get_completeness() * 100)
+            if len(input_data) < packet_size:
+                break  # read timeout
+            x, y = input_data[0], input_data[1]
+            if not assembler.is_valid_position(x, y) or y < lasty:
+                break  # not a packet of this photo
+            assembler.add_packet(input_data)
+            lasty = y
+            if assembler.is_last_packet(x, y):
                 break
 
-            input_data = self.uart_connection.read(config.PHOTO_PACKET_SIZE*2 + 2)
-
-        print("Exiting byte reading mode")
-        return photo
+            input_data = self.uart_connection.read(packet_size)
 
+        self.log("Exiting byte reading mode")
+        return assembler